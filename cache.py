@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+import time
+
+_MISSING = object()
+
+# Caps the lifetime of every entry stored from the current context,
+# e.g. so speculative prefetches only warm caches briefly.
+ttl_override = contextvars.ContextVar("ttl_override", default=None)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single execution."""
+
+    def __init__(self):
+        self.in_flight = {}
+
+    async def run(self, key, func, *args, **kwargs):
+        """Run ``func`` for ``key`` unless a call for it is already in flight.
+
+        Every caller awaits the same result; cancelling one caller does not
+        cancel the shared call for the others.
+        """
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self.in_flight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        return await asyncio.shield(future)
+
+    def _done(self, key, future):
+        if self.in_flight.get(key) is future:
+            del self.in_flight[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not future.cancelled():
+            future.exception()
+
+
+class TTLCache:
+    """Small in-memory cache with per-entry expiry and coalesced loading."""
+
+    def __init__(self, ttl, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = {}
+        self.flight = SingleFlight()
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return default
+        return value
+
+    def set(self, key, value, ttl=None):
+        if len(self.entries) >= self.max_size and key not in self.entries:
+            self._evict()
+        ttl = self.ttl if ttl is None else ttl
+        override = ttl_override.get()
+        if override is not None:
+            ttl = min(override, ttl)
+        self.entries[key] = (time.monotonic() + ttl, value)
+
+    def pop(self, key, default=None):
+        entry = self.entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self.entries.clear()
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self.entries.items() if expires_at <= now]:
+            del self.entries[key]
+        while len(self.entries) >= self.max_size:
+            del self.entries[min(self.entries, key=lambda k: self.entries[k][0])]
+
+    async def get_or_load(self, key, loader, *args, ttl=None):
+        """Return the cached value for ``key`` or load it once for all waiters.
+
+        ``None`` results are not cached so failed lookups are retried.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return await self.flight.run(key, self._load, key, loader, args, ttl)
+
+    async def _load(self, key, loader, args, ttl):
+        value = await loader(*args)
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
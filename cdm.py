@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pywidevine.cdm import Cdm
+from pywidevine.pssh import PSSH
+
+logger = logging.getLogger(__name__)
+
+
+class CDMPool:
+    """Bounded pool of Widevine CDM instances that run off the event loop."""
+
+    def __init__(self, device, pool_size=4):
+        self.device = device
+        self.pool_size = pool_size
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="cdm")
+        self.available = asyncio.Queue()
+        for _ in range(pool_size):
+            self.available.put_nowait(Cdm.from_device(device))
+        self.waiting = 0
+        self.releasing = set()
+        self.stats = {
+            "requests": 0,
+            "failures": 0,
+            "challenge": {"count": 0, "total": 0.0, "max": 0.0},
+            "parse": {"count": 0, "total": 0.0, "max": 0.0},
+            "queue_wait": {"count": 0, "total": 0.0, "max": 0.0},
+        }
+
+    def _record(self, name, elapsed):
+        stat = self.stats[name]
+        stat["count"] += 1
+        stat["total"] += elapsed
+        stat["max"] = max(stat["max"], elapsed)
+
+    def _submit(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _timed(self, name, step):
+        start = time.monotonic()
+        try:
+            # Shielded: cancelling the caller must not detach the CDM call
+            # from the cleanup that waits for it
+            return await asyncio.shield(step)
+        finally:
+            self._record(name, time.monotonic() - start)
+
+    async def get_keys(self, pssh_str, send_challenge):
+        """Run a full license exchange and return the content keys.
+
+        ``send_challenge`` is an async callable that posts the challenge to the
+        license server and returns the license bytes, or None on failure.
+        """
+        self.stats["requests"] += 1
+        self.waiting += 1
+        wait_start = time.monotonic()
+        try:
+            cdm = await self.available.get()
+        finally:
+            self.waiting -= 1
+        self._record("queue_wait", time.monotonic() - wait_start)
+
+        opened = None  # executor future of cdm.open
+        step = None  # executor future of the CDM call in progress
+        try:
+            opened = step = self._submit(cdm.open)
+            session_id = await asyncio.shield(step)
+            step = self._submit(cdm.get_license_challenge, session_id, PSSH(pssh_str))
+            challenge = await self._timed("challenge", step)
+            license_data = await send_challenge(challenge)
+            if not license_data:
+                self.stats["failures"] += 1
+                return None
+            step = self._submit(cdm.parse_license, session_id, license_data)
+            await self._timed("parse", step)
+            step = self._submit(cdm.get_keys, session_id)
+            return await asyncio.shield(step)
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+        finally:
+            if step is not None and not step.done():
+                # Cancelled mid-call: the worker thread still uses the CDM, so
+                # it is closed and returned only once that call has finished
+                task = asyncio.ensure_future(self._release_after(cdm, opened, step))
+                self.releasing.add(task)
+                task.add_done_callback(self.releasing.discard)
+            else:
+                self._release(cdm, opened)
+
+    async def _release_after(self, cdm, opened, step):
+        await asyncio.wait([step])
+        if not step.cancelled():
+            step.exception()  # Retrieved so it is not reported as unhandled
+        self._release(cdm, opened)
+
+    def _release(self, cdm, opened):
+        """Close the session opened by ``opened`` (if any) and return ``cdm`` to the pool."""
+        if opened is not None and opened.done() and not opened.cancelled() and opened.exception() is None:
+            try:
+                cdm.close(opened.result())
+            except Exception as e:
+                logger.warning(f"Error closing CDM session: {e}")
+        self.available.put_nowait(cdm)
+
+    def get_metrics(self):
+        """Return a snapshot of pool utilisation and latency figures (ms)."""
+        def summary(stat):
+            avg = stat["total"] / stat["count"] if stat["count"] else 0.0
+            return {"count": stat["count"], "avg_ms": round(avg * 1000, 1), "max_ms": round(stat["max"] * 1000, 1)}
+
+        return {
+            "pool_size": self.pool_size,
+            "busy": self.pool_size - self.available.qsize(),
+            "waiting": self.waiting,
+            "requests": self.stats["requests"],
+            "failures": self.stats["failures"],
+            "challenge": summary(self.stats["challenge"]),
+            "parse": summary(self.stats["parse"]),
+            "queue_wait": summary(self.stats["queue_wait"]),
+        }
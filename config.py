@@ -29,6 +29,52 @@ MP4_USER_IDS = {"1822859631"}  # User IDs that get mp4 extension instead of mkv
 # Whether to keep and dump streams after muxing (True) or delete them immediately (False)
 DUMP_STREAMS = False
 
+# Number of Widevine CDM instances used for concurrent license requests
+CDM_POOL_SIZE = 4
+
+# Speculatively resolve the next episode of a show while the current one downloads
+PREFETCH_NEXT_EPISODE = True
+PREFETCH_MAX_CONCURRENT = 1  # Prefetches running at once
+PREFETCH_MAX_PER_WINDOW = 20  # Prefetches started per window
+PREFETCH_WINDOW = 600  # Seconds
+PREFETCH_TTL = 300  # Upper bound on the lifetime of cache entries written by a prefetch
+
+# Seconds between progress samples taken from a downloader's output
+PROGRESS_SAMPLE_INTERVAL = 1.0
+
+# Raw downloader output is kept in memory and only written out when a task fails
+TOOL_OUTPUT_BUFFER_LINES = 1000  # Lines kept per task
+TOOL_LOG_SUMMARY_INTERVAL = 30  # Seconds between INFO summaries of a task's output
+TASK_LOG_DIR = "logs/tasks"
+
+# Bot log files (bot_YYYYMMDD.log), rotated daily and by size
+LOG_FILE_PREFIX = "bot"
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Gofile uploads
+GOFILE_TOKEN = ""  # Account token; empty uploads as a guest
+GOFILE_ZONE = None  # Preferred server zone, e.g. "eu" or "na"
+GOFILE_CHUNK_SIZE = 4 * 1024 * 1024
+GOFILE_ATTEMPTS = 3  # Servers tried before giving up
+
+# Drive uploads through long-lived rclone rc daemons
+RCLONE_MULTI_THREAD_STREAMS = 8
+RCLONE_TRANSFERS = 4
+RCLONE_UPLOAD_DIR = "uploads"  # Folder on the drive that uploads go to
+
+# Files over the Telegram limit are split into playable parts instead of going to Gofile
+SPLIT_LARGE_UPLOADS = True
+SPLIT_PART_SIZE_MB = 1900  # Upper bound for each part
+SPLIT_UPLOAD_CONCURRENCY = 3  # Parts uploaded at once
+
+# Download pipeline: each stage has its own workers, so uploads don't hold download slots
+PIPELINE_FETCH_WORKERS = 10  # Concurrent stream downloads
+PIPELINE_MUX_WORKERS = 4  # Concurrent decrypt/merge jobs
+PIPELINE_POSTPROCESS_WORKERS = 4  # Thumbnail, metadata and destination choice
+PIPELINE_UPLOAD_WORKERS = 10  # Concurrent uploads
+PIPELINE_QUEUE_SIZE = 4  # Finished jobs waiting for each later stage before earlier ones wait
+
 pickFormats = {
     "audio": {
         'tam': "Tamil", 'tel': "Telugu", 'mal': "Malayalam", 'hin': "Hindi",
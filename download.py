@@ -7,17 +7,25 @@ import logging
 import time
 import shutil
 import json
+from collections import deque
 
 # Get logger
 logger = logging.getLogger(__name__)
 
 # These will be imported at runtime from the main module
 download_progress = None
-progress_display = None
 
 # Import constants
 from hotstar import mpd_hotstar_headers
-from config import USE_PROXY, MP4_USER_IDS, PROXY_URL, DUMP_STREAMS
+from config import (
+    USE_PROXY, MP4_USER_IDS, PROXY_URL, DUMP_STREAMS, PROGRESS_SAMPLE_INTERVAL,
+    TOOL_OUTPUT_BUFFER_LINES, TOOL_LOG_SUMMARY_INTERVAL, TASK_LOG_DIR
+)
+from store import ProgressStore
+from progress import parse_size, format_size, format_speed, update_stream, apply_tool_line
+
+# Per-stream progress of every job, shared with dashboards
+progress_store = ProgressStore(os.path.join("data", "download_progress.db"))
 
 class BaseDownloader:
     """Base class for downloaders with common functionality."""
@@ -32,6 +40,10 @@ class BaseDownloader:
         self.processes = []
         self.progress_data = None
         self.enable_logging = True
+        # Raw tool output, written to a per-task log only if the task fails
+        self.output_log = deque(maxlen=TOOL_OUTPUT_BUFFER_LINES)
+        self.latest_output = {}  # stream type -> last line seen
+        self.last_summary_time = 0
         self.needs_decryption = content_info.get("drm", {}).get("needs_decryption", False)
         self.final_merged_path = None
         self.last_progress_update_time = 0
@@ -129,6 +141,30 @@ class BaseDownloader:
         except Exception as e:
             logger.error(f"Error checking/deleting existing files: {str(e)}")
 
+    @staticmethod
+    def _init_stream_progress():
+        """Numeric progress of one stream; sizes in bytes, speed in bytes/sec."""
+        return {
+            'fragments': 0,
+            'total_fragments': 0,
+            'percentage': 0,
+            'done_bytes': 0,
+            'total_bytes': 0,
+            'speed': 0.0
+        }
+
+    def _audio_progress(self, audio_id):
+        """Progress of one audio stream, keyed by its stream id."""
+        audio = self.progress_data['audio']
+        if audio_id not in audio:
+            language = next(
+                (stream.get("language") for stream in self.content_info.get("streams_info", {}).get("audio", [])
+                 if stream["stream_id"] == audio_id),
+                None
+            )
+            audio[audio_id] = {**self._init_stream_progress(), 'language': language or str(audio_id)}
+        return audio[audio_id]
+
     def _init_progress_data(self):
         """Initialize progress data structure"""
         return {
@@ -136,13 +172,7 @@ class BaseDownloader:
                 'resolution': self.selected_resolution.get('resolution', 'N/A'),
                 'bitrate': self.selected_resolution.get('bitrate', 0),
                 'type': 'Main',
-                'fragments': 0,
-                'total_fragments': 0,
-                'percentage': 0,
-                'downloaded_size': '0MB',
-                'total_size': '0MB',
-                'speed': '0 KBps',
-                'eta': '00:00'
+                **self._init_stream_progress()
             },
             'audio': {},
             'status': 'Download',
@@ -301,12 +331,85 @@ class BaseDownloader:
             with open(record_path, "w", encoding="utf-8") as f:
                 json.dump(records, f, indent=2)
             
-            # Mark download as complete in progress JSON
-            await self._update_progress_json(force=True)
+            # Mark download as complete in the progress store
+            await self._update_progress_store(force=True)
                 
         except Exception as e:
             logger.error(f"Failed to record stream files: {e}")
 
+    async def _sample_output(self, stream, stream_type, handle_line, is_progress):
+        """Drain a tool's output in chunks and hand lines to ``handle_line``.
+
+        Progress lines supersede each other, so only the latest one is kept
+        and handled at most every PROGRESS_SAMPLE_INTERVAL seconds (and once
+        more at EOF). Other lines are handled as they arrive.
+        """
+        buffer = b""
+        latest = None
+        last_sample = 0
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            *lines, buffer = re.split(rb'[\r\n]', buffer + chunk)
+            # Guard against a tool that never ends its lines
+            buffer = buffer[-65536:]
+            for raw in lines:
+                line = raw.decode(errors='replace').strip()
+                if not line:
+                    continue
+                self._record_output(line, stream_type)
+                if is_progress(line):
+                    latest = line
+                else:
+                    await handle_line(line, stream_type)
+
+            now = time.monotonic()
+            if latest is not None and now - last_sample >= PROGRESS_SAMPLE_INTERVAL:
+                await handle_line(latest, stream_type)
+                latest = None
+                last_sample = now
+
+        tail = buffer.decode(errors='replace').strip()
+        if tail:
+            self._record_output(tail, stream_type)
+            if is_progress(tail):
+                latest = tail
+            else:
+                await handle_line(tail, stream_type)
+        if latest is not None:
+            await handle_line(latest, stream_type)
+
+    def _record_output(self, line, stream_type):
+        """Keep a raw output line in the ring buffer and log a sampled summary at INFO."""
+        self.output_log.append(f"{time.strftime('%H:%M:%S')} [{stream_type}] {line}")
+        self.latest_output[stream_type] = line
+        now = time.monotonic()
+        if self.enable_logging and now - self.last_summary_time >= TOOL_LOG_SUMMARY_INTERVAL:
+            self.last_summary_time = now
+            summary = " | ".join(f"{name}: {last}" for name, last in self.latest_output.items())
+            logger.info(f"[{self.identifier}] {summary}")
+
+    async def dump_output_log(self):
+        """Append the buffered tool output to this task's log file and return its path."""
+        if not self.output_log:
+            return None
+        path = os.path.join(TASK_LOG_DIR, f"{self.identifier}.log")
+        header = f"===== {time.strftime('%Y-%m-%d %H:%M:%S')} {self.filename} ({len(self.output_log)} lines) =====\n"
+        lines = "\n".join(self.output_log) + "\n"
+
+        def write():
+            os.makedirs(TASK_LOG_DIR, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(header + lines)
+
+        try:
+            await asyncio.to_thread(write)
+            return path
+        except OSError as e:
+            logger.error(f"Failed to write task log {path}: {e}")
+            return None
+
     async def execute(self):
         """Base execute method to be implemented by subclasses"""
         raise NotImplementedError("Subclasses must implement this method")
@@ -314,46 +417,11 @@ class BaseDownloader:
         """Base get_stderr method to be implemented by subclasses"""
         raise NotImplementedError("Subclasses must implement this method")
 
-    async def _update_progress_json(self, force=False):
-        """Update download progress in a structured JSON file.
-        
-        Structure:
-        {
-            "platform_name": {
-                "content_id": {
-                    "video_stream_id1": {
-                        "percentage": 50.5,
-                        "download_done": false,
-                        "type": "video",
-                        "resolution": "1920x1080",
-                        "bitrate": 4000,
-                        "speed": "1024 KBps",
-                        "downloaded_size": "100MB",
-                        "total_size": "200MB"
-                    },
-                    "video_stream_id2": {
-                        "percentage": 30.5,
-                        "download_done": false,
-                        "type": "video",
-                        "resolution": "1280x720",
-                        "bitrate": 2000,
-                        "speed": "512 KBps",
-                        "downloaded_size": "50MB",
-                        "total_size": "150MB"
-                    },
-                    "audio_stream_id1": {
-                        "percentage": 75.2,
-                        "download_done": false,
-                        "type": "audio",
-                        "language": "english",
-                        "speed": "256 KBps",
-                        "downloaded_size": "20MB",
-                        "total_size": "30MB"
-                    },
-                    "download_complete": false
-                }
-            }
-        }
+    async def _update_progress_store(self, force=False):
+        """Upsert this job's per-stream progress into the shared progress store.
+
+        Rows are keyed by (platform, content_id, stream_id); the content's
+        ``download_complete`` flag follows the state of all its streams.
         """
         if not self.progress_data:
             return
@@ -373,70 +441,42 @@ class BaseDownloader:
                 logger.warning("No content_id found, skipping progress tracking")
                 return
                 
-            progress_file = os.path.join("data", "download_progress.json")
-            os.makedirs("data", exist_ok=True)
+            streams = {}
             
-            # Load existing progress data
-            try:
-                with open(progress_file, "r", encoding="utf-8") as f:
-                    progress_data = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                progress_data = {}
-                
-            # Ensure nested structure exists
-            if platform not in progress_data:
-                progress_data[platform] = {}
-            if content_id not in progress_data[platform]:
-                progress_data[platform][content_id] = {"download_complete": False}
-                
-            # Update video progress
+            # Video progress
             video_stream_id = self.selected_resolution.get("stream_id")
             if video_stream_id:
-                progress_data[platform][content_id][video_stream_id] = {
-                    "percentage": self.progress_data['video'].get('percentage', 0),
-                    "download_done": self.progress_data['video'].get('percentage', 0) >= 100,
+                percentage = self.progress_data['video'].get('percentage', 0)
+                streams[video_stream_id] = {
                     "type": "video",
+                    "percentage": percentage,
+                    "download_done": percentage >= 100,
                     "resolution": self.selected_resolution.get("resolution", "N/A"),
                     "bitrate": self.selected_resolution.get("bitrate", 0),
-                    "speed": self.progress_data['video'].get('speed', '0 KBps'),
-                    "downloaded_size": self.progress_data['video'].get('downloaded_size', '0MB'),
-                    "total_size": self.progress_data['video'].get('total_size', '0MB')
+                    "speed": format_speed(self.progress_data['video'].get('speed')),
+                    "downloaded_size": format_size(self.progress_data['video'].get('done_bytes')),
+                    "total_size": format_size(self.progress_data['video'].get('total_bytes'))
                 }
                 
-            # Update audio progress
-            for audio_idx, audio_id in enumerate(self.selected_audios):
-                # Find the language for this audio stream
-                language = None
-                for lang, audio_data in self.progress_data.get('audio', {}).items():
-                    # Just use the first language we find for this audio stream
-                    language = lang
-                    percentage = audio_data.get('percentage', 0)
-                    progress_data[platform][content_id][audio_id] = {
-                        "percentage": percentage,
-                        "download_done": percentage >= 100,
-                        "type": "audio",
-                        "language": language,
-                        "speed": audio_data.get('speed', '0 KBps'),
-                        "downloaded_size": audio_data.get('downloaded_size', '0MB'),
-                        "total_size": audio_data.get('total_size', '0MB')
-                    }
-                    break
-                    
-            # Check if everything is complete
-            all_complete = True
-            for stream_id, stream_data in progress_data[platform][content_id].items():
-                if stream_id != "download_complete" and not stream_data.get("download_done", False):
-                    all_complete = False
-                    break
+            # Audio progress is keyed by stream id
+            for audio_id in self.selected_audios:
+                audio_data = self.progress_data.get('audio', {}).get(audio_id, {})
+                language = audio_data.get('language')
+                percentage = audio_data.get('percentage', 0)
+                streams[audio_id] = {
+                    "type": "audio",
+                    "percentage": percentage,
+                    "download_done": percentage >= 100,
+                    "language": language,
+                    "speed": format_speed(audio_data.get('speed')),
+                    "downloaded_size": format_size(audio_data.get('done_bytes')),
+                    "total_size": format_size(audio_data.get('total_bytes'))
+                }
                     
-            progress_data[platform][content_id]["download_complete"] = all_complete
-            
-            # Write progress data to file
-            with open(progress_file, "w", encoding="utf-8") as f:
-                json.dump(progress_data, f, indent=2)
+            await progress_store.upsert(platform, content_id, streams)
                 
         except Exception as e:
-            logger.error(f"Error updating progress JSON: {e}")
+            logger.error(f"Error updating progress store: {e}")
 
 # Helper to check for dumped streams
 async def get_dumped_stream_file(content_id, stream_id, stream_type, platform=None):
@@ -512,11 +552,6 @@ class YTDLPDownloader(BaseDownloader):
 
     async def _parse_progress_line(self, line, stream_type, selected_audio_streams):
         """Parse a single line of yt-dlp output and update progress_data."""
-        line = line.decode().strip()
-
-        if self.enable_logging:  # Only log if enabled
-            logger.info(f"[{stream_type}] {line}")
-
         # Parse video stream info
         if '[download] Destination' in line and stream_type == 'video':
             res_match = re.search(r'(\d{3,4}p)', self.progress_data['video']['resolution'])
@@ -531,57 +566,46 @@ class YTDLPDownloader(BaseDownloader):
                     self.progress_data['video']['resolution'] = vid_info_match.group(1)
                     self.progress_data['video']['bitrate'] = int(vid_info_match.group(2))
 
-                # Extract fragments
+                if stream_type.startswith('audio_'):
+                    audio_idx = int(stream_type.split('_')[1]) - 1
+                    if not 0 <= audio_idx < len(self.selected_audios):
+                        return
+                    stream = self._audio_progress(self.selected_audios[audio_idx])
+                else:
+                    stream = self.progress_data['video']
+
+                sample = {}
+                # Extract fragments and percentage
                 frag_match = re.search(r'(\d+)/(\d+)\s+(\d+\.\d+)%', line)
                 if frag_match:
-                    self.progress_data['video']['fragments'] = int(frag_match.group(1))
-                    self.progress_data['video']['total_fragments'] = int(frag_match.group(2))
-                    self.progress_data['video']['percentage'] = float(frag_match.group(3))
-
-                # Extract size info
-                size_match = re.search(r'([\d.]+)MiB/([\d.]+)MiB', line)
+                    sample['fragments'] = int(frag_match.group(1))
+                    sample['total_fragments'] = int(frag_match.group(2))
+                    sample['percentage'] = float(frag_match.group(3))
+                else:
+                    percent_match = re.search(r'(\d+\.\d+)%', line)
+                    if percent_match:
+                        sample['percentage'] = float(percent_match.group(1))
+                if stream_type.startswith('audio_') and sample.get('percentage', 0) >= 94:
+                    sample['percentage'] = 100
+
+                # Extract sizes ("12.0MiB/340.5MiB" or "of ~340.5MiB") and speed
+                size_match = re.search(r'([\d.]+[KMG]iB)/([\d.]+[KMG]iB)', line)
+                total_match = re.search(r'of\s+~?\s*([\d.]+[KMG]iB)', line)
                 if size_match:
-                    self.progress_data['video']['downloaded_size'] = f"{size_match.group(1)}MB"
-                    self.progress_data['video']['total_size'] = f"{size_match.group(2)}MB"
-
-                # Extract speed and ETA
-                speed_match = re.search(r'(\d+\.?\d*[KM]iB/s)', line)
-                eta_match = re.search(r'ETA (\d+:\d+)', line)
+                    sample['done_bytes'] = parse_size(size_match.group(1))
+                    sample['total_bytes'] = parse_size(size_match.group(2))
+                elif total_match and 'percentage' in sample:
+                    sample['total_bytes'] = parse_size(total_match.group(1))
+                    sample['done_bytes'] = int(sample['total_bytes'] * sample['percentage'] / 100)
 
+                speed_match = re.search(r'([\d.]+[KMG]iB/s)', line)
                 if speed_match:
-                    speed = speed_match.group(1)
-                    if 'MiB/s' in speed:
-                        mb = float(speed.replace('MiB/s', '')) * 1024
-                        self.progress_data['video']['speed'] = f"{mb:.0f} KBps"
-                    else:
-                        self.progress_data['video']['speed'] = f"{speed.replace('KiB/s', '')} KBps"
-
-                if eta_match:
-                    self.progress_data['video']['eta'] = eta_match.group(1)
+                    sample['speed'] = parse_size(speed_match.group(1))
 
-                if stream_type == 'video' and not frag_match:
-                    general_percent = re.search(r'(\d+\.\d+)%', line)
-                    if general_percent:
-                        self.progress_data['video']['percentage'] = float(general_percent.group(1))
-
-                if stream_type.startswith('audio_'):
-                    audio_idx = int(stream_type.split('_')[1]) - 1
-                    if 0 <= audio_idx < len(selected_audio_streams):
-                        language = selected_audio_streams[audio_idx]["language"]
-                        if language not in self.progress_data['audio']:
-                            self.progress_data['audio'][language] = {
-                                'percentage': 0,
-                                'speed': '0 KBps',
-                                'downloaded_size': '0MB',
-                                'total_size': '0MB'
-                            }
-                        audio_percent = re.search(r'(\d+\.\d+)%', line)
-                        if audio_percent:
-                            current = float(audio_percent.group(1))
-                            self.progress_data['audio'][language]['percentage'] = 100 if current >= 94 else current
+                update_stream(stream, **sample)
 
                 download_progress.update_progress(self.identifier, self.progress_data)
-                await self._update_progress_json()
+                await self._update_progress_store()
 
             except Exception as e:
                 logger.error(f"Progress parsing error: {e}")
@@ -594,12 +618,13 @@ class YTDLPDownloader(BaseDownloader):
 
         selected_audio_streams = await self._get_selected_audio_streams()
 
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
+        async def handle_line(line, stream_type):
             await self._parse_progress_line(line, stream_type, selected_audio_streams)
 
+        await self._sample_output(
+            process.stdout, stream_type, handle_line,
+            is_progress=lambda line: line.startswith('[download]') and '%' in line
+        )
         return await process.wait()
 
     async def get_stderr(self):
@@ -677,8 +702,8 @@ class YTDLPDownloader(BaseDownloader):
             # Set video progress to 100%
             if self.progress_data is None:
                 self.progress_data = self._init_progress_data()
-            self.progress_data['video']['percentage'] = 100
-            self.progress_data['video']['downloaded_size'] = self.progress_data['video']['total_size'] = f"{os.path.getsize(video_file) // (1024*1024)}MB"
+            size = os.path.getsize(video_file)
+            update_stream(self.progress_data['video'], done_bytes=size, total_bytes=size, percentage=100)
             download_progress.update_progress(self.identifier, self.progress_data)
         else:
             video_file = os.path.join(self.download_dir, f"{self.filename}.video")
@@ -694,11 +719,9 @@ class YTDLPDownloader(BaseDownloader):
                 # Set audio progress to 100%
                 if self.progress_data is None:
                     self.progress_data = self._init_progress_data()
-                lang = selected_audio_streams[idx-1]["language"] if idx-1 < len(selected_audio_streams) else language_suffix
-                if lang not in self.progress_data['audio']:
-                    self.progress_data['audio'][lang] = {}
-                self.progress_data['audio'][lang]['percentage'] = 100
-                self.progress_data['audio'][lang]['downloaded_size'] = self.progress_data['audio'][lang]['total_size'] = f"{os.path.getsize(audio_file) // (1024*1024)}MB"
+                size = os.path.getsize(audio_file)
+                stream = self._audio_progress(audio_id)
+                update_stream(stream, done_bytes=size, total_bytes=size, percentage=100)
                 download_progress.update_progress(self.identifier, self.progress_data)
             else:
                 audio_file = os.path.join(self.download_dir, f"{self.filename}.{language_suffix}")
@@ -755,7 +778,7 @@ class YTDLPDownloader(BaseDownloader):
             for lang in self.progress_data.get('audio', {}):
                 self.progress_data['audio'][lang]['percentage'] = 100
             download_progress.update_progress(self.identifier, self.progress_data)
-            await self._update_progress_json(force=True)
+            await self._update_progress_store(force=True)
             
             return 0
 
@@ -958,26 +981,28 @@ class Nm3u8DLREDownloader(BaseDownloader):
         self.processes.append((process, stream_type))
         return process
 
+    async def _handle_output_line(self, line, stream_type):
+        """Apply one line of N_m3u8DL-RE output to progress_data."""
+        try:
+            if self.progress_data:
+                audio_key = None
+                if stream_type.startswith('audio_'):
+                    audio_idx = int(stream_type.split('_')[1]) - 1
+                    if 0 <= audio_idx < len(self.selected_audios):
+                        audio_key = self.selected_audios[audio_idx]
+                        self._audio_progress(audio_key)
+                apply_tool_line(self.progress_data, line, audio_key)
+                download_progress.update_progress(self.identifier, self.progress_data)
+                await self._update_progress_store()
+        except Exception as e:
+            logger.error(f"Error updating progress for {self.identifier}: {e}")
+
     async def _monitor_progress(self, process, stream_type):
         """Monitor download progress for a single stream."""
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
-            line = line.decode().strip()
-            if line:
-                if self.enable_logging:  # Only log if enabled
-                    logger.info(f"[{stream_type}] {line}")
-                try:
-                    if self.progress_data:
-                        self.progress_data = await progress_display.update_progress_from_line(
-                            line, self.progress_data, self.identifier
-                        )
-                        download_progress.update_progress(self.identifier, self.progress_data)
-                        await self._update_progress_json()
-                except Exception as e:
-                    logger.error(f"Error updating progress for {self.identifier}: {e}")
-
+        await self._sample_output(
+            process.stdout, stream_type, self._handle_output_line,
+            is_progress=lambda line: line.startswith(('Vid', 'Aud'))
+        )
         return await process.wait()
 
     async def get_stderr(self):
@@ -990,8 +1015,12 @@ class Nm3u8DLREDownloader(BaseDownloader):
                     stderr_data.append(f"{stream_type}: {stderr.decode()}")
         return "\n".join(stderr_data).encode() if stderr_data else None
 
-    async def execute(self):
-        """Execute the download process and monitor progress, using dumps if available."""
+    async def fetch(self):
+        """Download (or reuse dumps of) every selected stream.
+
+        Returns ``(video_file, audio_files)`` ready for muxing, or None if the
+        download failed.
+        """
         try:
             await self._check_and_delete_existing_files()
             self.progress_data = self._init_progress_data()
@@ -1008,8 +1037,8 @@ class Nm3u8DLREDownloader(BaseDownloader):
             if video_file:
                 logger.info(f"Using dumped video file: {video_file}")
                 # Set video progress to 100%
-                self.progress_data['video']['percentage'] = 100
-                self.progress_data['video']['downloaded_size'] = self.progress_data['video']['total_size'] = f"{os.path.getsize(video_file) // (1024*1024)}MB"
+                size = os.path.getsize(video_file)
+                update_stream(self.progress_data['video'], done_bytes=size, total_bytes=size, percentage=100)
                 download_progress.update_progress(self.identifier, self.progress_data)
             else:
                 video_cmd = await self.build_video_command()
@@ -1023,11 +1052,9 @@ class Nm3u8DLREDownloader(BaseDownloader):
                 if audio_file:
                     logger.info(f"Using dumped audio file: {audio_file}")
                     # Set audio progress to 100%
-                    lang = selected_audio_streams[idx-1]["language"] if idx-1 < len(selected_audio_streams) else language_suffix
-                    if lang not in self.progress_data['audio']:
-                        self.progress_data['audio'][lang] = {}
-                    self.progress_data['audio'][lang]['percentage'] = 100
-                    self.progress_data['audio'][lang]['downloaded_size'] = self.progress_data['audio'][lang]['total_size'] = f"{os.path.getsize(audio_file) // (1024*1024)}MB"
+                    size = os.path.getsize(audio_file)
+                    stream = self._audio_progress(audio_id)
+                    update_stream(stream, done_bytes=size, total_bytes=size, percentage=100)
                     download_progress.update_progress(self.identifier, self.progress_data)
                 else:
                     audio_cmd = await self.build_audio_command(audio_id, language_suffix)
@@ -1059,7 +1086,7 @@ class Nm3u8DLREDownloader(BaseDownloader):
                     logger.info(f"Found video file: {video_file}")
                 else:
                     logger.error("No video file found in download directory")
-                    return 1
+                    return None
 
             # Find audio files (if not from dump)
             final_audio_files = []
@@ -1091,22 +1118,29 @@ class Nm3u8DLREDownloader(BaseDownloader):
 
             logger.info(f"Video file for merging: {video_file}")
             logger.info(f"Audio files for merging (in order): {ordered_audio_files}")
+            return video_file, ordered_audio_files
+        except Exception as e:
+            logger.error(f"Download failed: {e}")
+            return None
 
-            final_file = await self._create_final_output_file(video_file, ordered_audio_files)
+    async def mux(self, video_file, audio_files):
+        """Merge the fetched streams into the final output file."""
+        try:
+            final_file = await self._create_final_output_file(video_file, audio_files)
             if not final_file:
                 return 1
-                
+
             # Update progress JSON with download complete
             self.progress_data['video']['percentage'] = 100
             for lang in self.progress_data.get('audio', {}):
                 self.progress_data['audio'][lang]['percentage'] = 100
             download_progress.update_progress(self.identifier, self.progress_data)
-            await self._update_progress_json(force=True)
-            
-            await self._record_stream_files(video_file, ordered_audio_files)
+            await self._update_progress_store(force=True)
+
+            await self._record_stream_files(video_file, audio_files)
             return 0
         except Exception as e:
-            logger.error(f"Download failed: {e}")
+            logger.error(f"Muxing failed: {e}")
             return 1
 
     async def get_stderr(self):
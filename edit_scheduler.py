@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from pyrogram.errors import FloodWait, MessageNotModified
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingEdit:
+    __slots__ = ("message", "text", "reply_markup", "terminal", "future", "submitted")
+
+    def __init__(self, message, text, reply_markup, terminal, future):
+        self.message = message
+        self.text = text
+        self.reply_markup = reply_markup
+        self.terminal = terminal
+        self.future = future
+        self.submitted = time.monotonic()
+
+
+class MessageEditScheduler:
+    """Single queue for status message edits that keeps the bot within Telegram's limits.
+
+    Each message has at most one queued edit; a newer edit replaces the queued
+    one and progress edits never replace a terminal (complete/failed) one.
+    Edits are sent under a global per-second budget and a minimum interval
+    per chat, terminal edits first. A FloodWait pauses every edit for the
+    requested time instead of failing the caller.
+
+    ``submit`` returns a future resolving to True once sent, False if the edit
+    failed and None if it was superseded.
+    """
+
+    def __init__(self, global_rate=20, private_interval=1.0, group_interval=3.0, finished_ttl=600):
+        self.global_rate = global_rate
+        self.private_interval = private_interval
+        self.group_interval = group_interval
+        self.finished_ttl = finished_ttl
+        self.pending = {}  # (chat_id, message_id) -> _PendingEdit
+        self.in_flight = set()
+        self.finished = {}  # keys whose terminal edit was sent -> time
+        self.chat_next = {}  # chat_id -> earliest time of the next edit
+        self.sent_times = deque()
+        self.paused_until = 0
+        self.wakeup = asyncio.Event()
+        self.worker = None
+
+    def submit(self, message, text, reply_markup=None, terminal=False):
+        """Queue an edit of ``message`` and return a future for its outcome."""
+        future = asyncio.get_running_loop().create_future()
+        key = (message.chat.id, message.id)
+        previous = self.pending.get(key)
+        if key in self.finished or (previous is not None and previous.terminal and not terminal):
+            future.set_result(None)
+            return future
+        if previous is not None and not previous.future.done():
+            previous.future.set_result(None)
+        self.pending[key] = _PendingEdit(message, text, reply_markup, terminal, future)
+
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._run())
+        self.wakeup.set()
+        return future
+
+    async def edit(self, message, text, reply_markup=None, terminal=False):
+        """Queue an edit and wait for its outcome."""
+        return await self.submit(message, text, reply_markup, terminal)
+
+    def _chat_interval(self, chat_id):
+        return self.group_interval if chat_id < 0 else self.private_interval
+
+    def _next_ready(self, now):
+        ready = [
+            (key, item) for key, item in self.pending.items()
+            if key not in self.in_flight and self.chat_next.get(key[0], 0) <= now
+        ]
+        if not ready:
+            return None
+        return min(ready, key=lambda entry: (not entry[1].terminal, entry[1].submitted))
+
+    async def _sleep(self, delay):
+        # Wake early when a new edit arrives
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            if not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            while self.sent_times and now - self.sent_times[0] >= 1:
+                self.sent_times.popleft()
+            if len(self.sent_times) >= self.global_rate:
+                await asyncio.sleep(1 - (now - self.sent_times[0]))
+                continue
+
+            entry = self._next_ready(now)
+            if entry is None:
+                waits = [
+                    self.chat_next.get(key[0], 0) - now
+                    for key in self.pending if key not in self.in_flight
+                ]
+                await self._sleep(max(min(waits), 0.05) if waits else None)
+                continue
+
+            key, item = entry
+            del self.pending[key]
+            self.in_flight.add(key)
+            self.chat_next[key[0]] = now + self._chat_interval(key[0])
+            self.sent_times.append(now)
+            asyncio.create_task(self._send(key, item))
+
+    async def _send(self, key, item):
+        try:
+            await item.message.edit_text(item.text, reply_markup=item.reply_markup)
+            result = True
+        except MessageNotModified:
+            result = True
+        except FloodWait as e:
+            logger.warning(f"FloodWait of {e.value}s while editing {key}; pausing all edits")
+            self.paused_until = max(self.paused_until, time.monotonic() + e.value)
+            # Retry later unless a newer edit for the message arrived meanwhile;
+            # a terminal edit still outranks newer progress edits
+            pending = self.pending.get(key)
+            if pending is None:
+                self.pending[key] = item
+            elif item.terminal and not pending.terminal:
+                self.pending[key] = item
+                if not pending.future.done():
+                    pending.future.set_result(None)
+            else:
+                item.future.set_result(None)
+            return
+        except Exception as e:
+            logger.warning(f"Failed to edit message {key}: {e}")
+            result = False
+        finally:
+            self.in_flight.discard(key)
+            self.wakeup.set()
+
+        if item.terminal and result:
+            self._mark_finished(key)
+        if not item.future.done():
+            item.future.set_result(result)
+
+    def _mark_finished(self, key):
+        now = time.monotonic()
+        self.finished[key] = now
+        for old_key in [k for k, t in self.finished.items() if now - t > self.finished_ttl]:
+            del self.finished[old_key]
+        # Anything still queued for the message is now stale
+        stale = self.pending.pop(key, None)
+        if stale is not None and not stale.future.done():
+            stale.future.set_result(None)
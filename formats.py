@@ -1,12 +1,39 @@
 import logging
 import asyncio
 import re
+import copy
 from config import pickFormats, USE_PROXY, PROXY_URL
 from hotstar import mpd_hotstar_headers
+from cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Parsed format listings keyed by (stream url, language code)
+FORMAT_CACHE_TTL = 600
+FORMAT_CACHE = TTLCache(ttl=FORMAT_CACHE_TTL)
+
 async def get_formats(url, stream_type="dash", max_retries=3):
+    """
+    Returns the available formats for a stream, reusing a recent listing of the same stream.
+    """
+    streams = url.get("streams", {})
+    stream_url = streams.get("dash") if stream_type == "dash" and streams.get("dash") else streams.get("hls")
+    if not stream_url:
+        return await _get_formats(url, stream_type, max_retries)
+
+    async def load():
+        result = await _get_formats(url, stream_type, max_retries)
+        return (result, bool(url.get("formats_from_parser"))) if result else None
+
+    cached = await FORMAT_CACHE.get_or_load((stream_url, url.get("language_code")), load)
+    if not cached:
+        return None
+    result, from_parser = cached
+    if from_parser:
+        url["formats_from_parser"] = True
+    return copy.deepcopy(result)
+
+async def _get_formats(url, stream_type="dash", max_retries=3):
     """
     Retrieves available formats for a given stream URL, focusing on Hotstar and JioHotstar.
     Tries yt-dlp first, then falls back to N_m3u8DL-RE if yt-dlp fails or for specific scenarios.
@@ -57,7 +84,7 @@ async def get_formats(url, stream_type="dash", max_retries=3):
         logger.exception(f"Error in get_formats: {str(e)}")
         if max_retries > 1:
             logger.info(f"Retrying... Attempt {max_retries - 1}/{max_retries}")
-            return await get_formats(url, stream_type, max_retries - 1)
+            return await _get_formats(url, stream_type, max_retries - 1)
         return None
 
 def get_platform_headers(platform):
@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+from asyncio import Lock, sleep, to_thread, TimeoutError as AsyncTimeoutError
+from json import loads as jloads
 from logging import getLogger, ERROR
 from time import time
 from pickle import load as pload
@@ -7,10 +9,17 @@ from io import FileIO
 from re import search as re_search
 from urllib.parse import parse_qs, urlparse, quote as rquote
 from random import randrange
+from aiofiles import open as aiopen
+from aiohttp import ClientError, ClientSession, ClientTimeout
+from google.auth.transport.requests import Request
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import (
+    MediaFileUpload,
+    MediaIoBaseDownload,
+    MediaUploadProgress,
+)
 from tenacity import (
     retry,
     wait_exponential,
@@ -32,6 +41,273 @@ from bot.helper.ext_utils.leech_utils import format_filename
 LOGGER = getLogger(__name__)
 getLogger("googleapiclient.discovery").setLevel(ERROR)
 
+# Resumable upload chunks must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+QUOTA_REASONS = ["userRateLimitExceeded", "dailyLimitExceeded"]
+
+
+def get_error_reason(content):
+    """The first error reason of a Drive API JSON error body, or None."""
+    try:
+        return jloads(content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+class DriveUploadError(Exception):
+    pass
+
+
+class DriveRateLimited(DriveUploadError):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class DriveSessionLost(DriveUploadError):
+    pass
+
+
+class DriveServerError(DriveUploadError):
+    pass
+
+
+class DriveAccount:
+    def __init__(self, index, name, credentials):
+        self.index = index
+        self.name = name
+        self.credentials = credentials
+        self.active = 0
+        self.limited_until = 0
+        self.lock = Lock()
+
+
+class AsyncDriveUploader:
+    """Resumable Google Drive uploads on the event loop.
+
+    Each upload takes the least busy service account from ``accounts``
+    (or token.pickle), so concurrent uploads spread across accounts.
+    Chunks of ``chunk_size`` bytes are streamed to the upload session;
+    after a network or server error the upload asks the session URI how
+    much Drive has and resumes from there. Rate limit errors move the
+    upload to the next account, like GoogleDriveHelper's account switching.
+    """
+
+    __UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+    __OAUTH_SCOPE = ["https://www.googleapis.com/auth/drive"]
+    __PIECE_SIZE = 1024 * 1024
+
+    def __init__(self, chunk_size=UPLOAD_CHUNK_SIZE, retries=10, quota_cooldown=3600):
+        if chunk_size % (256 * 1024):
+            raise ValueError("chunk_size must be a multiple of 256 KiB")
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.quota_cooldown = quota_cooldown
+        self.__accounts = None
+        self.__session = None
+
+    def __load_accounts(self):
+        accounts = []
+        if config_dict["USE_SERVICE_ACCOUNTS"]:
+            for json_file in sorted(listdir("accounts")):
+                credentials = service_account.Credentials.from_service_account_file(
+                    f"accounts/{json_file}", scopes=self.__OAUTH_SCOPE
+                )
+                accounts.append(DriveAccount(len(accounts), json_file, credentials))
+        elif ospath.exists("token.pickle"):
+            with open("token.pickle", "rb") as f:
+                accounts.append(DriveAccount(0, "token.pickle", pload(f)))
+        else:
+            LOGGER.error("token.pickle not found!")
+        return accounts
+
+    def __get_session(self):
+        if self.__session is None or self.__session.closed:
+            self.__session = ClientSession(
+                timeout=ClientTimeout(total=None, sock_connect=30, sock_read=300)
+            )
+        return self.__session
+
+    def __pick_account(self, tried):
+        now = time()
+        usable = [
+            account
+            for account in self.__accounts
+            if account.index not in tried and account.limited_until <= now
+        ]
+        if not usable:
+            return None
+        return min(usable, key=lambda account: account.active)
+
+    async def __headers(self, account, **headers):
+        credentials = account.credentials
+        if not credentials.valid:
+            async with account.lock:
+                if not credentials.valid:
+                    await to_thread(credentials.refresh, Request())
+        headers["Authorization"] = f"Bearer {credentials.token}"
+        return headers
+
+    async def upload(self, file_path, metadata, mime_type, progress=None, is_cancelled=None):
+        """Upload ``file_path`` as a new file described by ``metadata``.
+
+        Returns the created file resource, or None if ``is_cancelled()``
+        turned true. ``progress(current, total)`` is awaited as bytes go out.
+        """
+        if self.__accounts is None:
+            self.__accounts = self.__load_accounts()
+        total = ospath.getsize(file_path)
+        tried = set()
+        while True:
+            account = self.__pick_account(tried)
+            if account is None:
+                raise DriveUploadError(
+                    f"No Drive account left to upload with, tried {len(tried)}"
+                )
+            tried.add(account.index)
+            account.active += 1
+            try:
+                return await self.__upload_with(
+                    account, file_path, metadata, mime_type, total, progress, is_cancelled
+                )
+            except DriveRateLimited as err:
+                account.limited_until = time() + self.quota_cooldown
+                LOGGER.info(f"Got: {err.reason} on {account.name}, Trying Again.")
+            finally:
+                account.active -= 1
+
+    async def __upload_with(self, account, file_path, metadata, mime_type, total, progress, is_cancelled):
+        session = self.__get_session()
+        session_uri = None
+        offset = 0
+        resume = False
+        failures = 0
+        while True:
+            if is_cancelled is not None and is_cancelled():
+                if session_uri is not None:
+                    await self.__cancel(session, session_uri)
+                return None
+            sent_chunk = False
+            try:
+                if session_uri is None:
+                    session_uri = await self.__start(session, account, metadata, mime_type, total)
+                    offset = 0
+                    # An empty file is finished by the status query alone
+                    result = 0 if total else await self.__query(session, account, session_uri, total)
+                elif resume:
+                    result = await self.__query(session, account, session_uri, total)
+                else:
+                    sent_chunk = True
+                    result = await self.__put_chunk(
+                        session, account, session_uri, file_path, offset, total, progress
+                    )
+            except (ClientError, AsyncTimeoutError, DriveServerError, DriveSessionLost) as err:
+                failures += 1
+                if failures > self.retries:
+                    raise DriveUploadError(f"Upload of {file_path} failed: {err}") from err
+                if isinstance(err, DriveSessionLost):
+                    LOGGER.warning(f"Upload session for {file_path} expired, starting over")
+                    session_uri = None
+                delay = min(2**failures, 60)
+                LOGGER.warning(f"Upload of {file_path} failed: {err}. Resuming in {delay}s")
+                await sleep(delay)
+                resume = session_uri is not None
+                continue
+            resume = False
+            if isinstance(result, dict):
+                return result
+            if result > offset:
+                failures = 0
+            elif sent_chunk:
+                # Drive kept none of the chunk; don't resend it forever
+                failures += 1
+                if failures > self.retries:
+                    raise DriveUploadError(
+                        f"Upload of {file_path} made no progress past byte {offset}"
+                    )
+            offset = result
+
+    async def __start(self, session, account, metadata, mime_type, total):
+        headers = await self.__headers(
+            account,
+            **{"X-Upload-Content-Type": mime_type, "X-Upload-Content-Length": str(total)},
+        )
+        async with session.post(
+            self.__UPLOAD_URL,
+            params={"uploadType": "resumable", "supportsAllDrives": "true"},
+            json=metadata,
+            headers=headers,
+        ) as response:
+            if response.status == 200:
+                return response.headers["Location"]
+            await self.__handle(response)
+            raise DriveUploadError(f"Unexpected status {response.status} starting upload")
+
+    async def __put_chunk(self, session, account, session_uri, file_path, offset, total, progress):
+        end = min(offset + self.chunk_size, total) - 1
+
+        async def body():
+            sent = offset
+            async with aiopen(file_path, "rb") as f:
+                await f.seek(offset)
+                while sent <= end:
+                    piece = await f.read(min(self.__PIECE_SIZE, end - sent + 1))
+                    if not piece:
+                        break
+                    yield piece
+                    sent += len(piece)
+                    if progress is not None:
+                        await progress(sent, total)
+
+        headers = await self.__headers(
+            account,
+            **{
+                "Content-Length": str(end - offset + 1),
+                "Content-Range": f"bytes {offset}-{end}/{total}",
+            },
+        )
+        async with session.put(session_uri, data=body(), headers=headers) as response:
+            return await self.__handle(response)
+
+    async def __query(self, session, account, session_uri, total):
+        headers = await self.__headers(
+            account, **{"Content-Length": "0", "Content-Range": f"bytes */{total}"}
+        )
+        async with session.put(session_uri, headers=headers) as response:
+            return await self.__handle(response)
+
+    @staticmethod
+    async def __handle(response):
+        """The finished file resource, or the offset to continue from."""
+        if response.status in (200, 201):
+            return await response.json(content_type=None)
+        if response.status == 308:
+            received = response.headers.get("Range")
+            return int(received.rsplit("-", 1)[1]) + 1 if received else 0
+        content = await response.text()
+        if response.status in (404, 410):
+            raise DriveSessionLost(f"Upload session gone ({response.status})")
+        if response.status == 429 or response.status >= 500:
+            raise DriveServerError(f"Drive returned {response.status}")
+        reason = get_error_reason(content)
+        if reason in QUOTA_REASONS:
+            raise DriveRateLimited(reason)
+        raise DriveUploadError(f"Drive returned {response.status}: {reason or content}")
+
+    async def __cancel(self, session, session_uri):
+        try:
+            async with session.delete(session_uri):
+                pass
+        except Exception:
+            pass
+
+    async def close(self):
+        if self.__session is not None and not self.__session.closed:
+            await self.__session.close()
+
+
+drive_uploader = AsyncDriveUploader()
+
 
 class GoogleDriveHelper:
 
@@ -411,11 +687,9 @@ class GoogleDriveHelper:
         LOGGER.info(f'Created G-Drive Folder:\nName: {file.get("name")}\nID: {file_id}')
         return file_id
 
-    @retry(
-        wait=wait_exponential(multiplier=2, min=3, max=6),
-        stop=stop_after_attempt(3),
-        retry=(retry_if_exception_type(Exception)),
-    )
+    async def __upload_progress(self, current, total):
+        self.__status = MediaUploadProgress(current, total)
+
     def __upload_file(self, file_path, file_name, mime_type, dest_id, is_dir=True):
         file_name, _ = async_to_sync(
             format_filename, file_name, self.__user_id, isMirror=True
@@ -447,49 +721,15 @@ class GoogleDriveHelper:
                 .execute()
             )
             return self.__G_DRIVE_BASE_DOWNLOAD_URL.format(drive_file.get("id"))
-        media_body = MediaFileUpload(
-            file_path, mimetype=mime_type, resumable=True, chunksize=100 * 1024 * 1024
-        )
-
-        # Insert a file
-        drive_file = self.__service.files().create(
-            body=file_metadata, media_body=media_body, supportsAllDrives=True
+        # Runs on the bot loop; this thread only waits for the result
+        response = async_to_sync(
+            drive_uploader.upload,
+            file_path,
+            file_metadata,
+            mime_type,
+            progress=self.__upload_progress,
+            is_cancelled=lambda: self.__is_cancelled,
         )
-        response = None
-        retries = 0
-        while response is None and not self.__is_cancelled:
-            try:
-                self.__status, response = drive_file.next_chunk()
-            except HttpError as err:
-                if err.resp.status in [500, 502, 503, 504] and retries < 10:
-                    retries += 1
-                    continue
-                if err.resp.get("content-type", "").startswith("application/json"):
-                    reason = (
-                        eval(err.content).get("error").get("errors")[0].get("reason")
-                    )
-                    if reason not in [
-                        "userRateLimitExceeded",
-                        "dailyLimitExceeded",
-                    ]:
-                        raise err
-                    if config_dict["USE_SERVICE_ACCOUNTS"]:
-                        if self.__sa_count >= self.__sa_number:
-                            LOGGER.info(
-                                f"Reached maximum number of service accounts switching, which is {self.__sa_count}"
-                            )
-                            raise err
-                        else:
-                            if self.__is_cancelled:
-                                return
-                            self.__switchServiceAccount()
-                            LOGGER.info(f"Got: {reason}, Trying Again.")
-                            return self.__upload_file(
-                                file_path, file_name, mime_type, dest_id
-                            )
-                    else:
-                        LOGGER.error(f"Got: {reason}")
-                        raise err
         if self.__is_cancelled:
             return
         if not self.__listener.seed or self.__listener.newDir:
@@ -498,6 +738,7 @@ class GoogleDriveHelper:
             except Exception:
                 pass
         self.__file_processed_bytes = 0
+        self.__status = None
         # Insert new permissions
         if not config_dict["IS_TEAM_DRIVE"]:
             self.__set_permission(response["id"])
@@ -606,7 +847,7 @@ class GoogleDriveHelper:
             )
         except HttpError as err:
             if err.resp.get("content-type", "").startswith("application/json"):
-                reason = eval(err.content).get("error").get("errors")[0].get("reason")
+                reason = get_error_reason(err.content)
                 if reason not in [
                     "userRateLimitExceeded",
                     "dailyLimitExceeded",
@@ -1016,9 +1257,7 @@ class GoogleDriveHelper:
                     retries += 1
                     continue
                 if err.resp.get("content-type", "").startswith("application/json"):
-                    reason = (
-                        eval(err.content).get("error").get("errors")[0].get("reason")
-                    )
+                    reason = get_error_reason(err.content)
                     if reason not in [
                         "downloadQuotaExceeded",
                         "dailyLimitExceeded",
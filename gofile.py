@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import uuid
+
+import aiofiles
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+SERVERS_URL = "https://api.gofile.io/servers"
+UPLOAD_URL = "https://{server}.gofile.io/contents/uploadfile"
+# Used when the server list cannot be fetched
+FALLBACK_SERVERS = ["store8", "store1"]
+
+
+class GofileError(Exception):
+    pass
+
+
+class GofileClient:
+    """Uploads files to Gofile.
+
+    The multipart body is streamed from disk in ``chunk_size`` pieces with an
+    exact Content-Length, reporting progress as bytes go out. A failed upload
+    is retried on the next server from Gofile's server list.
+    """
+
+    def __init__(self, token=None, zone=None, chunk_size=4 * 1024 * 1024, attempts=3):
+        self.token = token
+        self.zone = zone
+        self.chunk_size = chunk_size
+        self.attempts = attempts
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+
+    async def get_servers(self, session):
+        """Upload servers suggested by Gofile, preferred zone first."""
+        try:
+            async with session.get(SERVERS_URL, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                response.raise_for_status()
+                result = await response.json()
+            if result.get("status") != "ok":
+                raise GofileError(f"server list status {result.get('status')}")
+            servers = result.get("data", {}).get("servers", [])
+            if self.zone:
+                servers.sort(key=lambda server: server.get("zone") != self.zone)
+            names = [server["name"] for server in servers if server.get("name")]
+            if names:
+                return names
+        except Exception as e:
+            logger.warning(f"Could not fetch Gofile servers, using fallbacks: {e}")
+        return list(FALLBACK_SERVERS)
+
+    async def upload(self, file_path, filename=None, progress=None):
+        """Upload ``file_path`` and return its download page URL.
+
+        ``progress(current, total)`` is awaited after every chunk sent.
+        """
+        filename = filename or os.path.basename(file_path)
+        async with aiohttp.ClientSession(timeout=self.timeout) as session:
+            servers = await self.get_servers(session)
+            last_error = None
+            for server in servers[:self.attempts]:
+                try:
+                    return await self._upload_to(session, server, file_path, filename, progress)
+                except (aiohttp.ClientError, asyncio.TimeoutError, GofileError) as e:
+                    last_error = e
+                    logger.warning(f"Gofile upload of {filename} to {server} failed: {e}")
+            raise GofileError(f"Upload failed on {min(len(servers), self.attempts)} servers: {last_error}")
+
+    async def _upload_to(self, session, server, file_path, filename, progress):
+        boundary = uuid.uuid4().hex
+        safe_name = filename.replace('"', "'")
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{safe_name}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        file_size = os.path.getsize(file_path)
+
+        async def body():
+            yield head
+            sent = 0
+            async with aiofiles.open(file_path, 'rb') as f:
+                while True:
+                    chunk = await f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+                    sent += len(chunk)
+                    if progress:
+                        await progress(sent, file_size)
+            yield tail
+
+        headers = {
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            # An explicit length keeps aiohttp from switching to chunked encoding
+            "Content-Length": str(len(head) + file_size + len(tail)),
+        }
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        logger.info(f"Uploading {filename} ({file_size} bytes) to Gofile server {server}")
+        async with session.post(UPLOAD_URL.format(server=server), data=body(), headers=headers) as response:
+            response.raise_for_status()
+            result = await response.json(content_type=None)
+
+        if result.get("status") != "ok":
+            error_message = result.get("data", {}).get("error") or result.get("status", "Unknown error")
+            raise GofileError(f"Gofile API returned an error: {error_message}")
+        download_page = result.get("data", {}).get("downloadPage")
+        if not download_page:
+            raise GofileError("Gofile API response missing downloadPage URL.")
+        return download_page
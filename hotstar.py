@@ -1,13 +1,16 @@
 import json
+import logging
 import sys
 import xml.etree.ElementTree as ET
 import asyncio
-from pywidevine.cdm import Cdm
 from pywidevine.device import Device
-from pywidevine.pssh import PSSH
 import aiohttp  # Add this import at the top of the file
 # Import proxy configuration from helpers.config
-from config import PROXY_URL, PROXIES, USE_PROXY
+from config import PROXY_URL, PROXIES, USE_PROXY, CDM_POOL_SIZE
+from cdm import CDMPool
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 # Global variables for configuration
 BASE_URL = "https://www.hotstar.com/api/internal/bff/v2/slugs/in"
@@ -41,7 +44,7 @@ HEADERS = {
 
 # Load Widevine device
 DEVICE = Device.load("samsung_sm-g935f.wvd")
-CDM = Cdm.from_device(DEVICE)
+CDM_POOL = CDMPool(DEVICE, CDM_POOL_SIZE)
 
 # DRY: Default parameters
 CLIENT_CAPABILITIES = {
@@ -88,8 +91,39 @@ def extract_player_data(data):
     content_metadata = player.get("player_config", {}).get("content_metadata", {})
     return player, media_asset, content_metadata
 
+# Shared HTTP client for BFF, manifest and license requests
+HTTP_SESSION = None
+
+def get_http_session():
+    """Return the shared aiohttp session, creating it on first use"""
+    global HTTP_SESSION
+    if HTTP_SESSION is None or HTTP_SESSION.closed:
+        HTTP_SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+    return HTTP_SESSION
+
+async def close_http_session():
+    """Close the shared aiohttp session"""
+    global HTTP_SESSION
+    if HTTP_SESSION is not None and not HTTP_SESSION.closed:
+        await HTTP_SESSION.close()
+    HTTP_SESSION = None
+
+# Short-lived caches in front of BFF lookups, manifests and licenses
+BFF_CACHE_TTL = 60
+MANIFEST_CACHE_TTL = 600
+KEY_CACHE_TTL = 3600
+BFF_CACHE = TTLCache(ttl=BFF_CACHE_TTL)
+MANIFEST_CACHE = TTLCache(ttl=MANIFEST_CACHE_TTL)
+KEY_CACHE = TTLCache(ttl=KEY_CACHE_TTL)
+
 async def make_request(url, method="GET", **kwargs):
-    """Make HTTP request with proxy support"""
+    """Make HTTP request with proxy support
+
+    GET responses are cached for ``cache_ttl`` seconds (BFF_CACHE_TTL by default).
+    """
     # Prepare proxy settings if enabled
     proxy = None
     if USE_PROXY:
@@ -100,33 +134,35 @@ async def make_request(url, method="GET", **kwargs):
     data = kwargs.get('data', None)
     params = kwargs.get('params', None)
     
-    async with aiohttp.ClientSession() as session:
-        if method == "GET":
-            async with session.get(url, headers=headers, proxy=proxy, params=params) as response:
-                if response.status != 200:
-                    raise aiohttp.ClientResponseError(
-                        response.request_info,
-                        response.history,
-                        status=response.status
-                    )
-                response_data = await response.json()
-                # Save the JSON response to a file
-                with open(f"response_{url.split('/')[-1]}.json", "w") as f:
-                    json.dump(response_data, f, indent=4)
-                return response_data
-        elif method == "POST":
-            async with session.post(url, headers=headers, proxy=proxy, data=data) as response:
-                if response.status != 200:
-                    raise aiohttp.ClientResponseError(
-                        response.request_info,
-                        response.history,
-                        status=response.status
-                    )
-                response_data = await response.json()
-                # Save the JSON response to a file
-                with open(f"response_post_{url.split('/')[-1]}.json", "w") as f:
-                    json.dump(response_data, f, indent=4)
-                return response_data
+    if method == "GET":
+        cache_key = (url, json.dumps(params, sort_keys=True) if params else "")
+        return await BFF_CACHE.get_or_load(
+            cache_key, _send_request, url, method, headers, proxy, params, data,
+            ttl=kwargs.get('cache_ttl')
+        )
+    elif method == "POST":
+        return await _send_request(url, method, headers, proxy, params, data)
+
+async def _send_request(url, method, headers, proxy, params, data):
+    session = get_http_session()
+    if method == "GET":
+        request = session.get(url, headers=headers, proxy=proxy, params=params)
+        dump_name = f"response_{url.split('/')[-1]}.json"
+    else:
+        request = session.post(url, headers=headers, proxy=proxy, data=data)
+        dump_name = f"response_post_{url.split('/')[-1]}.json"
+    async with request as response:
+        if response.status != 200:
+            raise aiohttp.ClientResponseError(
+                response.request_info,
+                response.history,
+                status=response.status
+            )
+        response_data = await response.json()
+        # Save the JSON response to a file
+        with open(dump_name, "w") as f:
+            json.dump(response_data, f, indent=4)
+        return response_data
 
 async def setup():
     """Async setup if needed in the future"""
@@ -176,7 +212,7 @@ async def get_content_url(content_id, content_type="movies", title_slug=""):
             info["pssh"], info["subtitles"] = await extract_pssh(mpd_url)
         return info
     except aiohttp.ClientError as e:
-        print(f"Error: {str(e)}")
+        logger.error(f"Error fetching content {content_id}: {e}")
         return None
 
 async def get_series_content(show_id, episode_id, title_slug, episode_title):
@@ -202,140 +238,155 @@ async def get_series_content(show_id, episode_id, title_slug, episode_title):
             info["pssh"], info["subtitles"] = await extract_pssh(mpd_url)
         return info
     except aiohttp.ClientError as e:
-        print(f"Error: {str(e)}")
+        logger.error(f"Error fetching episode {episode_id} of show {show_id}: {e}")
         return None
 
+# MPD parsing constants
+MPD_NAMESPACES = {
+    'dash': 'urn:mpeg:dash:schema:mpd:2011',
+    'cenc': 'urn:mpeg:cenc:2013',
+    'mspr': 'urn:microsoft:playready'
+}
+WIDEVINE_SYSTEM_ID = 'edef8ba9-79d6-4ace-a3c8-27dcd51d21ed'
+MPD_CHUNK_SIZE = 64 * 1024
+
+mpd_request_headers = {
+    "accept": "*/*",
+    "accept-encoding": "gzip, deflate",
+    "accept-language": "en-US,en;q=0.9",
+    "origin": "https://www.hotstar.com",
+    "referer": "https://www.hotstar.com/",
+    "user-agent": mpd_hotstar_headers["user-agent"]
+}
+
+def _dash_tag(name):
+    return f"{{{MPD_NAMESPACES['dash']}}}{name}"
+
+class MPDScanner:
+    """Incremental MPD scanner that collects the Widevine PSSH and text tracks."""
+
+    def __init__(self, mpd_url):
+        self.base_url = mpd_url.split('?')[0].rsplit('/', 1)[0] + '/'
+        self.parser = ET.XMLPullParser(events=("start", "end"))
+        self.video_pssh = None
+        self.fallback_pssh = None
+        self.subtitles = []
+        self.done = False
+        self._adaptation_set = None
+
+    @property
+    def pssh(self):
+        return self.video_pssh or self.fallback_pssh
+
+    def feed(self, chunk):
+        """Feed a chunk of MPD bytes; returns True once scanning can stop"""
+        self.parser.feed(chunk)
+        for event, elem in self.parser.read_events():
+            if event == "start":
+                self._on_start(elem)
+            else:
+                self._on_end(elem)
+            if self.done:
+                break
+        return self.done
+
+    def _on_start(self, elem):
+        if elem.tag == _dash_tag("AdaptationSet"):
+            self._adaptation_set = {
+                "video": elem.get('contentType') == 'video' or elem.get('mimeType', '').startswith('video/'),
+                "text": elem.get('contentType') == 'text',
+                "lang": elem.get('lang', 'unknown'),
+                "representations": 0,
+                "base_url": None
+            }
+        elif elem.tag == _dash_tag("Representation") and self._adaptation_set:
+            self._adaptation_set["representations"] += 1
+
+    def _on_end(self, elem):
+        adaptation_set = self._adaptation_set
+        if elem.tag == _dash_tag("ContentProtection"):
+            if WIDEVINE_SYSTEM_ID in elem.get('schemeIdUri', '').lower():
+                pssh = elem.find('.//cenc:pssh', MPD_NAMESPACES)
+                if pssh is not None and pssh.text:
+                    if adaptation_set and adaptation_set["video"] and not self.video_pssh:
+                        self.video_pssh = pssh.text.strip()
+                    if not self.fallback_pssh:
+                        self.fallback_pssh = pssh.text.strip()
+        elif elem.tag == _dash_tag("BaseURL"):
+            # Only the first Representation of a text AdaptationSet is used
+            if (adaptation_set and adaptation_set["text"] and adaptation_set["representations"] == 1
+                    and adaptation_set["base_url"] is None and elem.text):
+                adaptation_set["base_url"] = elem.text
+        elif elem.tag == _dash_tag("AdaptationSet"):
+            if adaptation_set and adaptation_set["text"] and adaptation_set["base_url"]:
+                lang = adaptation_set["lang"]
+                self.subtitles.append({
+                    "language": lang,
+                    "url": self.base_url + adaptation_set["base_url"],
+                    "format": "vtt",  # Default format for Hotstar subtitles
+                    "languageCode": lang.lower(),
+                    "subtype": "Normal"
+                })
+            self._adaptation_set = None
+            elem.clear()
+        elif elem.tag == _dash_tag("Period"):
+            # Every AdaptationSet of the period has been seen by now
+            if self.pssh:
+                self.done = True
+
 async def extract_pssh(mpd_url):
     """Extract Widevine PSSH and subtitles from MPD URL"""
     # Skip processing for m3u8 files - check URL path part before query parameters
     if '.m3u8' in mpd_url.split('?')[0]:
-        print(f"Skipping PSSH extraction: URL is an m3u8 file, not an MPD file")
+        logger.info("Skipping PSSH extraction: URL is an m3u8 file, not an MPD file")
         return None, []
-        
+
+    result = await MANIFEST_CACHE.get_or_load(mpd_url, _scan_manifest, mpd_url)
+    if result is None:
+        return None, []
+    pssh_value, subtitles = result
+    return pssh_value, [dict(sub) for sub in subtitles]
+
+async def _scan_manifest(mpd_url):
+    """Fetch and scan a manifest, returning (pssh, subtitles) or None on failure"""
+    scanner = MPDScanner(mpd_url)
+    proxy = PROXY['http'] if USE_PROXY else None
     try:
-        # Construct curl command to get MPD content directly
-        curl_command = [
-            'curl',
-            '--compressed',
-            '--silent',  # Don't show progress
-            '-H', 'accept: */*',
-            '-H', 'accept-encoding: gzip, deflate',
-            '-H', 'accept-language: en-US,en;q=0.9',
-            '-H', 'origin: https://www.hotstar.com',
-            '-H', 'referer: https://www.hotstar.com/',
-            '-H', f'user-agent: {mpd_hotstar_headers["user-agent"]}',
-            mpd_url
-        ]
-        
-        if USE_PROXY:
-            curl_command.extend(['--proxy', PROXY['http']])
-        
-        # Execute curl command asynchronously using asyncio.create_subprocess_exec
-        process = await asyncio.create_subprocess_exec(
-            *curl_command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        # Wait for the process to complete and get output
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode != 0:
-            print("Failed to fetch MPD content - curl command failed")
-            return None, []
-            
-        # Parse MPD content directly from curl output
-        try:
-            root = ET.fromstring(stdout.decode('utf-8'))
-        except ET.ParseError as e:
-            print(f"XML parsing error: {e}")
-            # Try to clean the content
-            clean_content = ''.join(char for char in stdout.decode('utf-8') if ord(char) < 128)
-            try:
-                root = ET.fromstring(clean_content)
-            except ET.ParseError as e2:
-                print(f"Failed to parse even after cleaning: {e2}")
-                return None, []
-        
-        # Define XML namespaces
-        namespaces = {
-            'dash': 'urn:mpeg:dash:schema:mpd:2011',
-            'cenc': 'urn:mpeg:cenc:2013',
-            'mspr': 'urn:microsoft:playready'
-        }
-        
-        # Extract base URL from MPD URL for subtitles
-        base_url_parts = mpd_url.split('?')[0].rsplit('/', 1)[0] + '/'
-        
-        # Initialize PSSH and subtitles list
-        pssh_value = None
-        subtitles = []
-        
-        # First check in Period/AdaptationSet/ContentProtection for PSSH
-        for adaptation_set in root.findall('.//dash:AdaptationSet', namespaces):
-            if adaptation_set.get('contentType') == 'video' or adaptation_set.get('mimeType', '').startswith('video/'):
-                for content_protection in adaptation_set.findall('.//dash:ContentProtection', namespaces):
-                    scheme_id_uri = content_protection.get('schemeIdUri', '')
-                    if 'edef8ba9-79d6-4ace-a3c8-27dcd51d21ed' in scheme_id_uri.lower():  # Widevine
-                        # Try to find pssh in cenc:pssh
-                        pssh = content_protection.find('.//cenc:pssh', namespaces)
-                        if pssh is not None and pssh.text:
-                            pssh_value = pssh.text.strip()
-                            break
+        session = get_http_session()
+        async with session.get(mpd_url, headers=mpd_request_headers, proxy=proxy) as response:
+            if response.status != 200:
+                logger.warning(f"Failed to fetch MPD content - HTTP {response.status}")
+                return None
 
-        # If not found in AdaptationSet, check in Period/ContentProtection
-        if not pssh_value:
-            for content_protection in root.findall('.//dash:ContentProtection', namespaces):
-                scheme_id_uri = content_protection.get('schemeIdUri', '')
-                if 'edef8ba9-79d6-4ace-a3c8-27dcd51d21ed' in scheme_id_uri.lower():
-                    pssh = content_protection.find('.//cenc:pssh', namespaces)
-                    if pssh is not None and pssh.text:
-                        pssh_value = pssh.text.strip()
-                        break
-        
-        # Extract subtitles from MPD
-        for adaptation_set in root.findall('.//dash:AdaptationSet[@contentType="text"]', namespaces):
-            lang = adaptation_set.get('lang', 'unknown')
-            
-            # Get the representation element
-            representation = adaptation_set.find('.//dash:Representation', namespaces)
-            if representation is not None:
-                # Get BaseURL
-                base_url_element = representation.find('.//dash:BaseURL', namespaces)
-                if base_url_element is not None and base_url_element.text:
-                    # Combine with base URL if needed
-                    subtitle_url = base_url_parts + base_url_element.text
-                    
-                    subtitle_info = {
-                        "language": lang,
-                        "url": subtitle_url,
-                        "format": "vtt",  # Default format for Hotstar subtitles
-                        "languageCode": lang.lower(),
-                        "subtype": "Normal"
-                    }
-                    subtitles.append(subtitle_info)
-        
-        # Print subtitle information
-        if subtitles:
-            print("\nExtracted Subtitles from MPD:")
-            print("="*50)
-            for sub in subtitles:
-                print(f"Language: {sub['language']}")
-                print(f"URL: {sub['url']}")
-                print(f"Format: {sub['format']}")
-                print(f"Language Code: {sub['languageCode']}")
-                print("-"*50)
-        else:
-            print("\nNo subtitles found in the MPD file.")
-        
-        if not pssh_value and len(subtitles) == 0:
-            print("No Widevine PSSH or subtitles found in MPD content")
-            
-        return pssh_value, subtitles
-        
+            # Parse the manifest as it streams in and stop once everything is found
+            async for chunk in response.content.iter_chunked(MPD_CHUNK_SIZE):
+                if scanner.feed(chunk):
+                    break
+    except ET.ParseError as e:
+        logger.warning(f"XML parsing error in {mpd_url}: {e}")
+        if not scanner.pssh and not scanner.subtitles:
+            return None
     except Exception as e:
-        print(f"Error extracting PSSH and subtitles: {str(e)}")
-        return None, []
+        logger.error(f"Error extracting PSSH and subtitles: {e}")
+        return None
+
+    pssh_value, subtitles = scanner.pssh, scanner.subtitles
+        
+    # Log subtitle information
+    if subtitles:
+        logger.info(f"Extracted {len(subtitles)} subtitles from MPD: " + ", ".join(
+            f"{sub['language']} ({sub['languageCode']}, {sub['format']})" for sub in subtitles
+        ))
+        for sub in subtitles:
+            logger.debug(f"Subtitle {sub['languageCode']}: {sub['url']}")
+    else:
+        logger.info("No subtitles found in the MPD file.")
+    
+    if not pssh_value and len(subtitles) == 0:
+        logger.warning("No Widevine PSSH or subtitles found in MPD content")
+        return None
+
+    return pssh_value, subtitles
 
 async def get_sports_content(sport_type, match_title, content_id, content_subtype="", language=None):
     if language is None:
@@ -358,39 +409,34 @@ async def get_sports_content(sport_type, match_title, content_id, content_subtyp
         if mpd_url and ".m3u8" not in mpd_url.split('?')[0]:
             info["pssh"], info["subtitles"] = await extract_pssh(mpd_url)
             if info["pssh"] is None:
-                print(f"Failed to extract PSSH for content ID: {content_id}")
+                logger.warning(f"Failed to extract PSSH for content ID: {content_id}")
         else:
             if not mpd_url:
-                print(f"No MPD URL found for content ID: {content_id}")
+                logger.warning(f"No MPD URL found for content ID: {content_id}")
         return info
     except aiohttp.ClientError as e:
         return {"error": str(e)}
 
 async def get_keys(pssh_str, license_url):
-    """Extract keys using Widevine CDM"""
+    """Extract keys using Widevine CDM, reusing keys already fetched for the PSSH"""
+    keys = await KEY_CACHE.get_or_load(pssh_str, _fetch_keys, pssh_str, license_url)
+    return list(keys) if keys else keys
+
+async def _fetch_keys(pssh_str, license_url):
+    async def send_challenge(challenge):
+        session = get_http_session()
+        async with session.post(license_url, data=challenge) as response:
+            if response.status != 200:
+                return None
+            return await response.read()
+
     try:
-        # Prepare PSSH
-        pssh = PSSH(pssh_str)
-        
-        # Open CDM session
-        session_id = CDM.open()
-        
-        # Get license challenge
-        challenge = CDM.get_license_challenge(session_id, pssh)
-        
-        # Send license challenge
-        async with aiohttp.ClientSession() as session:
-            async with session.post(license_url, data=challenge) as response:
-                if response.status != 200:
-                    return None
-                license_data = await response.read()
-        
-        # Parse license
-        CDM.parse_license(session_id, license_data)
-        
-        # Get keys
+        keys = await CDM_POOL.get_keys(pssh_str, send_challenge)
+        if keys is None:
+            return None
+
         formatted_keys = []
-        for key in CDM.get_keys(session_id):
+        for key in keys:
             if hasattr(key, 'kid') and hasattr(key, 'key'):
                 # Remove dashes from UUID and convert to lowercase
                 kid = str(key.kid).replace('-', '')
@@ -398,11 +444,9 @@ async def get_keys(pssh_str, license_url):
                 key_bytes = ''.join([f'{b:02x}' for b in key.key])
                 formatted_keys.append(f"{kid}:{key_bytes}")
         
-        # Close session
-        CDM.close(session_id)
-        
         return formatted_keys
     except Exception as e:
+        logger.error(f"Error getting keys: {e}")
         return None
 
 async def get_series_episode(series_id, season_num, episode_num, series_title):
@@ -410,7 +454,7 @@ async def get_series_episode(series_id, season_num, episode_num, series_title):
     try:
         # Step 1: Get series details to find season IDs
         series_url = f"https://www.hotstar.com/api/internal/bff/v2/slugs/in/shows/{series_title}/{series_id}"
-        print("Found Series ID")
+        logger.info(f"Found Series ID {series_id}")
         
         series_response = await make_request(series_url, headers=HEADERS)
         series_data = series_response
@@ -489,7 +533,7 @@ async def get_series_episode(series_id, season_num, episode_num, series_title):
             
             if episode_tag == f"S{season_num} E{episode_num}":
                 target_episode = playable_content
-                print("Found Episode ID")
+                logger.info(f"Found Episode ID for S{season_num} E{episode_num}")
                 break
         
         if not target_episode:
@@ -521,7 +565,7 @@ async def get_clip_content(clip_id, title_slug=""):
             info["pssh"], info["subtitles"] = await extract_pssh(mpd_url)
         return info
     except aiohttp.ClientError as e:
-        print(f"Error: {str(e)}")
+        logger.error(f"Error fetching clip {clip_id}: {e}")
         return None
 
 def get_first_available(lst, *keys):
@@ -535,6 +579,9 @@ def get_nested(data, *keys, default=None):
     for key in keys:
         if isinstance(data, dict):
             data = data.get(key, default)
+        elif isinstance(data, list) and isinstance(key, int):
+            # Missing list items (e.g. an empty widget_wrappers) give the default
+            data = data[key] if -len(data) <= key < len(data) else default
         else:
             return default
     return data
@@ -554,45 +601,89 @@ def get_season_episode_num(content_info):
 def get_title(content_info, fallback):
     return content_info.get('title', '') or get_nested(content_info, 'content_metadata', 'title', default='') or fallback
 
-async def select_language(url, language, selected_language_name):
-    if language is not None and selected_language_name is not None:
-        return language, selected_language_name
+def normalize_url(url):
+    """Canonical form of a Hotstar URL, so variants of the same link compare equal"""
+    path = url.strip().split("#")[0].split("?")[0]
+    path = path.split("hotstar.com/", 1)[-1].strip("/")
+    if path.startswith("in/"):
+        path = path[3:]
+    return f"https://www.hotstar.com/in/{path}"
+
+def get_next_episode_url(info):
+    """Build the season-episode URL of the episode after the one in ``info``"""
+    episode_number = info.get("episode_number", "")
+    if not (episode_number.startswith("S") and "E" in episode_number):
+        return None
+    try:
+        season_num, episode_num = map(int, episode_number[1:].split("E"))
+    except ValueError:
+        return None
+
+    url = info.get("content_url", "")
+    if "/shows/" in url:
+        parts = url.split("?")[0].split("/shows/")[1].strip("/").split("/")
+        if len(parts) < 2:
+            return None
+        return f"https://www.hotstar.com/in/shows/{parts[0]}/{parts[1]}/{season_num}-{episode_num + 1}"
+
+    parts = url.replace("https://www.hotstar.com/", "").replace("in/", "").strip("/").split("/")
+    if parts[0].isdigit():
+        return f"https://www.hotstar.com/in/{parts[0]}/{season_num}-{episode_num + 1}"
+    return None
+
+# Default language options when the API doesn't return any
+DEFAULT_SPORTS_LANGUAGES = [
+    {"name": "Hindi", "iso3code": "hin"},
+    {"name": "English", "iso3code": "eng"},
+    {"name": "Tamil", "iso3code": "tam"},
+    {"name": "Telugu", "iso3code": "tel"},
+    {"name": "Bengali", "iso3code": "ben"},
+    {"name": "Malayalam", "iso3code": "mal"},
+    {"name": "Kannada", "iso3code": "kan"},
+    {"name": "Marathi", "iso3code": "mar"}
+]
+
+# Audio language lists per sports content ID, shared by the bot UI and select_language
+SPORTS_LANGUAGE_TTL = 300
+SPORTS_LANGUAGES = TTLCache(ttl=SPORTS_LANGUAGE_TTL)
+
+def parse_sports_ids(url):
+    """Return (sport_type, content_id) for a Hotstar sports URL"""
     parts = url.split("/sports/")[1].split("/")
     sport_type = parts[0]
     content_id = parts[-4] if "video/highlights/watch" in url or "video/replay/watch" in url else parts[-2]
+    return sport_type, content_id
+
+async def _fetch_sports_languages(sport_type, content_id):
     initial_url = f"{BASE_URL}/sports/{sport_type}/dummy/{content_id}/watch"
+    initial_response = await make_request(initial_url, headers=HEADERS)
+    player_data = get_nested(initial_response, "success", "page", "spaces", "player", "widget_wrappers", 0, "widget", "data", default={})
+    return get_nested(player_data, "player_config", "content_metadata", "audio_languages", default=[]) or []
+
+async def get_sports_languages(sport_type, content_id):
+    """Get the audio languages of a sports content ID, one upstream lookup per TTL window"""
+    languages = await SPORTS_LANGUAGES.get_or_load(content_id, _fetch_sports_languages, sport_type, content_id)
+    return list(languages)
+
+async def select_language(url, language, selected_language_name):
+    if language is not None and selected_language_name is not None:
+        return language, selected_language_name
+    sport_type, content_id = parse_sports_ids(url)
     try:
-        initial_response = await make_request(initial_url, headers=HEADERS)
-        player_data = get_nested(initial_response, "success", "page", "spaces", "player", "widget_wrappers", 0, "widget", "data", default={})
-        available_languages = get_nested(player_data, "player_config", "content_metadata", "audio_languages", default=[])
-        if available_languages:
-            selected_lang = available_languages[0]
-            return selected_lang['iso3code'].lower(), selected_lang['name']
-        else:
-            default_languages = [
-                {"name": "Hindi", "iso3code": "hin"},
-                {"name": "English", "iso3code": "eng"},
-                {"name": "Tamil", "iso3code": "tam"},
-                {"name": "Telugu", "iso3code": "tel"},
-                {"name": "Bengali", "iso3code": "ben"},
-                {"name": "Malayalam", "iso3code": "mal"},
-                {"name": "Kannada", "iso3code": "kan"},
-                {"name": "Marathi", "iso3code": "mar"}
-            ]
-            selected_lang = default_languages[0]
-            return selected_lang['iso3code'].lower(), selected_lang['name']
+        available_languages = await get_sports_languages(sport_type, content_id)
+        selected_lang = (available_languages or DEFAULT_SPORTS_LANGUAGES)[0]
+        return selected_lang['iso3code'].lower(), selected_lang['name']
     except Exception:
         return None, None
 
 async def main(url=None, language=None, selected_language_name=None):
     await setup()
     if not url:
-        print("Enter Hotstar URL: ", end="")
-        url = input().strip()
+        url = input("Enter Hotstar URL: ").strip()
     if "/sports/" in url and (language is None or selected_language_name is None):
         language, selected_language_name = await select_language(url, language, selected_language_name)
         if not language:
-            print("Error fetching languages.")
+            logger.error("Error fetching languages.")
             return None
     url_path = url.replace("https://www.hotstar.com/", "").replace("in/", "").strip("/")
     parts = url_path.split("/")
@@ -609,7 +700,7 @@ async def main(url=None, language=None, selected_language_name=None):
                         episode_title = clean_episode_title(content_info['episode_title'])
                         episode_number = get_season_episode_num(content_info)
             except (ValueError, IndexError):
-                print("Invalid season-episode format")
+                logger.error("Invalid season-episode format")
                 return
         else:
             for fn, t in [
@@ -707,14 +798,17 @@ async def main(url=None, language=None, selected_language_name=None):
             "language_code": language,
             "subtitles": content_info.get("subtitles", [])
         }
-        print(json.dumps(info, indent=4))
+        logger.debug(json.dumps(info, indent=4))
         return info
     elif content_info and isinstance(content_info, dict) and content_info.get('error'):
-        print(f"Error: {content_info['error']}")
+        logger.error(f"Error: {content_info['error']}")
         return None
     else:
-        print("Failed to retrieve content information")
+        logger.error("Failed to retrieve content information")
         return None
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    logging.basicConfig(level=logging.INFO)
+    info = asyncio.run(main())
+    if info:
+        print(json.dumps(info, indent=4))
@@ -0,0 +1,86 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class DailyRotatingFileHandler(RotatingFileHandler):
+    """Writes to ``<prefix>_YYYYMMDD.log``, starting a new file each day and
+    rotating by size within a day."""
+
+    def __init__(self, prefix, max_bytes, backup_count):
+        self.prefix = prefix
+        self.day = self._today()
+        super().__init__(
+            self._path(self.day), maxBytes=max_bytes, backupCount=backup_count,
+            encoding='utf-8', delay=True
+        )
+
+    @staticmethod
+    def _today():
+        return datetime.now().strftime("%Y%m%d")
+
+    def _path(self, day):
+        return os.path.abspath(f"{self.prefix}_{day}.log")
+
+    def shouldRollover(self, record):
+        if self._today() != self.day:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        today = self._today()
+        if today == self.day:
+            return super().doRollover()
+        # New day: switch to that day's file instead of renaming
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.day = today
+        self.baseFilename = self._path(today)
+
+
+def setup_logging(prefix="bot", level=logging.INFO, max_bytes=50 * 1024 * 1024, backup_count=5):
+    """Route all logging through a queue drained by a background thread.
+
+    Callers only enqueue records; formatting and the file/stdout writes happen
+    on the listener thread, so slow disks never stall the event loop.
+    Replaces any handlers installed earlier (e.g. by an imported module's
+    basicConfig).
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = DailyRotatingFileHandler(prefix, max_bytes, backup_count)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Only the message (with any traceback) is rendered before queueing;
+    # the listener's handlers add the timestamp and level
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=level, handlers=[queue_handler], force=True)
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
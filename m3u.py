@@ -1,11 +1,10 @@
 # Standard library imports
 import functools
-import os, shutil, asyncio, json, logging, time, threading, re, signal
-from datetime import datetime, timedelta
+import copy
+import os, shutil, asyncio, json, logging, time, re, signal
 
 # Third party imports
 import uvloop  # type: ignore
-import aiohttp, aiofiles
 from pyrogram import Client, filters, idle
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery, Message
 from pyrogram.errors import MessageNotModified, FloodWait, UserIsBlocked, InputUserDeactivated, PeerIdInvalid
@@ -26,7 +25,7 @@ from session import PremiumSessionPool
 from utils import (
     get_thumbnail, cleanup_old_files, get_available_drive,
     get_isolated_download_path, store_content_info, cleanup_download_dir,
-    get_drive_config
+    get_drive_config, content_store, drive_allocator, get_drive_remote, rclone_daemons
 )
 from download import (
     YTDLPDownloader, Nm3u8DLREDownloader,
@@ -34,9 +33,27 @@ from download import (
 )
 from config import (
     MP4_USER_IDS, USE_PROXY, PROXY_URL,
-    pickFormats, get_iso_639_2
+    pickFormats, get_iso_639_2,
+    PREFETCH_NEXT_EPISODE, PREFETCH_MAX_CONCURRENT, PREFETCH_MAX_PER_WINDOW,
+    PREFETCH_WINDOW, PREFETCH_TTL,
+    LOG_FILE_PREFIX, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+    GOFILE_TOKEN, GOFILE_ZONE, GOFILE_CHUNK_SIZE, GOFILE_ATTEMPTS,
+    RCLONE_UPLOAD_DIR, SPLIT_LARGE_UPLOADS, SPLIT_PART_SIZE_MB, SPLIT_UPLOAD_CONCURRENCY,
+    PIPELINE_FETCH_WORKERS, PIPELINE_MUX_WORKERS, PIPELINE_POSTPROCESS_WORKERS,
+    PIPELINE_UPLOAD_WORKERS, PIPELINE_QUEUE_SIZE
 )
 from formats import get_formats
+from prefetch import EpisodePrefetcher
+from progress import (
+    ProgressBus, format_speed, format_eta, update_stream, iter_streams,
+    total_speed, job_eta
+)
+from edit_scheduler import MessageEditScheduler
+from log_setup import setup_logging
+from gofile import GofileClient
+from cache import SingleFlight
+from pipeline import Pipeline, Stage
+from store import SelectionStore, QuotaLedger, WatchedFile, DeliveryIndex
 from database import Database
 from typing import Optional, List, Dict, Any
 
@@ -51,14 +68,8 @@ class SuppressSSLShutdownTimeout(logging.Filter):
         msg = str(record.getMessage())
         return "Error while closing connector: ClientConnectionError('Connection lost: SSL shutdown timed out'" not in msg
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(f'bot_{datetime.now().strftime("%Y%m%d")}.log'),
-        logging.StreamHandler()
-    ]
-)
+# Log records are written by a background thread, never by the event loop
+setup_logging(LOG_FILE_PREFIX, logging.INFO, LOG_MAX_BYTES, LOG_BACKUP_COUNT)
 
 logger = logging.getLogger(__name__)
 logger.addFilter(SuppressSSLShutdownTimeout())
@@ -114,24 +125,19 @@ TRIAL_RESTRICTED_PLATFORMS = {
     "Jio Hotstar": "Jio Hotstar is not available in trial mode",
 }
 
-# Load premium users from premium referrals JSON
+# Premium users from the premium referrals JSON, re-read when the file changes
+premium_users_file = WatchedFile(
+    'data/premium_referrals.json',
+    parse=lambda premium_data: set(map(int, premium_data.keys())),
+    default=set()
+)
+
 async def get_premium_users_async():
-    try:
-        async with aiofiles.open('data/premium_referrals.json', 'r') as f:
-            content = await f.read()
-            premium_data = await asyncio.to_thread(json.loads, content)
-            return set(map(int, premium_data.keys()))
-    except (FileNotFoundError, json.JSONDecodeError):
-        return set()
+    return get_premium_users()
 
 def get_premium_users():
-    """Get premium users synchronously"""
-    try:
-        with open('data/premium_referrals.json', 'r') as f:
-            premium_data = json.load(f)
-            return set(map(int, premium_data.keys()))
-    except (FileNotFoundError, json.JSONDecodeError):
-        return set()
+    """Get premium users from memory"""
+    return premium_users_file.value
 
 # Base full access users
 BASE_FULL_ACCESS = {7815873054, 7361945688, 7172796863, 7708998008, 5802285154, 7465574522}
@@ -140,9 +146,18 @@ OWNERS = {7815873054, 7361945688, 7172796863, 7111427245}
 # Users with special platform access
 TATAPLAY_USER = {7815873054, 7361945688, 7172796863}  # Kept for structural integrity if other special users are added later
 
+_full_access_cache = (None, None, set())
+
 def get_full_access_users():
     """Get all users with full access by combining base users and premium users"""
-    return BASE_FULL_ACCESS | get_premium_users()
+    global _full_access_cache
+    base, premium, combined = _full_access_cache
+    premium_users = get_premium_users()
+    # Rebuild the union only when either source set has been replaced
+    if base is not BASE_FULL_ACCESS or premium is not premium_users:
+        combined = BASE_FULL_ACCESS | premium_users
+        _full_access_cache = (BASE_FULL_ACCESS, premium_users, combined)
+    return combined
 
 MP4_USER_IDS = {"1822859631"}  # User IDs that get mp4 extension instead of mkv
 
@@ -163,9 +178,15 @@ TRIAL_COOLDOWN_FAIL = 3 * 60  # 3 minutes in seconds
 
 MAX_DOWNLOAD_RETRIES = 2
 
-# Add semaphore for controlling concurrent downloads/uploads
-download_semaphore = asyncio.Semaphore(10)  # Allow 10 concurrent downloads
-upload_semaphore = asyncio.Semaphore(10)  # Allow 10 concurrent uploads
+# Background resolution of the next episode; skipped while download slots are full
+episode_prefetcher = EpisodePrefetcher(
+    max_concurrent=PREFETCH_MAX_CONCURRENT,
+    max_per_window=PREFETCH_MAX_PER_WINDOW,
+    window=PREFETCH_WINDOW,
+    ttl=PREFETCH_TTL,
+    can_run=lambda: not download_pipeline.busy('fetch'),
+    enabled=PREFETCH_NEXT_EPISODE
+)
 
 # Lock state file
 LOCK_FILE = 'data/bot_lock.json'
@@ -175,18 +196,16 @@ MEMORY_LOCKED = False  # In-memory lock for /block -x
 def is_bot_locked():
     return MEMORY_LOCKED or _is_file_locked()
 
+bot_lock_file = WatchedFile(LOCK_FILE, parse=lambda data: bool(data.get('locked', False)), default=False)
+
 def _is_file_locked():
-    try:
-        with open(LOCK_FILE, 'r') as f:
-            data = json.load(f)
-            return data.get('locked', False)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return False
+    return bot_lock_file.value
 
 def set_bot_lock(state: bool):
     os.makedirs('data', exist_ok=True)
     with open(LOCK_FILE, 'w') as f:
         json.dump({'locked': state}, f)
+    bot_lock_file.reload()
 
 LOCK_MESSAGE = (
     "🚫 **Bot is temporarily locked by admin.**\n\n"
@@ -228,6 +247,39 @@ async def unlock_bot(client, message):
     set_bot_lock(False)
     await message.reply("🔓 Bot unlocked. All actions are now enabled.")
 
+@app.on_message(filters.command(["reload"]))
+@owner_only
+async def reload_access(client, message):
+    """Re-read premium users and the lock file without waiting for the watcher."""
+    premium_users = premium_users_file.reload()
+    locked = bot_lock_file.reload()
+    await message.reply(
+        f"🔄 Access lists reloaded.\n\n"
+        f"**Premium users:** `{len(premium_users)}`\n"
+        f"**File lock:** `{'On' if locked else 'Off'}`"
+    )
+
+@app.on_message(filters.command(["sessions"]))
+@owner_only
+async def sessions_command(client, message):
+    """Show the load and health of the premium upload sessions."""
+    metrics = premium_session_pool.metrics()
+    if not PREMIUM_STRING or not metrics:
+        await message.reply("ℹ️ No premium sessions configured.")
+        return
+    lines = ["📡 **Premium Sessions**\n"]
+    for session_metrics in metrics:
+        lines.append(
+            f"{'🟢' if session_metrics['healthy'] else '🔴'} **Session {session_metrics['index']}:** "
+            f"{session_metrics['active_uploads']} active, "
+            f"{session_metrics['in_flight_bytes'] / (1024 ** 3):.2f}GB in flight "
+            f"({session_metrics['utilization'] * 100:.0f}%)\n"
+            f"    {session_metrics['total_uploads']} uploads, "
+            f"{session_metrics['total_bytes'] / (1024 ** 3):.2f}GB sent, "
+            f"{session_metrics['failures']} failures"
+        )
+    await message.reply("\n".join(lines))
+
 @app.on_message(filters.command("mode"))
 @owner_only
 async def toggle_mode_command(client, message):
@@ -925,6 +977,10 @@ async def settings_command(client: Client, message: Message):
     settings_text += f"💾 **Database:** Connected\n"
     settings_text += f"📊 **Logging:** Enabled\n"
     settings_text += f"🔄 **Auto Cleanup:** Available\n"
+
+    cdm_metrics = hotstar.CDM_POOL.get_metrics()
+    settings_text += f"🔑 **CDM Pool:** {cdm_metrics['busy']}/{cdm_metrics['pool_size']} busy, {cdm_metrics['waiting']} queued\n"
+    settings_text += f"⏱ **License Latency:** challenge {cdm_metrics['challenge']['avg_ms']}ms, parse {cdm_metrics['parse']['avg_ms']}ms\n"
     
     await message.reply(settings_text)
 
@@ -959,34 +1015,33 @@ def construct_filename(content_info, identifier):
         # For now, we'll proceed assuming some default behavior or that this won't be called for other platforms
         pass
 
-    # Get selected resolution and audio from callback storage
+    # Get selected resolution and audio from the selection session
     try:
-        with open('data/callback_storage.json', 'r', encoding='utf-8') as f:
-            callback_data = json.load(f).get(identifier, {})
+        callback_data = selection_store.get(identifier) or {}
 
-            # Get resolution
-            selected_res = callback_data.get("selected_resolution", {})
-            max_resolution = "1080p"  # Default for Hotstar
+        # Get resolution
+        selected_res = callback_data.get("selected_resolution", {})
+        max_resolution = "1080p"  # Default for Hotstar
 
-            if selected_res:
-                width, height = selected_res["resolution"].split("x")
+        if selected_res:
+            width, height = selected_res["resolution"].split("x")
+        else:
+            # Fallback to highest available resolution
+            video_streams = content_info.get("streams_info", {}).get("video", [])
+            if video_streams:
+                width, height = video_streams[0]["resolution"].split("x")
             else:
-                # Fallback to highest available resolution
-                video_streams = content_info.get("streams_info", {}).get("video", [])
-                if video_streams:
-                    width, height = video_streams[0]["resolution"].split("x")
-                else:
-                    width, height = "1920", "1080"  # Default fallback for Hotstar
+                width, height = "1920", "1080"  # Default fallback for Hotstar
 
-            width = ''.join(c for c in width if c.isdigit())
-            height = ''.join(c for c in height if c.isdigit())
-            max_resolution = "1080p" if width == "1920" else f"{height}p"
+        width = ''.join(c for c in width if c.isdigit())
+        height = ''.join(c for c in height if c.isdigit())
+        max_resolution = "1080p" if width == "1920" else f"{height}p"
 
-            # Get selected audios
-            selected_audio_ids = callback_data.get("selected_audios", [])
+        # Get selected audios
+        selected_audio_ids = callback_data.get("selected_audios", [])
 
     except Exception as e:
-        logger.error(f"Error reading callback storage: {e}")
+        logger.error(f"Error reading selection session: {e}")
         # Fallback to highest available resolution
         video_streams = content_info.get("streams_info", {}).get("video", [])
         max_resolution = "1080p"  # Default for Hotstar
@@ -1061,51 +1116,14 @@ def construct_filename(content_info, identifier):
     return re.sub(r'\.+', '.', filename).strip('.')
 
 
-def load_callback_storage():
-    """Load callback storage from JSON file."""
-    try:
-        os.makedirs('data', exist_ok=True)
-        storage_path = 'data/callback_storage.json'
-        
-        try:
-            with open(storage_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                current_time = time.time()
-                # Filter out entries older than 60 minutes
-                return {k: v for k, v in data.items()
-                       if (v.get("selected_audios") or v.get("selected_resolution"))
-                       and current_time - v.get('timestamp',0) < 3600}
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-    except Exception as e:
-        logger.error(f"Error loading callback storage: {e}")
-        return {}
+# Resolution/audio selections per request, persisted in the background for crash recovery
+selection_store = SelectionStore('data/callback_storage.json', ttl=3600)
 
-def save_callback_storage(data):
-    """Save callback storage to JSON file."""
-    try:
-        os.makedirs('data', exist_ok=True)
-        storage_path = 'data/callback_storage.json'
-        
-        # Add timestamp to entries
-        current_time = time.time()
-        for v in data.values():
-            v['timestamp'] = current_time
-            
-        cleaned_data = {k: v for k, v in data.items()
-                       if (v.get("selected_audios") or v.get("selected_resolution"))
-                       and current_time - v.get('timestamp',0) < 3600}
-                       
-        with open(storage_path, 'w', encoding='utf-8') as f:
-            json.dump(cleaned_data, f, indent=4)
-        return True
-    except Exception as e:
-        logger.error(f"Error saving callback storage: {e}")
-        return False
+# Trial task balances; also written by the verify bot
+quota_ledger = QuotaLedger('data/user_plans.json')
 
-def get_selected_audios(identifier, callback_storage=None):
-    """Get selected audio streams for a given identifier."""
-    return (callback_storage or load_callback_storage()).get(identifier, {}).get("selected_audios", [])
+# Upload channel messages of finished outputs, reused for identical requests
+delivery_index = DeliveryIndex('data/delivery_index.json')
 
 def create_resolution_buttons(identifier, streams_info, content_info=None):
     buttons = []
@@ -1166,8 +1184,8 @@ def create_resolution_buttons(identifier, streams_info, content_info=None):
 def create_audio_buttons(identifier, streams_info, selected_resolution=None):
     buttons = []
     row = []
-    callback_storage = load_callback_storage()
-    selected_audios = get_selected_audios(identifier, callback_storage)
+    selection = selection_store.session(identifier)
+    selected_audios = selection["selected_audios"]
     
     # Group and sort audio streams by language
     audio_streams_by_lang = {}
@@ -1191,12 +1209,6 @@ def create_audio_buttons(identifier, streams_info, selected_resolution=None):
             
     audio_streams = prioritized + other[:5]
     
-    # Setup callback storage
-    if identifier not in callback_storage:
-        callback_storage[identifier] = {"stream_id_map": {}}
-    elif "stream_id_map" not in callback_storage[identifier]:
-        callback_storage[identifier]["stream_id_map"] = {}
-        
     # Group by language+bitrate and filter duplicates
     lang_bitrate_groups = {}
     for audio in audio_streams:
@@ -1234,7 +1246,7 @@ def create_audio_buttons(identifier, streams_info, selected_resolution=None):
             
         # Store mapping and create callback
         stream_index = str(idx)
-        callback_storage[identifier]["stream_id_map"][stream_index] = audio["stream_id"]
+        selection["stream_id_map"][stream_index] = audio["stream_id"]
         
         callback_data = f"aud_{identifier}_{stream_index}"
         if len(callback_data.encode()) > 64:
@@ -1250,7 +1262,7 @@ def create_audio_buttons(identifier, streams_info, selected_resolution=None):
     if row:
         buttons.append(row)
         
-    save_callback_storage(callback_storage)
+    selection_store.touch(identifier)
     
     # Add Select All and Clear All buttons
     buttons.append([
@@ -1269,33 +1281,44 @@ def create_audio_buttons(identifier, streams_info, selected_resolution=None):
     
     return InlineKeyboardMarkup(buttons)
 
+# In-flight content lookups keyed by (normalized URL, language)
+content_lookups = SingleFlight()
+
+async def resolve_hotstar_info(url, language, selected_language_name):
+    """Resolve content info and formats for a Hotstar URL"""
+    # Now call the hotstar main function with the URL and selected language
+    result_info = await hotstar.main(url, language, selected_language_name)
+    
+    if not result_info:
+        logger.error("Failed to retrieve information from Hotstar")
+        return None
+        
+    # result_info already has our standardized structure, so we can use it directly
+    info = result_info
+    
+    # Get formats information if needed
+    formats = await get_formats(info)
+    if formats:
+        info["streams_info"] = formats["streams"]
+        logger.info("Successfully retrieved format information for Hotstar")
+    else:
+        logger.warning("Failed to retrieve format information for Hotstar")
+        
+    logger.info("Successfully processed Hotstar URL and returning info")
+    return info
+
 async def handle_hotstar(client, message, url):
     if not url.startswith(("https://www.hotstar.com", "https://hotstar.com")):
         return None
     
     async def show_language_selection(content_id, sport_type):
         """Handle language selection UI and user interaction for sports content"""
-        # Make initial request to get available languages
-        initial_url = f"{hotstar.BASE_URL}/sports/{sport_type}/dummy/{content_id}/watch"
         try:
-            initial_response = await hotstar.make_request(initial_url, headers=hotstar.HEADERS)
-            player_data = initial_response.get("success", {}).get("page", {}).get("spaces", {}).get("player", {}).get("widget_wrappers", [{}])[0].get("widget", {}).get("data", {})
-            available_languages = player_data.get("player_config", {}).get("content_metadata", {}).get("audio_languages", [])
-            
-            # Default language options when API doesn't return any
-            default_languages = [
-                {"name": "Hindi", "iso3code": "hin"},
-                {"name": "English", "iso3code": "eng"},
-                {"name": "Tamil", "iso3code": "tam"},
-                {"name": "Telugu", "iso3code": "tel"},
-                {"name": "Bengali", "iso3code": "ben"},
-                {"name": "Malayalam", "iso3code": "mal"},
-                {"name": "Kannada", "iso3code": "kan"},
-                {"name": "Marathi", "iso3code": "mar"}
-            ]
+            # Language lists are cached per content ID and shared with hotstar.select_language
+            available_languages = await hotstar.get_sports_languages(sport_type, content_id)
             
             if not available_languages:
-                available_languages = default_languages
+                available_languages = hotstar.DEFAULT_SPORTS_LANGUAGES
                 logger.info("Using default language options as API returned none")
 
             language_text = "**🌐 Available Languages:**\n\n" + "\n".join(
@@ -1360,35 +1383,21 @@ async def handle_hotstar(client, message, url):
             
             if "/sports/" in url:
                 # Extract content ID and sport type for language selection
-                parts = url.replace("/in/", "/").replace("https://www.hotstar.com/", "").strip("/").split("/")
-                sport_type = parts[0]
-                content_id = parts[-4] if "video/highlights/watch" in url or "video/replay/watch" in url else parts[-2]
+                sport_type, content_id = hotstar.parse_sports_ids(url)
                 
                 # Get language selection through UI
                 language, selected_language_name = await show_language_selection(content_id, sport_type)
                 if not language:
                     return None
             
-            # Now call the hotstar main function with the URL and selected language
-            result_info = await hotstar.main(url, language, selected_language_name)
-            
-            if not result_info:
-                logger.error("Failed to retrieve information from Hotstar")
-                return None
-                
-            # result_info already has our standardized structure, so we can use it directly
-            info = result_info
-            
-            # Get formats information if needed
-            formats = await get_formats(info)
-            if formats:
-                info["streams_info"] = formats["streams"]
-                logger.info("Successfully retrieved format information for Hotstar")
-            else:
-                logger.warning("Failed to retrieve format information for Hotstar")
-                
-            logger.info("Successfully processed Hotstar URL and returning info")
-            return info
+            # Users sending the same link at once share a single resolution
+            lookup_url = hotstar.normalize_url(url)
+            info = await content_lookups.run(
+                (lookup_url, language), resolve_hotstar_info,
+                lookup_url, language, selected_language_name
+            )
+            # Each caller gets its own copy to attach per-user state to
+            return copy.deepcopy(info) if info else None
             
         except Exception as e:
             logger.error(f"Hotstar error: {str(e)}")
@@ -1425,8 +1434,11 @@ async def send_status_update(client, message, identifier, content_info, status_t
 
     try:
         if status_msg_to_edit:
-            await status_msg_to_edit.edit_text(text)
-            return status_msg_to_edit
+            # Terminal states jump ahead of queued progress edits
+            terminal = status_type != "download_start"
+            if await edit_scheduler.edit(status_msg_to_edit, text, terminal=terminal) is not False:
+                return status_msg_to_edit
+            raise Exception("status message could not be edited")
         else:
             # If called from a callback, message is the callback_query.message
             chat_id = message.chat.id
@@ -1439,13 +1451,13 @@ async def send_status_update(client, message, identifier, content_info, status_t
         return await client.send_message(chat_id, text)
 
 async def update_single_task_progress_loop(client: Client, status_msg: Message, identifier: str):
-    """A loop to update a single task's progress message."""
+    """Update a single task's progress message whenever the task changes."""
     last_text = ""
-    while True:
-        await asyncio.sleep(2)  # Update interval
+    last_edit = None
+    # Ends once the task is cleared; wakes at most every 2 seconds and only on changes
+    async for _ in download_progress.subscribe(identifier, interval=2):
         progress_data = download_progress.get_task_progress(identifier)
         if not progress_data:
-            # Task completed or cleared, exit loop
             break
 
         # Filename is stored in progress_data now
@@ -1457,153 +1469,201 @@ async def update_single_task_progress_loop(client: Client, status_msg: Message,
 
         full_text = f"{header}\n\n{body}"
 
+        # Stop updating if the message is deleted or the last edit failed otherwise
+        if last_edit is not None and last_edit.done() and last_edit.result() is False:
+            logger.warning(f"Stopping progress updates for {identifier}: status message edit failed")
+            break
+
         if full_text != last_text:
-            try:
-                await status_msg.edit_text(full_text)
-                last_text = full_text
-            except MessageNotModified:
-                pass # No change, continue
-            except Exception as e:
-                logger.warning(f"Failed to update progress for {identifier}: {e}")
-                break # Stop updating if message is deleted or other error occurs
+            # Queued edits are coalesced, so only the latest text is ever sent
+            last_edit = edit_scheduler.submit(status_msg, full_text)
+            last_text = full_text
+
+def get_delivery_key(content_info, selected_resolution, selected_audios, identifier):
+    """Delivery index key of the file a request would produce, or None if it can't be identified."""
+    content_id = content_info.get("content_id") or content_info.get("contentId") or content_info.get("id")
+    if not content_id or not selected_resolution or not selected_resolution.get("stream_id"):
+        return None
+    user_id = identifier.split('_')[0] if '_' in identifier else None
+    container = "mp4" if user_id in MP4_USER_IDS else "mkv"
+    return DeliveryIndex.key(
+        content_info.get("platform", ""), content_id,
+        selected_resolution["stream_id"], selected_audios, container
+    )
 
-async def handle_proceed_download(client, message, content_info, selected_resolution, selected_audios, identifier, retry_count=0):
-    user_id = str(message.from_user.id)
-    chat_id = message.chat.id
-    status_msg = None
-    progress_updater_task = None
-    download_dir = get_isolated_download_path(identifier)
+async def deliver_from_index(client, message, key):
+    """Copy an earlier delivery of the same file to the user; False if there is none to reuse."""
+    entry = delivery_index.get(key)
+    if entry is None:
+        return False
+    try:
+        originals = await client.get_messages(entry["chat_id"], entry["message_ids"])
+    except Exception as e:
+        logger.warning(f"Could not look up delivered messages for {key}: {e}")
+        return False
+    if not isinstance(originals, list):
+        originals = [originals]
+    if any(original is None or original.empty for original in originals):
+        logger.info(f"Delivered messages for {key} are gone, dropping the index entry")
+        delivery_index.invalidate(key)
+        return False
 
+    previous = None
     try:
-        async with download_semaphore:
-            filename = construct_filename(content_info, identifier)
-            
-            # Send initial placeholder message that will be updated with progress
-            status_msg = await client.send_message(chat_id, f"🎬 `{filename}`\n\n**Starting download...**")
-
-            # Store filename and content_info in progress data for the updater loop
-            initial_progress_data = {
-                'filename': filename,
-                'content_info': content_info,
-                'video': {},
-                'audio': {},
-                'status': 'Download'
-            }
-            download_progress.update_progress(identifier, initial_progress_data)
-            
-            # Start the live progress updater
-            progress_updater_task = asyncio.create_task(
-                update_single_task_progress_loop(client, status_msg, identifier)
+        for original in originals:
+            previous = await original.copy(
+                message.chat.id,
+                reply_to_message_id=previous.id if previous else None
             )
+    except Exception as e:
+        logger.warning(f"Copying delivered messages for {key} failed: {e}")
+        delivery_index.invalidate(key)
+        return False
+    logger.info(f"Answered {key} from the delivery index")
+    return True
 
-            # Initialize downloader
-            downloader = Nm3u8DLREDownloader(
-                stream_url=content_info["streams"]["dash"],
-                selected_resolution=selected_resolution,
-                selected_audios=selected_audios,
-                content_info=content_info,
-                download_dir=download_dir,
-                filename=filename,
-                identifier=identifier
-            )
-            
-            # Execute download
-            return_code = await downloader.execute()
-            
-            if return_code != 0:
-                if retry_count < MAX_DOWNLOAD_RETRIES:
-                    logger.info(f"Download failed, attempting retry {retry_count + 1}/{MAX_DOWNLOAD_RETRIES}")
-                    # No need to clear task here, just retry
-                    return await handle_proceed_download(
-                        client, message, content_info,
-                        selected_resolution, selected_audios,
-                        identifier, retry_count + 1
-                    )
-                
-                raise Exception("Download failed after multiple retries.")
-            
-            # Update status to Uploading
-            progress_data = download_progress.get_task_progress(identifier)
-            progress_data['status'] = 'Upload'
-            download_progress.update_progress(identifier, progress_data)
+class DownloadJob:
+    """One download request as it moves through the download pipeline."""
 
-            # Handle file path and codecs
-            user_id_from_id = identifier.split('_')[0] if '_' in identifier else None
-            extension = "mp4" if user_id_from_id in MP4_USER_IDS else "mkv"
-            final_file_path = os.path.join(download_dir, f"{filename}.{extension}")
-            
-            # Ensure the downloaded file exists before renaming
-            # N_m3u8dl-re combines files into the final name, so check for that
-            source_file = os.path.join(download_dir, filename)
-            if os.path.exists(source_file) and not os.path.exists(final_file_path):
-                 os.rename(source_file, final_file_path)
-            elif not os.path.exists(final_file_path):
-                 raise FileNotFoundError(f"Neither source {filename} nor target {final_file_path} exist after download.")
+    def __init__(self, client, message, content_info, selected_resolution, selected_audios, identifier):
+        self.client = client
+        self.message = message
+        self.content_info = content_info
+        self.selected_resolution = selected_resolution
+        self.selected_audios = selected_audios
+        self.identifier = identifier
+        self.filename = construct_filename(content_info, identifier)
+        self.download_dir = get_isolated_download_path(identifier)
+        self.delivery_key = get_delivery_key(content_info, selected_resolution, selected_audios, identifier)
+        self.status_msg = None
+        self.progress_updater_task = None
+        self.downloader = None
+        self.stream_files = None  # (video_file, audio_files) once fetched
+        self.uploader = None
+
+async def fetch_stage(job):
+    """Download every selected stream, retrying the whole fetch on failure."""
+    # Send initial placeholder message that will be updated with progress
+    job.status_msg = await job.client.send_message(job.message.chat.id, f"🎬 `{job.filename}`\n\n**Starting download...**")
+
+    # Store filename and content_info in progress data for the updater loop
+    initial_progress_data = {
+        'filename': job.filename,
+        'content_info': job.content_info,
+        'video': {},
+        'audio': {},
+        'status': 'Download'
+    }
+    download_progress.update_progress(job.identifier, initial_progress_data)
+    episode_prefetcher.schedule(job.content_info)
+
+    # Start the live progress updater
+    job.progress_updater_task = asyncio.create_task(
+        update_single_task_progress_loop(job.client, job.status_msg, job.identifier)
+    )
 
+    for attempt in range(MAX_DOWNLOAD_RETRIES + 1):
+        if attempt:
+            logger.info(f"Download failed, attempting retry {attempt}/{MAX_DOWNLOAD_RETRIES}")
+        job.downloader = Nm3u8DLREDownloader(
+            stream_url=job.content_info["streams"]["dash"],
+            selected_resolution=job.selected_resolution,
+            selected_audios=job.selected_audios,
+            content_info=job.content_info,
+            download_dir=job.download_dir,
+            filename=job.filename,
+            identifier=job.identifier
+        )
+        job.stream_files = await job.downloader.fetch()
+        if job.stream_files is not None:
+            return job
+        log_path = await job.downloader.dump_output_log()
+        if log_path:
+            logger.info(f"Downloader output for failed task {job.identifier} saved to {log_path}")
+
+    raise Exception("Download failed after multiple retries.")
+
+async def mux_stage(job):
+    """Merge the fetched streams into the output file."""
+    if await job.downloader.mux(*job.stream_files) != 0:
+        log_path = await job.downloader.dump_output_log()
+        if log_path:
+            logger.info(f"Downloader output for failed task {job.identifier} saved to {log_path}")
+        raise Exception("Merging the downloaded streams failed.")
+    return job
+
+async def post_process_stage(job):
+    """Move the output into place and prepare its upload."""
+    # Update status to Uploading
+    progress_data = download_progress.get_task_progress(job.identifier)
+    progress_data['status'] = 'Upload'
+    download_progress.update_progress(job.identifier, progress_data)
+
+    # Handle file path and codecs
+    user_id_from_id = job.identifier.split('_')[0] if '_' in job.identifier else None
+    extension = "mp4" if user_id_from_id in MP4_USER_IDS else "mkv"
+    final_file_path = os.path.join(job.download_dir, f"{job.filename}.{extension}")
+
+    # Ensure the downloaded file exists before renaming
+    # N_m3u8dl-re combines files into the final name, so check for that
+    source_file = os.path.join(job.download_dir, job.filename)
+    if os.path.exists(source_file) and not os.path.exists(final_file_path):
+        os.rename(source_file, final_file_path)
+    elif not os.path.exists(final_file_path):
+        raise FileNotFoundError(f"Neither source {job.filename} nor target {final_file_path} exist after download.")
+
+    job.uploader = VideoUploader(
+        job.client, job.message, final_file_path, job.filename,
+        job.download_dir, job.identifier, job.status_msg, delivery_key=job.delivery_key
+    )
+    if not await job.uploader.prepare():
+        raise Exception("Upload failed.")
+    return job
+
+async def upload_stage(job):
+    """Send the prepared file to its destination."""
+    if not await job.uploader.transfer():
+        raise Exception("Upload failed.")
+    return True
 
-            upload_success = await upload_video(client, message, final_file_path, filename, download_dir, identifier, status_msg)
-            
-            if not upload_success:
-                raise Exception("Upload failed.")
-                
-            return True
-            
+async def handle_proceed_download(client, message, content_info, selected_resolution, selected_audios, identifier):
+    job = DownloadJob(client, message, content_info, selected_resolution, selected_audios, identifier)
+    try:
+        # Forced drive uploads always want a fresh drive link
+        if job.delivery_key and not content_info.get('force_drive_upload'):
+            if await deliver_from_index(client, message, job.delivery_key):
+                return True
+        return await download_pipeline.submit(job)
     except Exception as e:
         logger.error(f"Error in handle_proceed_download for identifier {identifier}: {e}", exc_info=True)
-        if status_msg:
+        if job.status_msg:
             try:
-                await send_status_update(client, message, identifier, content_info, "download_failed", {"error": str(e)}, status_msg_to_edit=status_msg)
+                await send_status_update(client, message, identifier, content_info, "download_failed", {"error": str(e)}, status_msg_to_edit=job.status_msg)
             except Exception as e_upd:
                 logger.error(f"Failed to send failure status update: {e_upd}")
         return False
     finally:
         # This block ensures cleanup happens regardless of success or failure
-        if progress_updater_task and not progress_updater_task.done():
-            progress_updater_task.cancel()
+        if job.progress_updater_task and not job.progress_updater_task.done():
+            job.progress_updater_task.cancel()
         
         # Remove task from tracking
         download_progress.clear_task(identifier)
         
         # Clean up the download directory
-        cleanup_download_dir(download_dir)
+        cleanup_download_dir(job.download_dir)
 
 
-class DownloadProgress:
-    def __init__(self):
-        self.tasks = {}
-        self.lock = threading.Lock()
-        
-    def update_progress(self, identifier, progress_data):
-        """Update progress for a task using our existing progress_data structure"""
-        with self.lock:
-            if identifier not in self.tasks:
-                self.tasks[identifier] = progress_data
-            else:
-                self.tasks[identifier].update(progress_data)
-    
-    def get_task_progress(self, identifier):
-        """Get progress for a specific task"""
-        with self.lock:
-            return self.tasks.get(identifier, {})
-    
-    def get_all_tasks(self):
-        """Get a copy of all tasks"""
-        with self.lock:
-            return self.tasks.copy()
-
-    def clear_task(self, identifier):
-        """Clear progress data for a task"""
-        with self.lock:
-            if identifier in self.tasks:
-                self.tasks.pop(identifier, None)
-                logger.info(f"Cleared task from progress tracking: {identifier}")
-
 class ProgressDisplay:
     def __init__(self):
         self.progress_bar_length = 10
         self.user_pages = {}
         self.active_task_messages = {}
         self.lock = asyncio.Lock()
+        # page -> (progress version, render time, (text, buttons)) shared by every /tasks viewer
+        self.render_cache = {}
+        self.render_tick = 5
+        self.render_flight = SingleFlight()
 
     def create_circle_progress_bar(self, percentage):
         """Creates a progress bar using circles."""
@@ -1635,80 +1695,9 @@ class ProgressDisplay:
         return 'Downloading'
 
     async def calculate_total_speed(self, progress_data):
-        """Calculate total speed from all streams"""
-        def convert_speed_to_kbps(speed_str):
-            try:
-                if not isinstance(speed_str, str): return 0
-                value = float(re.sub(r'[a-zA-Z/s]', '', speed_str))
-                if 'MB' in speed_str.upper():
-                    return value * 1024
-                return value
-            except:
-                return 0
-
-        total_speed_kbps = convert_speed_to_kbps(progress_data.get('video',{}).get('speed', '0 KB/s'))
-        for audio in progress_data.get('audio', {}).values():
-            total_speed_kbps += convert_speed_to_kbps(audio.get('speed', '0 KB/s'))
-
-        if total_speed_kbps >= 1024:
-            return f"{total_speed_kbps / 1024:.2f} MB/s"
-        return f"{total_speed_kbps:.2f} KB/s"
-
-    async def parse_video_progress(self, line, identifier):
-        """Parse video progress from a line"""
-        try:
-            resolution = "N/A"
-            vid_info_match = re.search(r'Vid (\d+x\d+)', line)
-            if vid_info_match:
-                resolution = vid_info_match.group(1)
-
-            percentage, speed, eta = 0, "0 KB/s", "00:00"
-            progress_match = re.search(r'(\d+\.\d+)%', line)
-            if progress_match: percentage = float(progress_match.group(1))
-            
-            speed_match = re.search(r'([\d.]+(?:MB/s|KB/s))', line)
-            if speed_match: speed = speed_match.group(1)
-            
-            eta_match = re.search(r'(\d{2}:\d{2}:\d{2}|\d{2}:\d{2})', line)
-            if eta_match: eta = eta_match.group(1)
-            
-            return {'resolution': resolution, 'percentage': percentage, 'speed': speed, 'eta': eta}
-        except Exception as e:
-            logger.error(f"Error parsing video progress for {identifier}: {e}")
-            return None
-
-    async def parse_audio_progress(self, line, identifier):
-        """Parse audio progress from a line"""
-        try:
-            lang_match = re.search(r'Aud \d+ Kbps \| ([a-zA-Z0-9]+)', line)
-            display_lang = lang_match.group(1).title() if lang_match else "Unknown"
+        """Format the combined smoothed speed of all streams"""
+        return format_speed(total_speed(progress_data))
 
-            percentage, speed = 0, "0 KB/s"
-            progress_match = re.search(r'(\d+\.\d+)%', line)
-            if progress_match: percentage = float(progress_match.group(1))
-
-            speed_match = re.search(r'([\d.]+(?:MB/s|KB/s))', line)
-            if speed_match: speed = speed_match.group(1)
-            
-            return display_lang, {'percentage': percentage, 'speed': speed}
-        except Exception as e:
-            logger.error(f"Error parsing audio progress for {identifier}: {e}")
-            return None, None
-
-    async def update_progress_from_line(self, line, progress_data, identifier):
-        """Update progress data from a line based on identifier"""
-        if line.startswith('Vid'):
-            video_progress = await self.parse_video_progress(line, identifier)
-            if video_progress:
-                progress_data['video'].update(video_progress)
-                
-        elif line.startswith('Aud'):
-            lang, audio_progress = await self.parse_audio_progress(line, identifier)
-            if lang and audio_progress:
-                progress_data['audio'][lang] = audio_progress
-            
-        return progress_data
-    
     async def format_task_progress(self, identifier, progress_data):
         """Formats the body of the progress message to match the screenshot UI."""
         if not progress_data:
@@ -1725,12 +1714,12 @@ class ProgressDisplay:
         
         if status == 'Uploading':
             upload_data = progress_data.get('upload', {})
-            total_speed = upload_data.get('speed', '0.00 MB/s')
-            eta = upload_data.get('eta', '00:00:00')
+            upload_speed = upload_data.get('speed', 0)
+            eta = job_eta([upload_data], upload_speed)
             
             speed_eta_part = (
-                f"**Total Speed:** {total_speed}\n"
-                f"**ETA:** {eta}"
+                f"**Total Speed:** {format_speed(upload_speed)}\n"
+                f"**ETA:** {format_eta(eta)}"
             )
             return f"📊 {status_part}\n\n💨 {speed_eta_part}"
 
@@ -1744,7 +1733,8 @@ class ProgressDisplay:
         stream_parts = [f"**Video ({video_res}):** {video_perc:.1f}%"]
         
         audio_data = progress_data.get('audio', {})
-        for lang, audio in audio_data.items():
+        for key, audio in audio_data.items():
+            lang = audio.get('language') or key
             lang_name = pickFormats['audio'].get(lang.lower(), lang.title())
             audio_perc = float(audio.get('percentage', 0))
             stream_parts.append(f"**Audio ({lang_name}):** {audio_perc:.1f}%")
@@ -1752,12 +1742,13 @@ class ProgressDisplay:
         streams_part = "\n".join(stream_parts)
 
         # --- Speed & ETA ---
-        total_speed = await self.calculate_total_speed(progress_data)
-        eta = video_data.get('eta', '00:00:00')
+        # ETA covers the bytes left in every stream, not just the video
+        speed = total_speed(progress_data)
+        eta = job_eta(list(iter_streams(progress_data)), speed)
 
         speed_eta_part = (
-            f"**Total Speed:** {total_speed}\n"
-            f"**ETA:** {eta}"
+            f"**Total Speed:** {format_speed(speed)}\n"
+            f"**ETA:** {format_eta(eta)}"
         )
         
         return (
@@ -1767,6 +1758,23 @@ class ProgressDisplay:
         )
 
 
+    async def render_all_progress(self, page=1):
+        """format_all_progress for the current tasks, shared by all viewers of a page.
+
+        A page is re-rendered only after progress changed, and then at most
+        once per render_tick seconds however many chats are watching it.
+        """
+        version = download_progress.get_version()
+        cached = self.render_cache.get(page)
+        if cached and (cached[0] == version or time.monotonic() - cached[1] < self.render_tick):
+            return cached[2]
+
+        rendered = await self.render_flight.run(
+            page, self.format_all_progress, download_progress.get_all_tasks(), page
+        )
+        self.render_cache[page] = (version, time.monotonic(), rendered)
+        return rendered
+
     async def format_all_progress(self, tasks_dict, page=1):
         """Formats all active tasks for the /tasks command with the new UI."""
         active_tasks = len(tasks_dict)
@@ -1802,13 +1810,15 @@ class ProgressDisplay:
         
         return "\n\n" + "━" * 15 + "\n\n".join(header + task_sections), buttons if buttons else None
 
-download_progress = DownloadProgress()
+download_progress = ProgressBus()
+# Every progress/status message edit goes through one rate-limited queue
+edit_scheduler = MessageEditScheduler()
+gofile_client = GofileClient(GOFILE_TOKEN or None, GOFILE_ZONE, GOFILE_CHUNK_SIZE, GOFILE_ATTEMPTS)
 progress_display = ProgressDisplay()
 
 # Export to helpers.download module to avoid circular imports
 import download as download_module
 download_module.download_progress = download_progress
-download_module.progress_display = progress_display
 
 # Helper function for resource cleanup
 async def cleanup_resources(thumb, download_dir, display_filename):
@@ -1825,7 +1835,7 @@ async def cleanup_resources(thumb, download_dir, display_filename):
 class VideoUploader:
     """Class for handling video uploads to Telegram, Google Drive or Gofile."""
     
-    def __init__(self, client, message, file_path, filename, download_dir, identifier, download_status_msg=None):
+    def __init__(self, client, message, file_path, filename, download_dir, identifier, download_status_msg=None, delivery_key=None):
         """Initialize the VideoUploader with necessary parameters."""
         self.client = client
         self.message = message
@@ -1841,49 +1851,86 @@ class VideoUploader:
         self.use_rclone = False
         self.is_trial = False
         self.upload_channel_id = -1002784327959  # The specific channel to upload to
-        self.upload_destination = None # Can be 'telegram', 'gdrive', 'gofile'
+        self.upload_destination = None # Can be 'telegram', 'telegram_parts', 'gdrive', 'gofile'
+        self.last_progress_time = 0
+        self.display_filename = filename
+        self.delivery_key = delivery_key
     
-    async def upload(self):
-        """Main method to handle the video upload process."""
+    async def prepare(self):
+        """Read the file's metadata and thumbnail and pick the destination."""
         try:
-            async with upload_semaphore:
-                await self._initialize_upload()
-                await self._determine_upload_method()
-
-                if self.upload_destination == 'gofile':
-                    gofile_url = await self._upload_via_gofile()
-                    caption = (f"✅ **Upload Complete!**\n\n"
-                               f"🎬 `{self.display_filename}`\n\n"
-                               
-                               f"🔗 **Gofile Link:** {gofile_url}")
-                    # Send the link to the user chat and the upload channel
-                    self.uploaded_msg_in_user_chat = await self.client.send_message(
-                        chat_id=self.message.chat.id,
-                        text=caption
-                    )
+            await self._initialize_upload()
+            await self._determine_upload_method()
+            return True
+        except Exception as e:
+            logger.error(f"Upload preparation failed for {self.identifier}: {e}", exc_info=True)
+            await self._handle_upload_failure(e)
+            await self._cleanup()
+            await self._finalize()
+            return False
+
+    async def transfer(self):
+        """Upload the prepared file and post the result to the upload channel."""
+        try:
+            part_messages = None
+            if self.upload_destination == 'telegram_parts':
+                part_messages = await self._upload_via_telegram_parts()
+                if part_messages is None:
+                    logger.warning(f"Could not split {self.display_filename}, falling back to Gofile")
+                    self.upload_destination = 'gofile'
+
+            if self.upload_destination == 'telegram_parts':
+                # The parts already form an ordered reply chain in the user chat
+                channel_messages = await self._post_parts_in_order(part_messages, self.upload_channel_id)
+                self._record_delivery(channel_messages)
+                if self.upload_status_msg:
+                    try:
+                        await self.upload_status_msg.delete()
+                    except Exception:
+                        pass
+                return True
+
+            elif self.upload_destination == 'gofile':
+                gofile_url = await self._upload_via_gofile()
+                caption = (f"✅ **Upload Complete!**\n\n"
+                           f"🎬 `{self.display_filename}`\n\n"
+                           
+                           f"🔗 **Gofile Link:** {gofile_url}")
+                # Send the link to the user chat and the upload channel
+                self.uploaded_msg_in_user_chat = await self.client.send_message(
+                    chat_id=self.message.chat.id,
+                    text=caption
+                )
 
-                elif self.upload_destination == 'gdrive':
-                    await self._upload_via_rclone()
-                    # Rclone logic should post the message itself. Assuming it's handled there.
-                    # For this implementation, we'll return True if no exception is raised.
-                    return True # Skip the copy logic as rclone might have its own flow
+            elif self.upload_destination == 'gdrive':
+                drive_url = await self._upload_via_rclone()
+                caption = (f"✅ **Upload Complete!**\n\n"
+                           f"🎬 `{self.display_filename}`\n\n"
+                           f"🔗 **Gdrive Link:** {drive_url}")
+                # Send the link to the user chat; it is copied to the upload channel below
+                self.uploaded_msg_in_user_chat = await self.client.send_message(
+                    chat_id=self.message.chat.id,
+                    text=caption
+                )
 
-                else: # 'telegram'
-                    await self._upload_via_telegram()
+            else: # 'telegram'
+                await self._upload_via_telegram()
+            
+            # Copy the result message (file or link) to the upload channel
+            if self.uploaded_msg_in_user_chat:
+                channel_message = await self.uploaded_msg_in_user_chat.copy(self.upload_channel_id)
+                if self.upload_destination == 'telegram':
+                    self._record_delivery([channel_message])
                 
-                # Copy the result message (file or link) to the upload channel
-                if self.uploaded_msg_in_user_chat:
-                    await self.uploaded_msg_in_user_chat.copy(self.upload_channel_id)
-                    
-                    # Delete the progress message in the user's chat
-                    if self.upload_status_msg:
-                        try:
-                            await self.upload_status_msg.delete()
-                        except Exception:
-                            pass
-                    return True
-                else:
-                    raise Exception("Upload to user chat failed, cannot copy to channel.")
+                # Delete the progress message in the user's chat
+                if self.upload_status_msg:
+                    try:
+                        await self.upload_status_msg.delete()
+                    except Exception:
+                        pass
+                return True
+            else:
+                raise Exception("Upload to user chat failed, cannot copy to channel.")
 
         except Exception as e:
             logger.error(f"Upload failed for {self.identifier}: {e}", exc_info=True)
@@ -1932,10 +1979,14 @@ class VideoUploader:
         global UPLOAD_MODE
         force_drive_upload = self.content_info.get('force_drive_upload', False)
         
-        # Priority 1: Gofile if file size > 1.95GB
+        # Priority 1: Split into Telegram parts (or Gofile) if file size > 1.95GB
         if self.file_size_gb > 1.95:
-            self.upload_destination = 'gofile'
-            logger.info(f"File size is {self.file_size_gb:.2f}GB. Forcing Gofile upload.")
+            if SPLIT_LARGE_UPLOADS and UPLOAD_MODE != 'gofile':
+                self.upload_destination = 'telegram_parts'
+                logger.info(f"File size is {self.file_size_gb:.2f}GB. Uploading to Telegram in parts.")
+            else:
+                self.upload_destination = 'gofile'
+                logger.info(f"File size is {self.file_size_gb:.2f}GB. Forcing Gofile upload.")
             return
 
         # Priority 2: Gofile if mode is manually set to 'gofile' by admin
@@ -1960,80 +2011,68 @@ class VideoUploader:
         logger.info(f"Starting Gofile upload for {self.file_path}")
         try:
             # Update status message
-            await self.upload_status_msg.edit_text(f"🎬 `{self.display_filename}`\n\n**Uploading to Gofile...**")
+            edit_scheduler.submit(self.upload_status_msg, f"🎬 `{self.display_filename}`\n\n**Uploading to Gofile...**")
 
-            async with aiohttp.ClientSession() as session:
-                async with aiofiles.open(self.file_path, 'rb') as f:
-                    data = aiohttp.FormData()
-                    data.add_field('file', f, filename=self.display_filename)
-                    
-                    upload_url = "https://store8.gofile.io/contents/uploadfile"
-                    async with session.post(upload_url, data=data) as response:
-                        response.raise_for_status()
-                        result = await response.json()
-
-                        if result.get("status") == "ok":
-                            download_page = result.get("data", {}).get("downloadPage")
-                            if download_page:
-                                logger.info(f"Gofile upload successful: {download_page}")
-                                return download_page
-                            else:
-                                raise Exception("Gofile API response missing downloadPage URL.")
-                        else:
-                            error_message = result.get("data", {}).get("error", "Unknown error")
-                            raise Exception(f"Gofile API returned an error: {error_message}")
+            # Streams from disk, reports progress and fails over to other servers
+            download_page = await gofile_client.upload(
+                self.file_path, self.display_filename, progress=self._report_upload_progress
+            )
+            logger.info(f"Gofile upload successful: {download_page}")
+            return download_page
         except Exception as e:
             logger.error(f"Gofile upload failed: {e}", exc_info=True)
             raise
     
     async def _upload_via_rclone(self):
-        # ... (rclone logic remains the same)
-        logger.info(f"Rclone upload not fully implemented in this scope. Placeholder for {self.identifier}")
-        await self.upload_status_msg.edit_text(f"🎬 `{self.display_filename}`\n\n**Uploading to Google Drive...**")
-        # In a real implementation, rclone would upload and return a link, which would be sent to the user.
-        # For this example, we'll simulate a success message.
-        await asyncio.sleep(5) # Simulate upload time
-        await self.upload_status_msg.edit_text(f"✅ **Upload Complete!**\n\n🎬 `{self.display_filename}`\n\n🔗 **Gdrive Link:** `(Simulated Link)`")
-        pass
+        """Uploads the file to a drive with space through its rclone daemon and returns a shareable link."""
+        reservation = drive_allocator.reserve(self.file_size)
+        if reservation is None:
+            raise Exception("No drive available with sufficient space")
+        reservation_id, drive = reservation
+        logger.info(f"Starting rclone upload of {self.file_path} to drive {drive}")
+        edit_scheduler.submit(self.upload_status_msg, f"🎬 `{self.display_filename}`\n\n**Uploading to Google Drive...**")
+
+        try:
+            daemon, remote = get_drive_remote(drive)
+            remote_path = f"{RCLONE_UPLOAD_DIR}/{self.display_filename}"
+            await daemon.copy_file(self.file_path, remote, remote_path, progress=self._report_upload_progress)
+            link = await daemon.public_link(remote, remote_path)
+            if not link:
+                raise Exception(f"rclone returned no public link for {remote_path}")
+        except BaseException:
+            drive_allocator.release(reservation_id)
+            raise
+
+        drive_allocator.commit(reservation_id)
+        logger.info(f"Rclone upload successful: {link}")
+        return link
     
-    async def _upload_via_telegram(self):
-        """Upload the video file first to the user chat, then it will be copied."""
-        start_time = time.time()
+    async def _report_upload_progress(self, current, total):
+        """Publish upload progress for /tasks, at most every 1.5 seconds."""
+        now = time.time()
+        if current < total and now - self.last_progress_time < 1.5:
+            return
+        self.last_progress_time = now
         
-        async def progress_callback(current, total):
-            now = time.time()
-            if now - getattr(progress_callback, "last_update_time", 0) < 1.5:
-                return
-            progress_callback.last_update_time = now
-            
-            elapsed_time = now - start_time
-            if elapsed_time > 0:
-                speed = current / elapsed_time
-                speed_str = f"{speed / (1024 * 1024):.2f} MB/s"
-                eta = (total - current) / speed if speed > 0 else 0
-                eta_str = str(timedelta(seconds=int(eta)))
-            else:
-                speed_str = "0.00 MB/s"
-                eta_str = "00:00:00"
-
-            percentage = (current / total) * 100 if total > 0 else 0
-            
-            upload_progress_data = {
-                'speed': speed_str,
-                'eta': eta_str,
-                'percentage': percentage
-            }
-            # Update the global progress dictionary
-            current_task = download_progress.get_task_progress(self.identifier)
-            if current_task:
-                current_task['upload'] = upload_progress_data
-                download_progress.update_progress(self.identifier, current_task)
+        percentage = (current / total) * 100 if total > 0 else 0
+
+        # Update the global progress dictionary; speed and ETA are derived at render time
+        current_task = download_progress.get_task_progress(self.identifier)
+        if current_task:
+            update_stream(
+                current_task.setdefault('upload', {}),
+                done_bytes=current, total_bytes=total, percentage=percentage
+            )
+            download_progress.update_progress(self.identifier, current_task)
 
+    async def _upload_via_telegram(self):
+        """Upload the video file first to the user chat, then it will be copied."""
         caption = f'''<b>{self.display_filename}</b>''' if self.user_id in MP4_USER_IDS else f'''<code>{self.display_filename}</code>'''
         
         # Use premium session if file is large
         if self.file_size > 50 * 1024 * 1024 and PREMIUM_STRING: # Use premium for files > 50MB
-            self.premium_client = await premium_session_pool.get_session()
+            # Least-loaded premium session; falls back to the bot if none is healthy
+            self.premium_client = await premium_session_pool.get_session(self.file_size)
             uploader_client = self.premium_client or self.client
         else:
             uploader_client = self.client
@@ -2048,9 +2087,136 @@ class VideoUploader:
             file_name=self.display_filename,
             duration=self.duration,
             thumb=self.thumb,
-            progress=progress_callback
+            progress=self._report_upload_progress
         )
     
+    async def _split_into_parts(self):
+        """Split the file at keyframes into parts no larger than SPLIT_PART_SIZE_MB.
+
+        Segment length is estimated from the average bitrate; if a part still
+        overshoots (bitrate peaks, keyframe spacing) the split is redone with
+        shorter segments. Returns the part paths in order, or None.
+        """
+        if not self.duration:
+            return None
+        part_limit = SPLIT_PART_SIZE_MB * 1024 * 1024
+        parts_dir = os.path.join(self.download_dir, "parts")
+        base, extension = os.path.splitext(self.display_filename)
+        segment_time = self.duration * part_limit / self.file_size * 0.9
+
+        for _ in range(3):
+            await asyncio.to_thread(shutil.rmtree, parts_dir, True)
+            os.makedirs(parts_dir, exist_ok=True)
+            cmd = [
+                'ffmpeg', '-y', '-i', self.file_path,
+                '-map', '0', '-c', 'copy',
+                '-f', 'segment', '-segment_time', f"{segment_time:.0f}",
+                '-reset_timestamps', '1',
+                os.path.join(parts_dir, f"{base}.part%03d{extension}")
+            ]
+            process = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            )
+            _, stderr = await process.communicate()
+            if process.returncode != 0:
+                logger.error(f"ffmpeg split failed for {self.file_path}: {stderr.decode(errors='replace')[-500:]}")
+                return None
+
+            parts = sorted(os.path.join(parts_dir, name) for name in os.listdir(parts_dir))
+            largest = max((os.path.getsize(part) for part in parts), default=0)
+            if parts and largest <= part_limit:
+                return parts
+            segment_time *= 0.8 * part_limit / largest if largest else 0.8
+        return None
+
+    async def _upload_via_telegram_parts(self):
+        """Upload the parts concurrently across premium sessions and return them as an ordered reply chain in the user chat."""
+        parts = await self._split_into_parts()
+        if not parts:
+            return None
+        part_sizes = [os.path.getsize(part) for part in parts]
+        sent_bytes = [0] * len(parts)
+        total_bytes = sum(part_sizes)
+        semaphore = asyncio.Semaphore(SPLIT_UPLOAD_CONCURRENCY)
+        logger.info(f"Uploading {self.display_filename} in {len(parts)} parts")
+
+        async def upload_part(index, part_path):
+            async def progress(current, total):
+                sent_bytes[index] = current
+                await self._report_upload_progress(sum(sent_bytes), total_bytes)
+
+            async with semaphore:
+                premium_client = None
+                if PREMIUM_STRING:
+                    premium_client = await premium_session_pool.get_session(part_sizes[index])
+                message = None
+                try:
+                    duration = 0
+                    try:
+                        metadata = await asyncio.to_thread(extractMetadata, createParser(part_path))
+                        if metadata and metadata.has("duration"):
+                            duration = metadata.get('duration').seconds
+                    except Exception:
+                        pass
+                    message = await (premium_client or self.client).send_video(
+                        chat_id=self.message.chat.id,
+                        video=part_path,
+                        caption=f"<code>{self.display_filename}</code>\nPart {index + 1}/{len(parts)}",
+                        file_name=os.path.basename(part_path),
+                        duration=duration,
+                        thumb=self.thumb,
+                        progress=progress
+                    )
+                    return message
+                finally:
+                    if premium_client:
+                        await premium_session_pool.release_session(
+                            premium_client, part_sizes[index], failed=message is None
+                        )
+
+        uploaded = await asyncio.gather(
+            *(upload_part(index, part) for index, part in enumerate(parts)),
+            return_exceptions=True
+        )
+        failures = [result for result in uploaded if isinstance(result, BaseException)]
+        if failures:
+            for result in uploaded:
+                if not isinstance(result, BaseException):
+                    try:
+                        await result.delete()
+                    except Exception:
+                        pass
+            raise Exception(f"{len(failures)} of {len(parts)} parts failed to upload: {failures[0]}")
+
+        # Parts finish in any order; re-post them in order and drop the originals
+        ordered = await self._post_parts_in_order(uploaded, self.message.chat.id)
+        for message in uploaded:
+            try:
+                await message.delete()
+            except Exception:
+                pass
+        return ordered
+
+    async def _post_parts_in_order(self, messages, chat_id):
+        """Copy part messages to a chat in order, each replying to the previous one."""
+        copies = []
+        for message in messages:
+            copy_msg = await message.copy(
+                chat_id,
+                reply_to_message_id=copies[-1].id if copies else None
+            )
+            copies.append(copy_msg)
+        return copies
+
+    def _record_delivery(self, channel_messages):
+        """Remember the channel copies of a Telegram upload for identical requests.
+
+        Gofile and drive links are not indexed since they can expire or be
+        cleaned up without the message going away.
+        """
+        if self.delivery_key and channel_messages:
+            delivery_index.put(self.delivery_key, self.upload_channel_id, [m.id for m in channel_messages])
+
     async def _handle_upload_failure(self, error):
         await send_status_update(
             self.client, self.message, self.identifier, self.content_info, 
@@ -2065,13 +2231,19 @@ class VideoUploader:
     async def _finalize(self):
         """Finalize the upload process and release resources."""
         if self.premium_client:
-            await premium_session_pool.release_session(self.premium_client)
+            await premium_session_pool.release_session(
+                self.premium_client, self.file_size,
+                failed=self.uploaded_msg_in_user_chat is None
+            )
 
 
-async def upload_video(client, message, file_path, filename, download_dir, identifier, download_status_msg=None):
-    """Upload video file to telegram with proper metadata."""
-    uploader = VideoUploader(client, message, file_path, filename, download_dir, identifier, download_status_msg)
-    return await uploader.upload()
+# Downloads, merges and uploads run as separate stages with their own slots
+download_pipeline = Pipeline([
+    Stage('fetch', fetch_stage, PIPELINE_FETCH_WORKERS),
+    Stage('mux', mux_stage, PIPELINE_MUX_WORKERS),
+    Stage('postprocess', post_process_stage, PIPELINE_POSTPROCESS_WORKERS),
+    Stage('upload', upload_stage, PIPELINE_UPLOAD_WORKERS),
+], queue_size=PIPELINE_QUEUE_SIZE)
 
 async def check_subscription(message):
     """Check if user is subscribed to main channel and has access"""
@@ -2303,16 +2475,11 @@ async def process_dl_request(client, message):
                 else:
                     del TRIAL_COOLDOWNS[user_id]
 
-            try:
-                with open('data/user_plans.json', 'r') as f:
-                    user_plans = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                user_plans = {}
-            
             str_user_id = str(user_id)
+            user_plan = quota_ledger.get_plan(str_user_id)
             
-            has_720p = user_plans.get(str_user_id, {}).get("720p_limit", 0) > 0
-            has_1080p = user_plans.get(str_user_id, {}).get("1080p_limit", 0) > 0
+            has_720p = user_plan.get("720p_limit", 0) > 0
+            has_1080p = user_plan.get("1080p_limit", 0) > 0
             
             if not has_720p and not has_1080p:
                 verify_bot = ASSISTANT_BOT
@@ -2385,8 +2552,8 @@ async def process_dl_request(client, message):
 
         if is_trial:
             text += "\n\n**Available Tasks:**\n"
-            if has_720p: text += f"• 720p Tasks: {user_plans[str_user_id]['720p_limit']}\n"
-            if has_1080p: text += f"• 1080p Tasks: {user_plans[str_user_id]['1080p_limit']}"
+            if has_720p: text += f"• 720p Tasks: {user_plan['720p_limit']}\n"
+            if has_1080p: text += f"• 1080p Tasks: {user_plan['1080p_limit']}"
         
         text += "**\n\nPlease select video resolution:**"
         
@@ -2448,42 +2615,41 @@ async def show_tasks(_, message):
     
     async def update_progress():
         last_progress_text = None
+        last_edit = None
         
-        while True:
-            await asyncio.sleep(5) # Update interval
-            
+        # Re-render only when some task changed, at most every 5 seconds
+        async for _ in download_progress.subscribe(interval=5):
             async with progress_display.lock:
                 if progress_display.active_task_messages.get(chat_id) != status_msg:
                     break
             
             try:
-                current_tasks = download_progress.get_all_tasks()
                 current_page = progress_display.user_pages.get(user_id, 1)
                 
-                if not current_tasks:
+                if not download_progress.get_all_tasks():
                     break
 
-                progress_text, buttons = await progress_display.format_all_progress(current_tasks, page=current_page)
+                progress_text, buttons = await progress_display.render_all_progress(current_page)
+
+                if last_edit is not None and last_edit.done() and last_edit.result() is False:
+                    break
 
                 if progress_text != last_progress_text:
-                    await status_msg.edit_text(
+                    last_edit = edit_scheduler.submit(
+                        status_msg,
                         progress_text,
                         reply_markup=InlineKeyboardMarkup(buttons) if buttons else None
                     )
                     last_progress_text = progress_text
 
-            except MessageNotModified:
-                pass
             except Exception as e:
                 logger.error(f"Error in task update loop: {e}")
-                if "message to edit not found" in str(e).lower():
-                    break
         
         # Loop finished, meaning no more tasks. Clean up the message.
         async with progress_display.lock:
             if progress_display.active_task_messages.get(chat_id) == status_msg:
                 try:
-                    await status_msg.edit_text("**✅ All downloads completed!**")
+                    await edit_scheduler.edit(status_msg, "**✅ All downloads completed!**", terminal=True)
                     await asyncio.sleep(5)
                     await status_msg.delete()
                 except Exception:
@@ -2643,8 +2809,7 @@ async def handle_callback(client, callback_query: CallbackQuery):
                 page = int(data.split('_')[1]) if data.startswith('page_') else progress_display.user_pages.get(user_id, 1)
                 progress_display.user_pages[user_id] = page
                 
-                all_tasks = download_progress.get_all_tasks()
-                progress_text, buttons = await progress_display.format_all_progress(all_tasks, page)
+                progress_text, buttons = await progress_display.render_all_progress(page)
                 if progress_text:
                     await callback_query.message.edit_text(
                         progress_text,
@@ -2667,41 +2832,33 @@ async def handle_callback(client, callback_query: CallbackQuery):
                 await callback_query.answer("Not Your Button!", show_alert=True)
                 return
 
-            callback_storage = load_callback_storage()
-            try:
-                with open('data/content_storage.json', 'r', encoding='utf-8') as f:
-                    content_storage = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                await callback_query.answer("Content not found!")
-                return
-
-            content_info = content_storage.get(base_identifier)
+            content_info = content_store.get(base_identifier)
             if not content_info:
                 logger.error(f"Content not found for ID: {base_identifier}")
                 await callback_query.answer("Content not found!")
                 return
             
-            if base_identifier not in callback_storage:
-                callback_storage[base_identifier] = {"selected_audios": []}
+            selection = selection_store.session(base_identifier)
 
             if action_part == "aud_all":
                 all_audio_streams = content_info["streams_info"].get("audio", [])
                 
                 if is_trial:
-                    all_audio_streams.sort(key=lambda x: (x["language"].lower()[:3] not in pickFormats["audio"], -x["bitrate"]))
+                    # Sort a copy; the stream list is shared by everyone requesting this title
+                    all_audio_streams = sorted(all_audio_streams, key=lambda x: (x["language"].lower()[:3] not in pickFormats["audio"], -x["bitrate"]))
                     selected_audios = [audio["stream_id"] for audio in all_audio_streams[:2]]
                     await callback_query.answer("Selected top 2 audio tracks for trial users.", show_alert=True)
                 else:
                     selected_audios = [audio["stream_id"] for audio in all_audio_streams]
                     await callback_query.answer("Selected all available audio tracks.")
 
-                callback_storage[base_identifier]["selected_audios"] = selected_audios
+                selection["selected_audios"] = selected_audios
             
             elif action_part == "aud_clear":
-                callback_storage[base_identifier]["selected_audios"] = []
+                selection["selected_audios"] = []
                 await callback_query.answer("Cleared all audio selections.")
             
-            save_callback_storage(callback_storage)
+            selection_store.touch(base_identifier)
             markup = create_audio_buttons(base_identifier, content_info["streams_info"])
             try:
                 await callback_query.message.edit_reply_markup(reply_markup=markup)
@@ -2722,32 +2879,13 @@ async def handle_callback(client, callback_query: CallbackQuery):
             await callback_query.answer("Not Your Button!", show_alert=True)
             return
             
-        callback_storage = load_callback_storage()
-        
-        try:
-            with open('data/content_storage.json', 'r', encoding='utf-8') as f:
-                content_storage = json.load(f)
-        except FileNotFoundError:
-            content_storage = {}
-            os.makedirs('data', exist_ok=True)
-            with open('data/content_storage.json', 'w', encoding='utf-8') as f:
-                json.dump(content_storage, f, indent=4)
-        except Exception as e:
-            logger.error(f"Storage error: {e}")
-            await callback_query.answer("Storage error!")
-            return
-        
-        content_info = content_storage.get(base_identifier)
+        content_info = content_store.get(base_identifier)
         if not content_info:
             logger.error(f"Content not found for ID: {base_identifier}")
             await callback_query.answer("Content not found!")
             return
             
-        if base_identifier not in callback_storage:
-            callback_storage[base_identifier] = {
-                "selected_resolution": None,
-                "selected_audios": []
-            }
+        selection = selection_store.session(base_identifier)
         
         if action == "res":
             if len(parts) < 4:
@@ -2772,16 +2910,10 @@ async def handle_callback(client, callback_query: CallbackQuery):
                     return 0
                 
                 if is_trial:
-                    try:
-                        with open('data/user_plans.json', 'r') as f:
-                            user_plans = json.load(f)
-                    except (FileNotFoundError, json.JSONDecodeError):
-                        user_plans = {}
-
                     str_user_id = parts[1]
 
                     if height <= 720:
-                        if user_plans.get(str_user_id, {}).get("720p_limit", 0) <= 0:
+                        if quota_ledger.balance(str_user_id, "720p_limit") <= 0:
                             verify_bot = ASSISTANT_BOT
                             await callback_query.answer("No 720p tasks left! Get more tasks from verify bot.", show_alert=True)
                             await callback_query.message.edit_text(
@@ -2792,7 +2924,7 @@ async def handle_callback(client, callback_query: CallbackQuery):
                             )
                             return
                     elif height == 1080:
-                        if user_plans.get(str_user_id, {}).get("1080p_limit", 0) <= 0:
+                        if quota_ledger.balance(str_user_id, "1080p_limit") <= 0:
                             verify_bot = ASSISTANT_BOT
                             await callback_query.answer("No 1080p tasks left! Get more tasks from verify bot.", show_alert=True)
                             await callback_query.message.edit_text(
@@ -2825,12 +2957,12 @@ async def handle_callback(client, callback_query: CallbackQuery):
                         streams_same_res.sort(key=lambda x: get_bitrate_value(x["bitrate"]))
                         selected_video = streams_same_res[0]
 
-                callback_storage[base_identifier]["selected_resolution"] = {
+                selection["selected_resolution"] = {
                     "stream_id": selected_video["stream_id"],
                     "resolution": selected_video["resolution"],
                     "bitrate": selected_video["bitrate"]
                 }
-                save_callback_storage(callback_storage)
+                selection_store.touch(base_identifier)
                 
                 markup = create_audio_buttons(base_identifier, content_info["streams_info"])
                 await callback_query.message.edit_text(
@@ -2841,11 +2973,8 @@ async def handle_callback(client, callback_query: CallbackQuery):
                 await callback_query.answer()
             
         elif action == "back":
-            if base_identifier in callback_storage:
-                stream_id_map = callback_storage[base_identifier].get("stream_id_map", {})
-                callback_storage[base_identifier]["selected_audios"] = []
-                callback_storage[base_identifier]["stream_id_map"] = stream_id_map
-                save_callback_storage(callback_storage)
+            selection["selected_audios"] = []
+            selection_store.touch(base_identifier)
             
             markup = create_resolution_buttons(base_identifier, content_info["streams_info"], content_info)
             
@@ -2860,17 +2989,13 @@ async def handle_callback(client, callback_query: CallbackQuery):
             if episode_number: text += f"\n**Episode Number:** `{episode_number}`"
             
             if is_trial:
-                try:
-                    with open('data/user_plans.json', 'r') as f: user_plans = json.load(f)
-                except (FileNotFoundError, json.JSONDecodeError): user_plans = {}
-                    
-                str_user_id = str(callback_query.from_user.id)
-                has_720p = user_plans.get(str_user_id, {}).get("720p_limit", 0) > 0
-                has_1080p = user_plans.get(str_user_id, {}).get("1080p_limit", 0) > 0
+                user_plan = quota_ledger.get_plan(callback_query.from_user.id)
+                has_720p = user_plan.get("720p_limit", 0) > 0
+                has_1080p = user_plan.get("1080p_limit", 0) > 0
                 
                 text += "\n\n**Available Tasks:**\n"
-                if has_720p: text += f"• 720p Tasks: {user_plans[str_user_id]['720p_limit']}\n"
-                if has_1080p: text += f"• 1080p Tasks: {user_plans[str_user_id]['1080p_limit']}\n\n"
+                if has_720p: text += f"• 720p Tasks: {user_plan['720p_limit']}\n"
+                if has_1080p: text += f"• 1080p Tasks: {user_plan['1080p_limit']}\n\n"
             
             text += "\n\n**Please select video resolution:**"
             
@@ -2883,13 +3008,13 @@ async def handle_callback(client, callback_query: CallbackQuery):
                 return
             stream_index = parts[3]
             
-            stream_id_map = callback_storage[base_identifier].get("stream_id_map", {})
+            stream_id_map = selection.get("stream_id_map", {})
             if stream_index not in stream_id_map:
                 await callback_query.answer("Audio track not found!", show_alert=True)
                 return
                 
             matched_stream_id = stream_id_map[stream_index]
-            selected_audios = callback_storage[base_identifier].get("selected_audios", [])
+            selected_audios = selection.get("selected_audios", [])
             
             if is_trial and matched_stream_id not in selected_audios and len(selected_audios) >= 2:
                 await callback_query.answer("🎵 Upgrade to full access to enjoy all available audio tracks and languages!", show_alert=True)
@@ -2900,8 +3025,8 @@ async def handle_callback(client, callback_query: CallbackQuery):
             else:
                 selected_audios.append(matched_stream_id)
             
-            callback_storage[base_identifier]["selected_audios"] = selected_audios
-            save_callback_storage(callback_storage)
+            selection["selected_audios"] = selected_audios
+            selection_store.touch(base_identifier)
             
             audio_map = {audio["stream_id"]: audio for audio in content_info["streams_info"]["audio"]}
             selected_text = []
@@ -2932,12 +3057,12 @@ async def handle_callback(client, callback_query: CallbackQuery):
                 await callback_query.message.edit_text(LOCK_MESSAGE)
                 return
                 
-            selected = callback_storage[base_identifier]
+            selected = selection
             if not selected.get("selected_resolution") or not isinstance(selected["selected_resolution"], dict):
                 await callback_query.answer("Select resolution first!")
                 return
             
-            if callback_storage.get(base_identifier, {}).get("processing", False):
+            if selection.get("processing", False):
                 await callback_query.answer("Download already in progress...", show_alert=True)
                 return
             
@@ -2958,15 +3083,15 @@ async def handle_callback(client, callback_query: CallbackQuery):
                         await callback_query.answer(f"{platform_name} platform is restricted to authorized users only.", show_alert=True)
                         return
 
-            callback_storage[base_identifier]["processing"] = True
-            save_callback_storage(callback_storage)
+            selection["processing"] = True
+            selection_store.touch(base_identifier)
             
             audio_tracks = content_info["streams_info"].get("audio", [])
             if not audio_tracks:
                 await callback_query.answer("Proceeding without selection.")
             elif not selected.get("selected_audios"):
-                callback_storage[base_identifier]["processing"] = False
-                save_callback_storage(callback_storage)
+                selection["processing"] = False
+                selection_store.touch(base_identifier)
                 await callback_query.answer("Select at least one audio!")
                 return
             
@@ -2975,42 +3100,43 @@ async def handle_callback(client, callback_query: CallbackQuery):
                     cooldown_data = TRIAL_COOLDOWNS[user_id]
                     remaining_time = int(cooldown_data["time"] - time.time())
                     if remaining_time > 0:
-                        callback_storage[base_identifier]["processing"] = False
-                        save_callback_storage(callback_storage)
+                        selection["processing"] = False
+                        selection_store.touch(base_identifier)
                         minutes, seconds = divmod(remaining_time, 60)
                         await callback_query.answer(f"Please wait {minutes}m {seconds}s before starting new task!", show_alert=True)
                         return
 
-                try:
-                    with open('data/user_plans.json', 'r') as f: user_plans = json.load(f)
-                except (FileNotFoundError, json.JSONDecodeError): user_plans = {}
-                
                 str_user_id = parts[1]
                 height = int(selected["selected_resolution"]["resolution"].split("x")[1])
                 
+                # Reserve the task now; it is refunded if the job fails
                 if height <= 720:
-                    if user_plans.get(str_user_id, {}).get("720p_limit", 0) <= 0:
-                        callback_storage[base_identifier]["processing"] = False
-                        save_callback_storage(callback_storage)
+                    if not quota_ledger.reserve(base_identifier, str_user_id, "720p_limit"):
+                        selection["processing"] = False
+                        selection_store.touch(base_identifier)
                         await callback_query.answer("No 720p tasks left!", show_alert=True)
                         return
-                    user_plans[str_user_id]["720p_limit"] -= 1
                 elif height == 1080:
-                    if user_plans.get(str_user_id, {}).get("1080p_limit", 0) <= 0:
-                        callback_storage[base_identifier]["processing"] = False
-                        save_callback_storage(callback_storage)
+                    if not quota_ledger.reserve(base_identifier, str_user_id, "1080p_limit"):
+                        selection["processing"] = False
+                        selection_store.touch(base_identifier)
                         await callback_query.answer("No 1080p tasks left!", show_alert=True)
                         return
-                    user_plans[str_user_id]["1080p_limit"] -= 1
-                
-                with open('data/user_plans.json', 'w') as f: json.dump(user_plans, f, indent=4)
                 
                 TRIAL_COOLDOWNS[user_id] = {"time": time.time() + TRIAL_COOLDOWN_SUCCESS, "message_id": callback_query.message.id}
             
-            await callback_query.answer("Processing...")
-            await callback_query.message.delete()
-            
-            await handle_proceed_download(client, callback_query.message, content_info, selected["selected_resolution"], selected["selected_audios"], base_identifier)
+            success = False
+            try:
+                await callback_query.answer("Processing...")
+                await callback_query.message.delete()
+                
+                success = await handle_proceed_download(client, callback_query.message, content_info, selected["selected_resolution"], selected["selected_audios"], base_identifier)
+            finally:
+                if success:
+                    quota_ledger.commit(base_identifier)
+                elif quota_ledger.refund(base_identifier):
+                    # Failed jobs give the task back and only wait the short cooldown
+                    TRIAL_COOLDOWNS[user_id] = {"time": time.time() + TRIAL_COOLDOWN_FAIL, "message_id": callback_query.message.id}
             
     except MessageNotModified:
         pass
@@ -3057,6 +3183,13 @@ async def main():
             cleanup_task = asyncio.create_task(scheduled_drive_cleanup())
             # Start periodic dump cleanup as a background task
             asyncio.create_task(periodic_dump_cleanup())
+            # Keep drive usage in line with the remotes
+            asyncio.create_task(drive_allocator.run())
+            # Connect premium upload sessions before the first large upload needs them
+            asyncio.create_task(premium_session_pool.start())
+            # Pick up changes to the premium and lock files
+            asyncio.create_task(premium_users_file.watch())
+            asyncio.create_task(bot_lock_file.watch())
             
             # Reset retry count on successful connection
             retry_count = 0
@@ -3085,12 +3218,30 @@ async def main():
             
         finally:
             try:
-                # First stop premium sessions
+                # First cancel downloads and uploads still in the pipeline,
+                # before their clients are closed under them
+                await download_pipeline.stop()
+                # Then stop premium sessions
                 await premium_session_pool.close_all_sessions()
+                # Close the shared Hotstar HTTP client
+                await hotstar.close_http_session()
+                # Stop the rclone rc daemons
+                await rclone_daemons.stop_all()
+            except Exception as e:
+                logger.error(f"Error during cleanup: {str(e)}")
+            try:
+                # Write out pending content selections, quota changes and deliveries
+                await content_store.flush()
+                await selection_store.flush()
+                await quota_ledger.flush()
+                await delivery_index.flush()
+            except Exception as e:
+                logger.error(f"Error flushing stores during cleanup: {str(e)}")
+            try:
                 # Then stop the main app
                 await app.stop()
             except Exception as e:
-                logger.error(f"Error during cleanup: {str(e)}")
+                logger.error(f"Error stopping the app: {str(e)}")
 
 def signal_handler(signum, frame):
     """Handle termination signals gracefully."""
@@ -3154,29 +3305,17 @@ async def check_download_limits(user_id, platform_name=None, chat_id=None):
     if is_bot_locked():
         return True, "bot_locked"
         
-    all_tasks = download_progress.get_all_tasks()
-    user_tasks = 0
+    # Every tracked task is active (downloading, processing or uploading) until it is cleared
+    user_task_progress = download_progress.get_user_tasks(user_id)
+    user_tasks = len(user_task_progress)
     platform_task_active = False
 
-    for identifier, progress_data in all_tasks.items():
-        try:
-            stored_user_id = int(identifier.split('_')[0])
-            if stored_user_id != user_id:
-                continue
-
-            # Check if the task is genuinely active
-            real_status = await progress_display.get_real_status(progress_data)
-            if real_status in ['Downloading', 'Processing', 'Uploading']:
-                user_tasks += 1
-                
-                # Check for platform-specific limit
-                if platform_name and platform_name in TRIAL_RESTRICTED_PLATFORMS:
-                    task_content_info = progress_data.get('content_info', {})
-                    if task_content_info.get('platform') == platform_name:
-                        platform_task_active = True
-        
-        except (ValueError, IndexError):
-            continue
+    # Check for platform-specific limit
+    if platform_name and platform_name in TRIAL_RESTRICTED_PLATFORMS:
+        platform_task_active = any(
+            progress_data.get('content_info', {}).get('platform') == platform_name
+            for progress_data in user_task_progress.values()
+        )
 
     if user_tasks >= 3:
         return True, "max_concurrent"
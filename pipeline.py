@@ -0,0 +1,118 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """One step of a Pipeline: ``handler(job)`` run by ``workers`` tasks.
+
+    The handler returns the job handed to the next stage (or the pipeline's
+    result for the last stage) and raises to fail the job.
+    """
+
+    def __init__(self, name, handler, workers=1):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.active = 0
+
+
+class Pipeline:
+    """Runs jobs through a fixed sequence of stages, each with its own workers.
+
+    A worker that finishes its step hands the job on and takes the next one,
+    so a slow stage (e.g. uploads) never holds capacity of an earlier one
+    (e.g. downloads). Stages after the first are fed through queues bounded
+    by ``queue_size``: when a stage falls behind, the stage before it waits
+    instead of piling finished work up on disk.
+
+    ``submit`` resolves with the last stage's result or raises the error of
+    the stage that failed. Cancelling the caller drops the job before its
+    next stage.
+    """
+
+    def __init__(self, stages, queue_size=4):
+        self.stages = stages
+        self.queues = [asyncio.Queue(0 if index == 0 else queue_size) for index in range(len(stages))]
+        self.workers = []
+
+    def start(self):
+        if self.workers:
+            return
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                self.workers.append(asyncio.create_task(self._work(index)))
+
+    async def submit(self, job):
+        """Run ``job`` through every stage and return the final result."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queues[0].put((job, future))
+        return await future
+
+    async def _work(self, index):
+        stage = self.stages[index]
+        queue = self.queues[index]
+        is_last = index == len(self.stages) - 1
+        while True:
+            job, future = await queue.get()
+            try:
+                if future.done():
+                    continue
+                stage.active += 1
+                try:
+                    result = await stage.handler(job)
+                finally:
+                    stage.active -= 1
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            finally:
+                queue.task_done()
+
+            if is_last:
+                if not future.done():
+                    future.set_result(result)
+            elif not future.done():
+                try:
+                    await self.queues[index + 1].put((result, future))
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+
+    def busy(self, name):
+        """Whether every worker of stage ``name`` is occupied."""
+        for stage in self.stages:
+            if stage.name == name:
+                return stage.active >= stage.workers
+        raise KeyError(name)
+
+    def stats(self):
+        """Active workers and queued jobs per stage."""
+        return {
+            stage.name: {
+                "active": stage.active,
+                "workers": stage.workers,
+                "queued": self.queues[index].qsize(),
+            }
+            for index, stage in enumerate(self.stages)
+        }
+
+    async def stop(self):
+        """Cancel the workers and every job still in flight or queued."""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers.clear()
+        for queue in self.queues:
+            while not queue.empty():
+                _, future = queue.get_nowait()
+                queue.task_done()
+                if not future.done():
+                    future.cancel()
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+
+import hotstar
+from cache import ttl_override
+from formats import get_formats
+
+logger = logging.getLogger(__name__)
+
+
+class EpisodePrefetcher:
+    """Warms the lookup, manifest, key and format caches for the next episode.
+
+    Prefetches are best effort: they are dropped rather than queued whenever the
+    budget is spent or ``can_run`` reports that real downloads need the capacity.
+    """
+
+    def __init__(self, max_concurrent=1, max_per_window=20, window=600, ttl=300, can_run=None, enabled=True):
+        self.max_concurrent = max_concurrent
+        self.max_per_window = max_per_window
+        self.window = window
+        self.ttl = ttl
+        self.can_run = can_run
+        self.enabled = enabled
+        self.active = 0
+        self.started = []  # Start times inside the current window
+        self.seen = {}  # Next-episode URL -> time it was prefetched
+        self.tasks = set()
+
+    def _has_budget(self):
+        now = time.monotonic()
+        self.started = [t for t in self.started if now - t < self.window]
+        if self.active >= self.max_concurrent or len(self.started) >= self.max_per_window:
+            return False
+        return self.can_run is None or self.can_run()
+
+    def schedule(self, content_info):
+        """Start a background prefetch of the episode after ``content_info``."""
+        if not self.enabled or content_info.get("content_type") != "EPISODE":
+            return None
+        if content_info.get("platform") != "JioHotstar":
+            return None
+
+        next_url = hotstar.get_next_episode_url(content_info)
+        if not next_url:
+            return None
+
+        now = time.monotonic()
+        self.seen = {url: t for url, t in self.seen.items() if now - t < self.ttl}
+        if next_url in self.seen or not self._has_budget():
+            return None
+
+        self.seen[next_url] = now
+        self.started.append(now)
+        self.active += 1
+        task = asyncio.create_task(self._prefetch(next_url, content_info.get("language_code"), content_info.get("selected_language")))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _prefetch(self, url, language, selected_language_name):
+        # The task runs in its own context, so this only caps entries it writes
+        ttl_override.set(self.ttl)
+        start = time.monotonic()
+        try:
+            info = await hotstar.main(url, language, selected_language_name)
+            if info:
+                await get_formats(info)
+                logger.info(f"Prefetched next episode {url} in {time.monotonic() - start:.1f}s")
+        except Exception as e:
+            logger.warning(f"Prefetch of {url} failed: {e}")
+        finally:
+            self.active -= 1
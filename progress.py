@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in a stream's smoothed speed
+SPEED_SMOOTHING = 0.3
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+_SIZE_RE = re.compile(r'([\d.]+)\s*([KMGT]?)i?B', re.IGNORECASE)
+
+
+def parse_size(text):
+    """Bytes in a tool's size string such as '12.3MB' or '1.2GiB', or None."""
+    match = _SIZE_RE.search(text or '')
+    if not match:
+        return None
+    try:
+        return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+    except ValueError:
+        return None
+
+
+def format_size(num_bytes):
+    num_bytes = float(num_bytes or 0)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.2f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.2f} TB"
+
+
+def format_speed(bytes_per_sec):
+    bytes_per_sec = bytes_per_sec or 0
+    if bytes_per_sec >= 1024 * 1024:
+        return f"{bytes_per_sec / (1024 * 1024):.2f} MB/s"
+    return f"{bytes_per_sec / 1024:.2f} KB/s"
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def update_stream(stream, done_bytes=None, total_bytes=None, speed=None, now=None, **fields):
+    """Apply one progress sample to a stream's numeric progress dict.
+
+    ``speed`` is the tool's reported bytes/sec; without it the rate is derived
+    from the change in ``done_bytes``. Either way it is folded into an EWMA so
+    a single slow or bursty sample does not swing the ETA.
+    """
+    now = time.monotonic() if now is None else now
+    if speed is None and done_bytes is not None and 'sampled_at' in stream:
+        elapsed = now - stream['sampled_at']
+        if elapsed > 0:
+            speed = max(done_bytes - stream.get('done_bytes', 0), 0) / elapsed
+    stream.update(fields)
+    if done_bytes is not None:
+        stream['done_bytes'] = done_bytes
+    if total_bytes:
+        stream['total_bytes'] = total_bytes
+    if stream.get('percentage', 0) >= 100:
+        stream['speed'] = 0.0
+    elif speed is not None:
+        previous = stream.get('speed')
+        stream['speed'] = speed if not previous else SPEED_SMOOTHING * speed + (1 - SPEED_SMOOTHING) * previous
+    stream['sampled_at'] = now
+    return stream
+
+
+def parse_tool_sample(line):
+    """Numeric progress sample (percentage, segments, bytes, bytes/sec) from an N_m3u8DL-RE line."""
+    sample = {}
+    progress_match = re.search(r'(\d+\.\d+)%', line)
+    if progress_match:
+        sample['percentage'] = float(progress_match.group(1))
+
+    segments_match = re.search(r'(\d+)/(\d+)\s+\d+\.\d+%', line)
+    if segments_match:
+        sample['fragments'] = int(segments_match.group(1))
+        sample['total_fragments'] = int(segments_match.group(2))
+
+    size_match = re.search(r'([\d.]+[KMGT]?i?B)/([\d.]+[KMGT]?i?B)', line)
+    if size_match:
+        sample['done_bytes'] = parse_size(size_match.group(1))
+        sample['total_bytes'] = parse_size(size_match.group(2))
+
+    speed_match = re.search(r'([\d.]+[KMGT]?i?B)(?:ps|/s)', line)
+    if speed_match:
+        sample['speed'] = parse_size(speed_match.group(1))
+    return sample
+
+
+def apply_tool_line(progress_data, line, audio_key=None):
+    """Apply one N_m3u8DL-RE ``Vid``/``Aud`` progress line to a job's progress.
+
+    Audio progress is stored under ``audio_key`` (the stream id) when given,
+    otherwise under the language code the tool prints.
+    """
+    if line.startswith('Vid'):
+        res_match = re.search(r'Vid (\d+x\d+)', line)
+        resolution = res_match.group(1) if res_match else "N/A"
+        update_stream(progress_data['video'], resolution=resolution, **parse_tool_sample(line))
+    elif line.startswith('Aud'):
+        lang_match = re.search(r'Aud \d+ Kbps \| ([a-zA-Z0-9]+)', line)
+        language = lang_match.group(1).title() if lang_match else "Unknown"
+        stream = progress_data['audio'].setdefault(audio_key or language, {'language': language})
+        update_stream(stream, **parse_tool_sample(line))
+    return progress_data
+
+
+def iter_streams(progress_data):
+    """The video stream and every audio stream of a job."""
+    if progress_data.get('video'):
+        yield progress_data['video']
+    yield from progress_data.get('audio', {}).values()
+
+
+def remaining_bytes(stream):
+    """Bytes left in a stream, estimated from its percentage when the total is unknown."""
+    percentage = float(stream.get('percentage', 0))
+    if percentage >= 100:
+        return 0
+    done = stream.get('done_bytes', 0)
+    total = stream.get('total_bytes') or (done * 100 / percentage if done and percentage else None)
+    return None if total is None else max(total - done, 0)
+
+
+def total_speed(progress_data):
+    """Combined smoothed bytes/sec of every stream of a job."""
+    return sum(
+        stream.get('speed', 0) for stream in iter_streams(progress_data)
+        if float(stream.get('percentage', 0)) < 100
+    )
+
+
+def job_eta(streams, speed):
+    """Seconds until every stream finishes at ``speed``, or None when unknown."""
+    remaining = [remaining_bytes(stream) for stream in streams]
+    known = [r for r in remaining if r is not None]
+    if not known:
+        return None
+    if not sum(known):
+        return 0 if len(known) == len(remaining) else None
+    return sum(known) / speed if speed > 0 else None
+
+
+class ProgressBus:
+    """Publish/subscribe store for per-task progress.
+
+    Publishers use the same calls as the old DownloadProgress tracker. Every
+    change bumps a version number and wakes subscribers, which coalesce
+    changes at their own rate; a task that does not change costs nothing.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.versions = {}  # identifier -> version of its last change
+        self.user_tasks = {}  # user id -> identifiers of that user's tasks
+        self.version = 0
+        self._changed = asyncio.Event()
+
+    def _publish(self, identifier):
+        self.version += 1
+        if identifier in self.tasks:
+            self.versions[identifier] = self.version
+        else:
+            self.versions.pop(identifier, None)
+        # Wake everyone waiting on the current event and start a new one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def update_progress(self, identifier, progress_data):
+        """Update progress for a task using our existing progress_data structure"""
+        if identifier not in self.tasks:
+            self.tasks[identifier] = progress_data
+            self.user_tasks.setdefault(self._owner(identifier), set()).add(identifier)
+        elif self.tasks[identifier] is not progress_data:
+            self.tasks[identifier].update(progress_data)
+        self._publish(identifier)
+
+    def get_task_progress(self, identifier):
+        """Get progress for a specific task"""
+        return self.tasks.get(identifier, {})
+
+    def get_all_tasks(self):
+        """Get a copy of all tasks"""
+        return self.tasks.copy()
+
+    @staticmethod
+    def _owner(identifier):
+        # Identifiers start with the id of the user who started the task
+        return identifier.split('_')[0]
+
+    def get_user_tasks(self, user_id):
+        """Progress of one user's tasks, without scanning everyone else's"""
+        return {
+            identifier: self.tasks[identifier]
+            for identifier in self.user_tasks.get(str(user_id), ())
+        }
+
+    def get_version(self, identifier=None):
+        """Version of the last change to one task, or to any task."""
+        if identifier is None:
+            return self.version
+        return self.versions.get(identifier)
+
+    def clear_task(self, identifier):
+        """Clear progress data for a task"""
+        if identifier in self.tasks:
+            self.tasks.pop(identifier, None)
+            owner = self._owner(identifier)
+            self.user_tasks.get(owner, set()).discard(identifier)
+            if not self.user_tasks.get(owner):
+                self.user_tasks.pop(owner, None)
+            self._publish(identifier)
+            logger.info(f"Cleared task from progress tracking: {identifier}")
+
+    async def wait_for_change(self, since, identifier=None):
+        """Wait until the version moves past ``since``; None once the task is gone."""
+        while True:
+            current = self.get_version(identifier)
+            if current is None:
+                return None
+            if current > since:
+                return current
+            await self._changed.wait()
+
+    async def subscribe(self, identifier=None, interval=2.0):
+        """Yield the latest version whenever something changed, at most every ``interval`` seconds.
+
+        With an identifier the subscription follows one task and ends when the
+        task is cleared; without one it follows every task.
+        """
+        seen = 0
+        while True:
+            version = await self.wait_for_change(seen, identifier)
+            if version is None:
+                return
+            seen = version
+            yield version
+            # Changes made meanwhile are picked up together on the next pass
+            await asyncio.sleep(interval)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class RcloneError(Exception):
+    pass
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RcloneDaemon:
+    """A long-lived ``rclone rcd`` process for one config file, driven over its rc API.
+
+    Started lazily on the first call and restarted if it dies, so uploads,
+    listings and quota checks never pay for an rclone process start-up.
+    """
+
+    def __init__(self, config_file=None, multi_thread_streams=8, transfers=4, start_timeout=30):
+        self.config_file = config_file
+        self.multi_thread_streams = multi_thread_streams
+        self.transfers = transfers
+        self.start_timeout = start_timeout
+        self.process = None
+        self.session = None
+        self.base_url = None
+        self.auth = None
+        self.lock = asyncio.Lock()
+
+    async def start(self):
+        async with self.lock:
+            if self.process is not None and self.process.returncode is None:
+                return
+            port = _free_port()
+            user, password = "rclone", secrets.token_urlsafe(16)
+            cmd = [
+                'rclone', 'rcd',
+                '--rc-addr', f'127.0.0.1:{port}',
+                '--rc-user', user, '--rc-pass', password,
+                '--multi-thread-streams', str(self.multi_thread_streams),
+                '--transfers', str(self.transfers),
+            ]
+            if self.config_file and os.path.exists(self.config_file):
+                cmd.extend(['--config', self.config_file])
+            self.process = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            self.base_url = f"http://127.0.0.1:{port}"
+            self.auth = aiohttp.BasicAuth(user, password)
+            if self.session is None or self.session.closed:
+                self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_read=120))
+
+            # Wait for the rc server to answer
+            deadline = time.monotonic() + self.start_timeout
+            while True:
+                try:
+                    await self._post("rc/noop")
+                    break
+                except (aiohttp.ClientError, RcloneError):
+                    if self.process.returncode is not None or time.monotonic() > deadline:
+                        raise RcloneError(f"rclone rcd did not start for config {self.config_file}")
+                    await asyncio.sleep(0.2)
+            logger.info(f"Started rclone rcd (pid {self.process.pid}) on port {port} for config {self.config_file}")
+
+    async def _post(self, method, params=None):
+        async with self.session.post(f"{self.base_url}/{method}", json=params or {}, auth=self.auth) as response:
+            result = await response.json(content_type=None)
+            if response.status != 200:
+                raise RcloneError(f"{method} failed: {result.get('error', response.status)}")
+            return result
+
+    async def call(self, method, **params):
+        """Call an rc method, starting the daemon first if needed."""
+        await self.start()
+        return await self._post(method, params)
+
+    async def copy_file(self, src_path, remote, dst_path, progress=None, poll_interval=2):
+        """Upload a local file to ``remote:dst_path`` as an async rc job.
+
+        ``progress(current, total)`` is awaited with the bytes transferred so
+        far, read from the job's ``core/stats`` group.
+        """
+        src_path = os.path.abspath(src_path)
+        total = os.path.getsize(src_path)
+        group = f"upload-{secrets.token_hex(6)}"
+        job = await self.call(
+            "operations/copyfile",
+            srcFs=os.path.dirname(src_path), srcRemote=os.path.basename(src_path),
+            dstFs=f"{remote}:", dstRemote=dst_path,
+            _async=True, _group=group,
+        )
+        job_id = job["jobid"]
+        try:
+            while True:
+                status = await self.call("job/status", jobid=job_id)
+                if status.get("finished"):
+                    if not status.get("success"):
+                        raise RcloneError(f"Upload of {src_path} failed: {status.get('error')}")
+                    if progress:
+                        await progress(total, total)
+                    return
+                if progress:
+                    stats = await self.call("core/stats", group=group)
+                    await progress(min(stats.get("bytes", 0), total), total)
+                await asyncio.sleep(poll_interval)
+        except asyncio.CancelledError:
+            try:
+                await self.call("job/stop", jobid=job_id)
+            except Exception:
+                pass
+            raise
+        finally:
+            try:
+                await self.call("core/stats-delete", group=group)
+            except Exception:
+                pass
+
+    async def public_link(self, remote, path):
+        result = await self.call("operations/publiclink", fs=f"{remote}:", remote=path)
+        return result.get("url")
+
+    async def list_files(self, remote, path=""):
+        """Every file under ``remote:path`` as rclone lsjson entries."""
+        result = await self.call(
+            "operations/list", fs=f"{remote}:", remote=path,
+            opt={"recurse": True, "filesOnly": True}
+        )
+        return result.get("list", [])
+
+    async def delete_file(self, remote, path):
+        await self.call("operations/deletefile", fs=f"{remote}:", remote=path)
+
+    async def about(self, remote):
+        return await self.call("operations/about", fs=f"{remote}:")
+
+    async def stop(self):
+        if self.process is not None and self.process.returncode is None:
+            try:
+                await self._post("core/quit")
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except Exception:
+                self.process.terminate()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+class RcloneDaemons:
+    """One RcloneDaemon per rclone config file."""
+
+    def __init__(self, **daemon_options):
+        self.daemon_options = daemon_options
+        self.daemons = {}
+
+    def get(self, config_file=None):
+        daemon = self.daemons.get(config_file)
+        if daemon is None:
+            daemon = self.daemons[config_file] = RcloneDaemon(config_file, **self.daemon_options)
+        return daemon
+
+    async def stop_all(self):
+        await asyncio.gather(*(daemon.stop() for daemon in self.daemons.values()), return_exceptions=True)
+        self.daemons.clear()
@@ -2,81 +2,151 @@ import asyncio
 import logging
 from pyrogram import Client
 
+
+class PooledSession:
+    """A premium client plus the load it is carrying."""
+
+    def __init__(self, index):
+        self.index = index
+        self.client = None
+        self.healthy = False
+        self.active_uploads = 0
+        self.in_flight_bytes = 0
+        self.total_uploads = 0
+        self.total_bytes = 0
+        self.failures = 0
+
+
 class PremiumSessionPool:
-    def __init__(self, session_string, max_sessions=3):
+    """Premium user sessions shared by large Telegram uploads.
+
+    Every client is started at boot by ``start``. ``get_session`` hands out
+    the healthy session with the fewest in-flight bytes without waiting, so
+    parallel uploads spread across sessions instead of queueing on one.
+    ``release_session`` takes the load back off. A background health check
+    reconnects sessions that stopped answering.
+    """
+
+    def __init__(self, session_string, max_sessions=3, health_interval=60, max_concurrent_transmissions=4):
         self.session_string = session_string
         self.max_sessions = max_sessions
-        self.sessions = []
-        self.session_semaphore = asyncio.Semaphore(max_sessions)
-        self.session_locks = {}  # Lock per session to prevent concurrent use
-        self.current_session_index = 0
+        self.max_concurrent_transmissions = max_concurrent_transmissions
+        self.health_interval = health_interval
+        self.sessions = [PooledSession(index) for index in range(max_sessions)]
+        self.health_task = None
+        self.start_lock = asyncio.Lock()
+        self.started = False
         self.logger = logging.getLogger("PremiumSessionPool")
 
-    async def  soget_session(self):
-        async with self.session_semaphore:
-            if not self.sessions:
-                # Initialize first session
-                return await self._create_new_session()
-            
-            # Try to get an available session
-            for _ in range(len(self.sessions)):
-                session = self.sessions[self.current_session_index]
-                session_lock = self.session_locks.get(id(session))
-                
-                if session_lock is None or not session_lock.locked():
-                    # Create a new lock if doesn't exist
-                    if session_lock is None:
-                        self.session_locks[id(session)] = asyncio.Lock()
-                    
-                    # Try to acquire the lock
-                    if await self.session_locks[id(session)].acquire():
-                        return session
-                
-                # Move to next session
-                self.current_session_index = (self.current_session_index + 1) % len(self.sessions)
-            
-            # If no available session, create new one if under limit
-            if len(self.sessions) < self.max_sessions:
-                return await self._create_new_session()
-            
-            # Wait for an available session
-            while True:
-                session = self.sessions[self.current_session_index]
-                session_lock = self.session_locks[id(session)]
-                
-                if not session_lock.locked():
-                    await session_lock.acquire()
-                    return session
-                
-                self.current_session_index = (self.current_session_index + 1) % len(self.sessions)
-                await asyncio.sleep(1)
+    async def start(self):
+        """Start every session and the health check; safe to call more than once."""
+        if not self.session_string:
+            return
+        async with self.start_lock:
+            if self.started:
+                return
+            await asyncio.gather(*(self._connect(pooled) for pooled in self.sessions))
+            self.started = True
+            if self.health_task is None or self.health_task.done():
+                self.health_task = asyncio.create_task(self._health_loop())
+            healthy = sum(pooled.healthy for pooled in self.sessions)
+            self.logger.info(f"Premium session pool started: {healthy}/{len(self.sessions)} sessions healthy")
 
-    async def _create_new_session(self):
+    async def _connect(self, pooled):
+        if pooled.client is not None:
+            try:
+                await pooled.client.stop()
+            except Exception:
+                pass
         try:
-            session = Client(f"premium_bot_{len(self.sessions)}", session_string=self.session_string)
-            await session.start()
-            self.sessions.append(session)
-            self.session_locks[id(session)] = asyncio.Lock()
-            await self.session_locks[id(session)].acquire()
-            self.logger.info(f"Created new premium session {len(self.sessions)}")
-            return session
+            client = Client(
+                f"premium_bot_{pooled.index}", session_string=self.session_string,
+                max_concurrent_transmissions=self.max_concurrent_transmissions
+            )
+            await client.start()
+            pooled.client = client
+            pooled.healthy = True
+            self.logger.info(f"Premium session {pooled.index} connected")
         except Exception as e:
-            self.logger.error(f"Failed to create premium session: {e}")
-            raise
+            pooled.client = None
+            pooled.healthy = False
+            pooled.failures += 1
+            self.logger.error(f"Failed to start premium session {pooled.index}: {e}")
 
-    async def release_session(self, session):
-        if session in self.sessions:
-            session_lock = self.session_locks.get(id(session))
-            if session_lock and session_lock.locked():
-                session_lock.release()
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(self._check(pooled) for pooled in self.sessions))
+
+    async def _check(self, pooled):
+        # Sessions carrying an upload are evidently alive
+        if pooled.active_uploads:
+            return
+        if pooled.client is not None:
+            try:
+                await asyncio.wait_for(pooled.client.get_me(), timeout=15)
+                pooled.healthy = True
+                return
+            except Exception as e:
+                self.logger.warning(f"Premium session {pooled.index} failed its health check: {e}")
+        pooled.healthy = False
+        await self._connect(pooled)
+
+    async def get_session(self, size_bytes=0):
+        """The least-loaded healthy client, or None if no session is usable."""
+        if not self.started:
+            await self.start()
+        healthy = [pooled for pooled in self.sessions if pooled.healthy]
+        if not healthy:
+            self.logger.warning("No healthy premium session available")
+            return None
+        pooled = min(healthy, key=lambda p: (p.in_flight_bytes, p.active_uploads))
+        pooled.active_uploads += 1
+        pooled.in_flight_bytes += size_bytes
+        pooled.total_uploads += 1
+        return pooled.client
+
+    async def release_session(self, session, size_bytes=0, failed=False):
+        """Take an upload's load off its session; a failed upload triggers a health check."""
+        for pooled in self.sessions:
+            if pooled.client is session:
+                pooled.active_uploads = max(pooled.active_uploads - 1, 0)
+                pooled.in_flight_bytes = max(pooled.in_flight_bytes - size_bytes, 0)
+                if failed:
+                    pooled.failures += 1
+                    asyncio.create_task(self._check(pooled))
+                else:
+                    pooled.total_bytes += size_bytes
+                return
+
+    def metrics(self):
+        """Per-session load and health, for status commands."""
+        total_in_flight = sum(pooled.in_flight_bytes for pooled in self.sessions)
+        return [
+            {
+                "index": pooled.index,
+                "healthy": pooled.healthy,
+                "active_uploads": pooled.active_uploads,
+                "in_flight_bytes": pooled.in_flight_bytes,
+                "utilization": pooled.in_flight_bytes / total_in_flight if total_in_flight else 0.0,
+                "total_uploads": pooled.total_uploads,
+                "total_bytes": pooled.total_bytes,
+                "failures": pooled.failures,
+            }
+            for pooled in self.sessions
+        ]
 
     async def close_all_sessions(self):
-        for session in self.sessions:
+        if self.health_task is not None:
+            self.health_task.cancel()
+            self.health_task = None
+        for pooled in self.sessions:
+            if pooled.client is None:
+                continue
             try:
-                await session.stop()
+                await pooled.client.stop()
             except Exception as e:
                 self.logger.error(f"Error closing session: {e}")
-        self.sessions.clear()
-        self.session_locks.clear()
-
-# Initialize the premium session pool
+            pooled.client = None
+            pooled.healthy = False
+        self.started = False
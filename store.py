@@ -0,0 +1,614 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindStore:
+    """Base for in-memory stores that are persisted to a JSON file in the background.
+
+    Subclasses call ``_schedule_flush`` after each change and implement
+    ``_snapshot`` and ``_evict``; at most one write is pending at a time.
+    """
+
+    def __init__(self, path, flush_delay=2.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.flush_task = None
+        self.dirty = False
+
+    def _snapshot(self):
+        raise NotImplementedError
+
+    def _evict(self):
+        pass
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        except Exception as e:
+            logger.error(f"Error loading {self.path}: {e}")
+            return None
+
+    def _schedule_flush(self):
+        self.dirty = True
+        if self.flush_task is not None and not self.flush_task.done():
+            return
+        try:
+            self.flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        except RuntimeError:
+            # No event loop yet (e.g. while loading); the next change will flush
+            self.flush_task = None
+
+    async def _flush_later(self):
+        while self.dirty:
+            await asyncio.sleep(self.flush_delay)
+            await self.flush()
+
+    async def flush(self):
+        """Write the current state to disk."""
+        self._evict()
+        self.dirty = False
+        payload = json.dumps(self._snapshot())
+        try:
+            await asyncio.to_thread(self._write, payload)
+        except Exception as e:
+            logger.error(f"Error writing {self.path}: {e}")
+
+    def _write(self, payload):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+
+
+class ContentStore(WriteBehindStore):
+    """In-memory content info shared per title, with per-identifier overlays.
+
+    Each ``(platform, content_id, language)`` is held once no matter how many
+    users requested it; an identifier only keeps its own overlay of user
+    specific fields such as ``force_drive_upload``. Changes are written to
+    disk in the background, so lookups never touch the file system.
+    """
+
+    def __init__(self, path, ttl=3600, flush_delay=2.0):
+        super().__init__(path, flush_delay)
+        self.ttl = ttl
+        self.contents = {}  # content key -> content info
+        self.identifiers = {}  # identifier -> {"key", "overlay", "expires"}
+        self._load()
+
+    @staticmethod
+    def content_key(identifier, info):
+        content_id = info.get("content_id")
+        if not content_id:
+            # Without an ID there is nothing to share the entry with
+            return f"identifier:{identifier}"
+        return f"{info.get('platform', '')}:{content_id}:{info.get('language_code') or ''}"
+
+    def put(self, identifier, info, **overlay):
+        """Store ``info`` for ``identifier``; keyword arguments go to its overlay."""
+        info = dict(info)
+        overlay = {**{k: info.pop(k) for k in ("force_drive_upload",) if k in info}, **overlay}
+        info.pop("timestamp", None)
+        key = self.content_key(identifier, info)
+        self.contents[key] = info
+        self.identifiers[identifier] = {
+            "key": key,
+            "overlay": overlay,
+            "expires": time.time() + self.ttl,
+        }
+        self._schedule_flush()
+
+    def get(self, identifier):
+        """Return the merged content info for ``identifier`` or None.
+
+        The result is a shallow copy; nested stream data is shared between
+        users and must not be modified in place.
+        """
+        entry = self.identifiers.get(identifier)
+        if entry is None:
+            return None
+        if entry["expires"] <= time.time():
+            self._evict()
+            return None
+        info = self.contents.get(entry["key"])
+        if info is None:
+            return None
+        return {**info, **entry["overlay"]}
+
+    def update_overlay(self, identifier, **fields):
+        entry = self.identifiers.get(identifier)
+        if entry is None:
+            return False
+        entry["overlay"].update(fields)
+        self._schedule_flush()
+        return True
+
+    def _evict(self):
+        now = time.time()
+        expired = [i for i, entry in self.identifiers.items() if entry["expires"] <= now]
+        for identifier in expired:
+            del self.identifiers[identifier]
+        referenced = {entry["key"] for entry in self.identifiers.values()}
+        for key in [k for k in self.contents if k not in referenced]:
+            del self.contents[key]
+        if expired:
+            self._schedule_flush()
+
+    def _snapshot(self):
+        return {"contents": self.contents, "identifiers": self.identifiers}
+
+    def _load(self):
+        data = self._read()
+        if not isinstance(data, dict):
+            return
+
+        now = time.time()
+        if "identifiers" in data and "contents" in data:
+            self.contents = data["contents"]
+            self.identifiers = {i: e for i, e in data["identifiers"].items() if e.get("expires", 0) > now}
+        else:
+            # Older files map identifiers straight to timestamped content info
+            for identifier, info in data.items():
+                if isinstance(info, dict) and now - info.get("timestamp", 0) < self.ttl:
+                    self.put(identifier, info)
+                    self.identifiers[identifier]["expires"] = info.get("timestamp", now) + self.ttl
+        self._evict()
+
+
+class SelectionStore(WriteBehindStore):
+    """Resolution and audio selection sessions, one per request identifier.
+
+    Sessions live in memory and expire ``ttl`` seconds after their own last
+    change. The file is only written in the background for crash recovery.
+    """
+
+    def __init__(self, path, ttl=3600, flush_delay=2.0):
+        super().__init__(path, flush_delay)
+        self.ttl = ttl
+        self.sessions = {}
+        self._load()
+
+    def get(self, identifier):
+        """Return the session for ``identifier`` or None if missing or expired."""
+        session = self.sessions.get(identifier)
+        if session is None:
+            return None
+        if session["expires"] <= time.time():
+            self._evict()
+            return None
+        return session
+
+    def session(self, identifier):
+        """Return the session for ``identifier``, starting a new one if needed."""
+        session = self.get(identifier)
+        if session is None:
+            session = {
+                "selected_resolution": None,
+                "selected_audios": [],
+                "stream_id_map": {},
+                "processing": False,
+                "expires": time.time() + self.ttl,
+            }
+            self.sessions[identifier] = session
+        return session
+
+    def touch(self, identifier):
+        """Record a change to a session, extending only its own lifetime."""
+        session = self.sessions.get(identifier)
+        if session is not None:
+            session["expires"] = time.time() + self.ttl
+            self._schedule_flush()
+
+    def pop(self, identifier):
+        session = self.sessions.pop(identifier, None)
+        if session is not None:
+            self._schedule_flush()
+        return session
+
+    def _evict(self):
+        now = time.time()
+        expired = [i for i, session in self.sessions.items() if session["expires"] <= now]
+        for identifier in expired:
+            del self.sessions[identifier]
+        if expired:
+            self._schedule_flush()
+
+    def _snapshot(self):
+        return self.sessions
+
+    def _load(self):
+        data = self._read()
+        if not isinstance(data, dict):
+            return
+
+        now = time.time()
+        for identifier, session in data.items():
+            if not isinstance(session, dict):
+                continue
+            # Older files only carry the time of the last save
+            expires = session.pop("expires", session.pop("timestamp", 0) + self.ttl)
+            if expires <= now:
+                continue
+            session.setdefault("selected_resolution", None)
+            session.setdefault("selected_audios", [])
+            session.setdefault("stream_id_map", {})
+            # Whatever was processing died with the previous run
+            session["processing"] = False
+            session["expires"] = expires
+            self.sessions[identifier] = session
+
+
+class ProgressStore:
+    """Per-stream download progress kept in SQLite (WAL mode).
+
+    Writes are upserts of individual stream rows, serialised through one
+    worker thread so the event loop never blocks on disk. Readers open their
+    own connections and are not blocked by the writer. Finished content is
+    pruned after ``retention`` seconds, abandoned content after ``max_age``.
+    """
+
+    STREAM_FIELDS = (
+        "type", "percentage", "download_done", "resolution", "bitrate",
+        "language", "speed", "downloaded_size", "total_size",
+    )
+
+    def __init__(self, path, retention=3600, max_age=24 * 3600, prune_interval=300):
+        self.path = path
+        self.retention = retention
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self.last_prune = 0
+        self.conn = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="progress-db")
+
+    def _connect(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS streams (
+                    platform TEXT NOT NULL,
+                    content_id TEXT NOT NULL,
+                    stream_id TEXT NOT NULL,
+                    type TEXT,
+                    percentage REAL,
+                    download_done INTEGER,
+                    resolution TEXT,
+                    bitrate INTEGER,
+                    language TEXT,
+                    speed TEXT,
+                    downloaded_size TEXT,
+                    total_size TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (platform, content_id, stream_id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS contents (
+                    platform TEXT NOT NULL,
+                    content_id TEXT NOT NULL,
+                    download_complete INTEGER,
+                    updated_at REAL,
+                    PRIMARY KEY (platform, content_id)
+                )
+            """)
+            conn.commit()
+            self.conn = conn
+        return self.conn
+
+    async def upsert(self, platform, content_id, streams, complete=None):
+        """Upsert ``streams`` ({stream_id: fields}) for one piece of content.
+
+        ``complete`` overrides the completion flag, which otherwise follows
+        the ``download_done`` state of every stream recorded for the content.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._upsert, platform, str(content_id), streams, complete)
+
+    def _upsert(self, platform, content_id, streams, complete):
+        conn = self._connect()
+        now = time.time()
+        columns = ", ".join(self.STREAM_FIELDS)
+        placeholders = ", ".join("?" for _ in self.STREAM_FIELDS)
+        updates = ", ".join(f"{field} = excluded.{field}" for field in self.STREAM_FIELDS)
+        with conn:
+            conn.executemany(
+                f"INSERT INTO streams (platform, content_id, stream_id, {columns}, updated_at) "
+                f"VALUES (?, ?, ?, {placeholders}, ?) "
+                f"ON CONFLICT (platform, content_id, stream_id) DO UPDATE SET {updates}, updated_at = excluded.updated_at",
+                [
+                    (platform, content_id, stream_id, *(fields.get(f) for f in self.STREAM_FIELDS), now)
+                    for stream_id, fields in streams.items()
+                ]
+            )
+            if complete is None:
+                pending = conn.execute(
+                    "SELECT COUNT(*) FROM streams WHERE platform = ? AND content_id = ? AND NOT download_done",
+                    (platform, content_id)
+                ).fetchone()[0]
+                complete = pending == 0
+            conn.execute(
+                "INSERT INTO contents (platform, content_id, download_complete, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (platform, content_id) DO UPDATE SET "
+                "download_complete = excluded.download_complete, updated_at = excluded.updated_at",
+                (platform, content_id, int(bool(complete)), now)
+            )
+        if now - self.last_prune >= self.prune_interval:
+            self._prune(now)
+
+    def _prune(self, now):
+        self.last_prune = now
+        conn = self._connect()
+        with conn:
+            stale = (
+                "SELECT platform, content_id FROM contents WHERE "
+                "(download_complete AND updated_at < ?) OR updated_at < ?"
+            )
+            args = (now - self.retention, now - self.max_age)
+            conn.execute(f"DELETE FROM streams WHERE (platform, content_id) IN ({stale})", args)
+            conn.execute(
+                "DELETE FROM contents WHERE (download_complete AND updated_at < ?) OR updated_at < ?", args
+            )
+
+    def snapshot(self):
+        """Read all progress as {platform: {content_id: {stream_id: fields, "download_complete": bool}}}."""
+        if not os.path.exists(self.path):
+            return {}
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            result = {}
+            for row in conn.execute("SELECT platform, content_id, download_complete FROM contents"):
+                result.setdefault(row["platform"], {})[row["content_id"]] = {
+                    "download_complete": bool(row["download_complete"])
+                }
+            for row in conn.execute("SELECT * FROM streams"):
+                content = result.setdefault(row["platform"], {}).setdefault(
+                    row["content_id"], {"download_complete": False}
+                )
+                fields = {field: row[field] for field in self.STREAM_FIELDS if row[field] is not None}
+                fields["download_done"] = bool(row["download_done"])
+                content[row["stream_id"]] = fields
+            return result
+        finally:
+            conn.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class QuotaLedger(WriteBehindStore):
+    """Trial task quotas with atomic reserve, commit and refund.
+
+    Balances are served from memory. A reservation takes one task at once
+    and is written back as a delta on the current file contents, so tasks
+    granted by the verify bot in the meantime are kept. The file is
+    re-read when it changes on disk, checked at most every
+    ``reload_interval`` seconds or whenever a balance is empty.
+    """
+
+    def __init__(self, path, flush_delay=1.0, reload_interval=30):
+        super().__init__(path, flush_delay)
+        self.reload_interval = reload_interval
+        self.plans = {}
+        self.pending = {}  # (user_id, field) -> delta not yet on disk
+        self.reservations = {}  # identifier -> (user_id, field)
+        self.mtime = None
+        self.last_check = 0
+        self._reload()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _reload(self):
+        data = self._read()
+        self.mtime = self._file_mtime()
+        self.last_check = time.monotonic()
+        self.plans = data if isinstance(data, dict) else {}
+        for (user_id, field), delta in self.pending.items():
+            self._adjust(self.plans, user_id, field, delta)
+
+    def _maybe_reload(self, force=False):
+        if not force and time.monotonic() - self.last_check < self.reload_interval:
+            return
+        self.last_check = time.monotonic()
+        if self._file_mtime() != self.mtime:
+            self._reload()
+
+    @staticmethod
+    def _adjust(plans, user_id, field, delta):
+        plan = plans.setdefault(user_id, {})
+        plan[field] = max(0, plan.get(field, 0) + delta)
+
+    def get_plan(self, user_id):
+        """Return a copy of a user's plan, e.g. {"720p_limit": 2, "1080p_limit": 0}."""
+        self._maybe_reload()
+        plan = self.plans.get(str(user_id), {})
+        if not any(plan.get(field, 0) > 0 for field in ("720p_limit", "1080p_limit")):
+            # Tasks may just have been granted by the verify bot
+            self._maybe_reload(force=True)
+            plan = self.plans.get(str(user_id), {})
+        return dict(plan)
+
+    def balance(self, user_id, field):
+        return self.get_plan(user_id).get(field, 0)
+
+    def reserve(self, identifier, user_id, field):
+        """Take one ``field`` task for ``identifier``; False if none are left."""
+        user_id = str(user_id)
+        if self.balance(user_id, field) <= 0:
+            return False
+        self._change(user_id, field, -1)
+        self.reservations[identifier] = (user_id, field)
+        return True
+
+    def commit(self, identifier):
+        """Keep the task reserved for ``identifier`` as spent."""
+        return self.reservations.pop(identifier, None) is not None
+
+    def refund(self, identifier):
+        """Return the task reserved for ``identifier`` to its user."""
+        reservation = self.reservations.pop(identifier, None)
+        if reservation is None:
+            return False
+        self._change(*reservation, 1)
+        return True
+
+    def _change(self, user_id, field, delta):
+        self._adjust(self.plans, user_id, field, delta)
+        key = (user_id, field)
+        self.pending[key] = self.pending.get(key, 0) + delta
+        self._schedule_flush()
+
+    def _snapshot(self):
+        return self.plans
+
+    async def flush(self):
+        """Apply pending deltas to the file as it is on disk now."""
+        self.dirty = False
+        deltas, self.pending = self.pending, {}
+        if not deltas:
+            return
+        try:
+            plans, mtime = await asyncio.to_thread(self._apply, deltas)
+        except Exception as e:
+            logger.error(f"Error writing {self.path}: {e}")
+            for key, delta in deltas.items():
+                self.pending[key] = self.pending.get(key, 0) + delta
+            self.dirty = True
+            return
+        # Rebase the in-memory view on what was written plus newer changes
+        for (user_id, field), delta in self.pending.items():
+            self._adjust(plans, user_id, field, delta)
+        self.plans = plans
+        self.mtime = mtime
+
+    def _apply(self, deltas):
+        plans = self._read()
+        if not isinstance(plans, dict):
+            plans = {}
+        for (user_id, field), delta in deltas.items():
+            self._adjust(plans, user_id, field, delta)
+        self._write(json.dumps(plans, indent=4))
+        return plans, self._file_mtime()
+
+
+class WatchedFile:
+    """Parsed contents of a JSON file, kept in memory and refreshed on change.
+
+    ``watch`` polls the file's mtime in the background and ``value`` is a plain
+    attribute, so readers never touch the file system. ``reload`` forces a
+    re-read, e.g. right after this process wrote the file or on admin request.
+    """
+
+    def __init__(self, path, parse=None, default=None, interval=5):
+        self.path = path
+        self.parse = parse or (lambda data: data)
+        self.default = default
+        self.interval = interval
+        self.mtime = None
+        self.value = default
+        self.reload()
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def reload(self):
+        self.mtime = self._mtime()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.value = self.parse(json.load(f))
+        except FileNotFoundError:
+            self.value = self.default
+        except json.JSONDecodeError as e:
+            # Most likely read mid-write; keep the last good value and retry
+            # on the next poll
+            logger.warning(f"Could not parse {self.path}, keeping the previous contents: {e}")
+            self.mtime = None
+        except Exception as e:
+            logger.error(f"Error loading {self.path}: {e}")
+        return self.value
+
+    def refresh(self):
+        """Re-read the file if it changed since the last read."""
+        if self._mtime() != self.mtime:
+            self.reload()
+            return True
+        return False
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Error watching {self.path}: {e}")
+
+
+class DeliveryIndex(WriteBehindStore):
+    """Channel messages already holding a given output file.
+
+    Keyed by ``(platform, content_id, video stream, audio streams, container)``
+    so an identical request can be answered by copying the stored messages
+    instead of downloading and uploading again. Entries whose messages were
+    deleted are dropped by the caller through ``invalidate``.
+    """
+
+    def __init__(self, path, flush_delay=2.0):
+        super().__init__(path, flush_delay)
+        self.entries = {}
+        self._load()
+
+    @staticmethod
+    def key(platform, content_id, video_stream_id, audio_stream_ids, container):
+        audio = ",".join(sorted(str(stream_id) for stream_id in audio_stream_ids))
+        return f"{platform}:{content_id}:{video_stream_id}:{audio}:{container}"
+
+    def get(self, key):
+        """Return ``{"chat_id", "message_ids", "created"}`` for ``key`` or None."""
+        return self.entries.get(key)
+
+    def put(self, key, chat_id, message_ids):
+        self.entries[key] = {
+            "chat_id": chat_id,
+            "message_ids": list(message_ids),
+            "created": time.time(),
+        }
+        self._schedule_flush()
+
+    def invalidate(self, key):
+        if self.entries.pop(key, None) is not None:
+            self._schedule_flush()
+
+    def _snapshot(self):
+        return self.entries
+
+    def _load(self):
+        data = self._read()
+        if isinstance(data, dict):
+            self.entries = {
+                key: entry for key, entry in data.items()
+                if isinstance(entry, dict) and entry.get("message_ids")
+            }
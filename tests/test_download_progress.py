@@ -0,0 +1,50 @@
+import asyncio
+
+import download
+from store import ProgressStore
+
+AUDIO_LINE = "Aud 128 Kbps | hin | 2CH ━━━━━━━━━━━━━━━━━━━━ 301/301 100.00% 45.23MB/45.23MB 2.31MBps 00:00:00"
+VIDEO_LINE = "Vid 1920x1080 | 4000 Kbps | avc1 ━━━━━━━━━━━━━━━━━━━━ 301/301 100.00% 1.21GB/1.21GB 8.50MBps 00:00:00"
+
+
+class _Bus:
+    def update_progress(self, identifier, progress_data):
+        pass
+
+
+def test_tool_audio_line_completes_its_progress_row(tmp_path, monkeypatch):
+    store = ProgressStore(str(tmp_path / "download_progress.db"))
+    monkeypatch.setattr(download, "progress_store", store)
+    monkeypatch.setattr(download, "download_progress", _Bus())
+
+    content_info = {
+        "platform": "JioHotstar",
+        "content_id": "1260000001",
+        "streams_info": {"audio": [{"stream_id": "aud-hin", "language": "Hindi", "bitrate": 128}]},
+    }
+    downloader = download.Nm3u8DLREDownloader(
+        stream_url="https://example.com/master.mpd",
+        selected_resolution={"stream_id": "vid-1080", "resolution": "1920x1080", "bitrate": 4000},
+        selected_audios=["aud-hin"],
+        content_info=content_info,
+        download_dir=str(tmp_path),
+        filename="Title",
+        identifier="1_abc",
+    )
+
+    async def run():
+        downloader.progress_data = downloader._init_progress_data()
+        await downloader._handle_output_line(VIDEO_LINE, "video")
+        await downloader._handle_output_line(AUDIO_LINE, "audio_1")
+        await downloader._update_progress_store(force=True)
+
+    try:
+        asyncio.run(run())
+        content = store.snapshot()["JioHotstar"]["1260000001"]
+    finally:
+        store.close()
+
+    assert content["aud-hin"]["percentage"] == 100
+    assert content["aud-hin"]["download_done"]
+    assert content["aud-hin"]["language"] == "Hindi"
+    assert content["download_complete"]
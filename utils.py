@@ -2,10 +2,12 @@ import asyncio
 import os
 import json
 import shutil
-import time
 import cv2
 from datetime import datetime, timezone
 import logging
+from store import ContentStore
+from rclone import RcloneDaemons, RcloneError
+from config import RCLONE_MULTI_THREAD_STREAMS, RCLONE_TRANSFERS
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +17,14 @@ DRIVE_SIZE_CACHE_PATH = os.path.join(CACHE_DIR, 'drive_size.json')
 CONTENT_STORAGE_PATH = os.path.join(CACHE_DIR, 'content_storage.json')
 RCLONE_CONFIG_DIR = os.path.join(CACHE_DIR, 'rclone')
 
+# Content info for pending selections, kept in memory and written behind
+content_store = ContentStore(CONTENT_STORAGE_PATH, ttl=3600)
+
+# rclone rc daemons, one per config file, shared by uploads, listings and quota checks
+rclone_daemons = RcloneDaemons(
+    multi_thread_streams=RCLONE_MULTI_THREAD_STREAMS, transfers=RCLONE_TRANSFERS
+)
+
 # Map of drives to their config files
 DRIVE_CONFIG_MAP = {
     "shantosh": {"config": "shantosh.conf", "drive_name": "shantosh"}
@@ -57,25 +67,24 @@ async def get_thumbnail(identifier, file_path, download_dir):
     
     # Try getting from content storage first
     try:
-        with open(CONTENT_STORAGE_PATH, 'r') as f:
-            content_data = json.load(f)
-            if thumb_url := content_data[identifier].get('thumbnail'):
-                curl_cmd = ['curl', '-s', '-L', '--max-time', '10', '-o', thumb_path, thumb_url]
-                _, stderr, returncode = await run_subprocess(curl_cmd)
-                
-                if returncode == 0 and os.path.exists(thumb_path) and os.path.getsize(thumb_path) > 0:
-                    # Re-encode the downloaded thumbnail using OpenCV to ensure compatibility
-                    try:
-                        img = cv2.imread(thumb_path)
-                        if img is not None:
-                            cv2.imwrite(thumb_path, img)
-                            return thumb_path
-                        else:
-                            logger.error(f"Downloaded thumbnail could not be read by OpenCV for {identifier}")
-                    except Exception as e:
-                        logger.error(f"Error re-encoding thumbnail for {identifier}: {e}")
-                else:
-                    logger.error(f"Curl download failed for {identifier}: {stderr}")
+        content_info = content_store.get(identifier) or {}
+        if thumb_url := content_info.get('thumbnail'):
+            curl_cmd = ['curl', '-s', '-L', '--max-time', '10', '-o', thumb_path, thumb_url]
+            _, stderr, returncode = await run_subprocess(curl_cmd)
+            
+            if returncode == 0 and os.path.exists(thumb_path) and os.path.getsize(thumb_path) > 0:
+                # Re-encode the downloaded thumbnail using OpenCV to ensure compatibility
+                try:
+                    img = cv2.imread(thumb_path)
+                    if img is not None:
+                        cv2.imwrite(thumb_path, img)
+                        return thumb_path
+                    else:
+                        logger.error(f"Downloaded thumbnail could not be read by OpenCV for {identifier}")
+                except Exception as e:
+                    logger.error(f"Error re-encoding thumbnail for {identifier}: {e}")
+            else:
+                logger.error(f"Curl download failed for {identifier}: {stderr}")
     except Exception as e:
         logger.error(f"Could not get thumbnail from content storage for {identifier}, falling back to OpenCV: {e}")
 
@@ -98,6 +107,9 @@ async def get_thumbnail(identifier, file_path, download_dir):
 
 async def read_drive_size_cache():
     """Read the drive size cache from the JSON file."""
+    return _read_drive_size_cache()
+
+def _read_drive_size_cache():
     try:
         if os.path.exists(DRIVE_SIZE_CACHE_PATH):
             with open(DRIVE_SIZE_CACHE_PATH, 'r') as f:
@@ -107,75 +119,147 @@ async def read_drive_size_cache():
         logger.error(f"Error reading drive size cache: {e}")
         return {}
 
+def _write_drive_size_cache(cache_data):
+    os.makedirs(os.path.dirname(DRIVE_SIZE_CACHE_PATH), exist_ok=True)
+    tmp_path = f"{DRIVE_SIZE_CACHE_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache_data, f, indent=4)
+    os.replace(tmp_path, DRIVE_SIZE_CACHE_PATH)
+
 async def write_drive_size_cache(cache_data):
     """Write the drive size cache to the JSON file."""
     try:
-        os.makedirs(os.path.dirname(DRIVE_SIZE_CACHE_PATH), exist_ok=True)
-        with open(DRIVE_SIZE_CACHE_PATH, 'w') as f:
-            json.dump(cache_data, f, indent=4)
+        await asyncio.to_thread(_write_drive_size_cache, cache_data)
     except Exception as e:
         logger.error(f"Error writing drive size cache: {e}")
 
-async def update_drive_size_cache(drive, used_space_gb=None, file_size_gb=None):
-    """Update the drive size cache with the latest information."""
-    cache = await read_drive_size_cache()
-    timestamp = datetime.now(timezone.utc).isoformat()
-    
-    if drive not in cache:
-        cache[drive] = {'used_space_gb': 0, 'last_updated': timestamp}
-    
-    if used_space_gb is not None:
-        cache[drive]['used_space_gb'] = used_space_gb
-    elif file_size_gb is not None:
-        cache[drive]['used_space_gb'] += file_size_gb
-    
-    cache[drive]['last_updated'] = timestamp
-    await write_drive_size_cache(cache)
-    return cache
-
-async def get_drive_size(drive):
-    """Get the current size information for a drive using rclone."""
-    size_cmd = ['rclone', 'size', f'{drive}:', '--json']
-    stdout, _, returncode = await run_subprocess(size_cmd)
-    
-    if returncode == 0:
-        size_info = json.loads(stdout)
-        return bytes_to_gb(size_info.get('bytes', 0))
-    
+def get_drive_remote(drive):
+    """The rclone daemon and remote name serving a drive, using its own config if it has one."""
+    config_file, drive_name = get_drive_config(drive)
+    if config_file and os.path.exists(config_file):
+        return rclone_daemons.get(config_file), drive_name
+    return rclone_daemons.get(None), drive
+
+async def get_drive_usage(drive):
+    """Get the used bytes of a drive with a single quota query."""
+    daemon, remote = get_drive_remote(drive)
+    try:
+        about_info = await daemon.about(remote)
+    except Exception as e:
+        logger.warning(f"rclone about failed for drive {drive}: {e}")
+        return None
+    if 'used' in about_info:
+        return int(about_info['used'])
     return None
 
+class DriveAllocator:
+    """Hands out drive capacity for uploads from in-memory used/reserved counters.
+
+    ``reserve`` picks a drive and holds the bytes without awaiting anything,
+    so concurrent uploads cannot over-commit a drive. ``commit`` turns a
+    reservation into used space once the upload succeeded and ``release``
+    gives it back on failure. Used sizes start from the cache file and are
+    reconciled in the background with one quota query per drive.
+    """
+
+    def __init__(self, drives, capacity_bytes, reconcile_interval=1800):
+        self.drives = list(drives)
+        self.capacity_bytes = capacity_bytes
+        self.reconcile_interval = reconcile_interval
+        self.used = {drive: 0 for drive in self.drives}
+        self.reserved = {drive: 0 for drive in self.drives}
+        self.reservations = {}  # reservation id -> (drive, bytes)
+        self.next_id = 0
+        self.persist_task = None
+
+    def load(self, cache):
+        """Seed used sizes from the drive size cache."""
+        for drive in self.drives:
+            used_space_gb = cache.get(drive, {}).get('used_space_gb', 0)
+            self.used[drive] = int(used_space_gb * GB_BYTES)
+
+    def free_bytes(self, drive):
+        return self.capacity_bytes - self.used[drive] - self.reserved[drive]
+
+    def reserve(self, size_bytes):
+        """Reserve space on the first drive with room; returns (reservation id, drive) or None."""
+        for drive in self.drives:
+            if size_bytes < self.free_bytes(drive):
+                self.next_id += 1
+                self.reserved[drive] += size_bytes
+                self.reservations[self.next_id] = (drive, size_bytes)
+                logger.info(f"Reserved {bytes_to_gb(size_bytes):.2f}GB on drive {drive}")
+                return self.next_id, drive
+        return None
+
+    def commit(self, reservation_id):
+        """Count a reservation as used space after a successful upload."""
+        reservation = self.reservations.pop(reservation_id, None)
+        if reservation is None:
+            return
+        drive, size_bytes = reservation
+        self.reserved[drive] -= size_bytes
+        self.used[drive] += size_bytes
+        self._schedule_persist()
+
+    def release(self, reservation_id):
+        """Give back a reservation after a failed upload."""
+        reservation = self.reservations.pop(reservation_id, None)
+        if reservation is not None:
+            drive, size_bytes = reservation
+            self.reserved[drive] -= size_bytes
+
+    def set_used(self, drive, used_bytes):
+        if drive in self.used:
+            self.used[drive] = used_bytes
+            self._schedule_persist()
+
+    def _schedule_persist(self):
+        if self.persist_task is None or self.persist_task.done():
+            self.persist_task = asyncio.create_task(self.persist())
+
+    async def persist(self):
+        timestamp = datetime.now(timezone.utc).isoformat()
+        await write_drive_size_cache({
+            drive: {'used_space_gb': bytes_to_gb(used), 'last_updated': timestamp}
+            for drive, used in self.used.items()
+        })
+
+    async def reconcile(self):
+        """Refresh used sizes from the remotes; reservations stay as they are."""
+        results = await asyncio.gather(*(get_drive_usage(drive) for drive in self.drives), return_exceptions=True)
+        for drive, used_bytes in zip(self.drives, results):
+            if isinstance(used_bytes, Exception):
+                logger.error(f"Error checking drive {drive}: {used_bytes}")
+            elif used_bytes is not None:
+                self.used[drive] = used_bytes
+        await self.persist()
+
+    async def run(self):
+        """Reconcile periodically; meant to run as a background task."""
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Error reconciling drive sizes: {e}")
+            await asyncio.sleep(self.reconcile_interval)
+
+drive_allocator = DriveAllocator(DRIVES, int(MAX_DRIVE_SIZE_GB * GB_BYTES))
+drive_allocator.load(_read_drive_size_cache())
+
 async def get_available_drive(file_size_mb):
-    """Get the first drive that has enough space for the file."""
-    file_size_gb = file_size_mb / 1024
-    cache = await read_drive_size_cache()
-    
-    # First check cache for available drives
-    for drive in DRIVES:
-        used_space_gb = cache.get(drive, {}).get('used_space_gb', 0)
-        if (used_space_gb + file_size_gb) < MAX_DRIVE_SIZE_GB:
-            # Immediately update cache with new size
-            await update_drive_size_cache(drive, used_space_gb=used_space_gb + file_size_gb)
-            logger.info(f"Selected drive {drive} for {file_size_gb:.2f}GB file")
-            return drive
-    
-    # If no suitable drive in cache, check each drive's actual size
-    for drive in DRIVES:
-        try:
-            used_space_gb = await get_drive_size(drive)
-            if used_space_gb is not None:
-                # Update cache with actual size
-                await update_drive_size_cache(drive, used_space_gb=used_space_gb)
-                
-                if (used_space_gb + file_size_gb) < MAX_DRIVE_SIZE_GB:
-                    # Immediately update cache with new size including the file
-                    await update_drive_size_cache(drive, used_space_gb=used_space_gb + file_size_gb)
-                    logger.info(f"Selected drive {drive} for {file_size_gb:.2f}GB file")
-                    return drive
-        except Exception as e:
-            logger.error(f"Error checking drive {drive}: {e}")
-    
-    logger.error(f"No drive available with sufficient space for {file_size_gb:.2f}GB file")
-    raise Exception("No drive available with sufficient space")
+    """Get the first drive that has enough space for the file and count the file against it.
+
+    Callers that can tell success from failure should use ``drive_allocator``
+    directly and commit or release the reservation.
+    """
+    reservation = drive_allocator.reserve(int(file_size_mb * 1024 * 1024))
+    if reservation is None:
+        logger.error(f"No drive available with sufficient space for {file_size_mb / 1024:.2f}GB file")
+        raise Exception("No drive available with sufficient space")
+    reservation_id, drive = reservation
+    drive_allocator.commit(reservation_id)
+    return drive
 
 async def cleanup_old_files():
     """Delete files older than 24 hours from all drives and update size cache"""
@@ -187,11 +271,14 @@ async def cleanup_old_files():
     
     for drive in DRIVES:
         try:
-            list_cmd = ['rclone', 'lsjson', f'{drive}:', '--files-only', '--recursive']
-            stdout, stderr, returncode = await run_subprocess(list_cmd)
-            
-            if returncode == 0:
-                files = json.loads(stdout)
+            daemon, remote = get_drive_remote(drive)
+            try:
+                files = await daemon.list_files(remote)
+            except Exception as e:
+                logger.error(f"Error listing files on drive {drive}: {e}")
+                files = None
+
+            if files is not None:
                 total_bytes = sum(file.get('Size', 0) for file in files)
                 total_gb = bytes_to_gb(total_bytes)
                 
@@ -201,31 +288,24 @@ async def cleanup_old_files():
                         time_diff = (current_time - mod_time).total_seconds() / 3600
                         
                         if time_diff > FILE_CLEANUP_AGE_HOURS:
-                            file_size = file.get('Size', 0)
-                            deleted_bytes[drive] += file_size
+                            # Delete permanently instead of moving to the drive's trash
+                            await daemon.delete_file(f"{remote},use_trash=false", file["Path"])
+                            deleted_bytes[drive] += file.get('Size', 0)
                             files_deleted[drive] += 1
-                            
-                            delete_cmd = [
-                                'rclone', 'deletefile',
-                                f'{drive}:{file["Path"]}',
-                                '--drive-use-trash=false'
-                            ]
-                            await run_subprocess(delete_cmd)
                     except (ValueError, KeyError) as e:
                         logger.error(f"Error processing file timestamp for {file.get('Path', 'unknown file')}: {e}")
+                    except RcloneError as e:
+                        logger.error(f"Error deleting {file.get('Path')} from drive {drive}: {e}")
                 
                 # Update cache with new size information
                 deleted_gb = bytes_to_gb(deleted_bytes[drive])
                 new_size = total_gb - deleted_gb if deleted_bytes[drive] > 0 else total_gb
                 
                 # Only update if files were deleted or significant difference
-                cache = await read_drive_size_cache()
-                old_size = cache.get(drive, {}).get('used_space_gb', 0)
+                old_size = bytes_to_gb(drive_allocator.used.get(drive, 0))
                 
                 if deleted_bytes[drive] > 0 or abs(old_size - total_gb) > 0.01:
-                    await update_drive_size_cache(drive, new_size)
-            else:
-                logger.error(f"Error listing files on drive {drive}: {stderr}")
+                    drive_allocator.set_used(drive, int(new_size * GB_BYTES))
         except Exception as e:
             logger.error(f"Error cleaning up drive {drive}: {e}")
     
@@ -251,16 +331,8 @@ def cleanup_download_dir(download_dir):
         logger.error(f"Error cleaning up directory {download_dir}: {e}")
 
 def store_content_info(identifier, info):
-    """Store content info in storage file with timestamp."""
+    """Store content info for an identifier in the shared content store."""
     try:
-        os.makedirs(CACHE_DIR, exist_ok=True)
-        
-        try:
-            with open(CONTENT_STORAGE_PATH, 'r', encoding='utf-8') as f:
-                storage = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            storage = {}
-            
         # Convert info to a serializable format if it's a Task
         if isinstance(info, asyncio.Task):
             try:
@@ -268,18 +340,7 @@ def store_content_info(identifier, info):
             except:
                 info = {}
 
-        # Add timestamp and store info
-        info['timestamp'] = time.time()
-        storage[identifier] = info
-        
-        # Remove entries older than 60 minutes
-        current_time = time.time()
-        storage = {k:v for k,v in storage.items() 
-                  if current_time - v.get('timestamp',0) < 3600}
-        
-        with open(CONTENT_STORAGE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(storage, f, indent=4)
-            
+        content_store.put(identifier, info)
         return True
     except Exception as e:
         logger.error(f"Error storing content info: {str(e)}")